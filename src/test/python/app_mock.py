@@ -1,11 +1,26 @@
 #!/usr/bin/env python
 
+""" app_mock responds to /ping with pongs and to any other path with the health
+    reported by the health url it was started with.
+
+    usage: app_mock.py <port> <appId> <version> <health url> [--ttl 1]
+    A probe queries the health url over one persistent connection unless the last value is
+    younger than the ttl, in which case it is served from that cached value.  The health url
+    is only queried on behalf of a probe, so it sees whether the app is probed at all.
+    /counters reports the probes and upstream calls.
+"""
+
+import argparse
+import json
 import sys
 import logging
 import os
 import platform
+import threading
 import time
 
+from collections import deque
+
 # Ensure compatibility with Python 2 and 3.
 # See https://github.com/JioCloud/python-six/blob/master/six.py for details.
 PY2 = sys.version_info[0] == 2
@@ -14,26 +29,129 @@ PY3 = sys.version_info[0] == 3
 if PY2:
     from SimpleHTTPServer import SimpleHTTPRequestHandler
     from SocketServer import TCPServer as HTTPServer
-    from urllib2 import Request, urlopen
+    from httplib import HTTPConnection
+    from urlparse import urlparse
 else:
     from http.server import SimpleHTTPRequestHandler
     from http.server import HTTPServer
-    from urllib.request import Request, urlopen
+    from http.client import HTTPConnection
+    from urllib.parse import urlparse
 
 if PY2:
     byte_type = unicode
-
-    def response_status(response):
-        return response.getcode()
-
 else:
     byte_type = bytes
 
-    def response_status(response):
-        return response.getcode()
 
+# seconds a health result is served to probes before a probe queries the health url again
+HEALTH_TTL = 1.0
+
+# seconds to wait on the health url
+UPSTREAM_TIMEOUT = 10
 
-def make_handler(appId, version, url):
+# seconds of probes the recent probe rate is computed over
+PROBE_RATE_WINDOW = 10
+
+
+class HealthCache(object):
+    """ Holds the last status and body of the health url, which probes query through
+        a single keep-alive connection at most once per ttl, and counts the probes and upstream calls.
+    """
+
+    def __init__(self, url, ttl=HEALTH_TTL):
+        self.url = urlparse(url)
+        self.ttl = ttl
+        self.connection = None
+        self.status = None
+        self.body = b''
+        self.refreshed_at = None
+        self.started_at = time.time()
+        self.probes = 0
+        self.stale_probes = 0
+        # times of the probes within the last PROBE_RATE_WINDOW seconds, oldest first
+        self.probe_times = deque()
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.lock = threading.Lock()
+        self.upstream_lock = threading.Lock()
+
+    def is_fresh(self, now):
+        return self.refreshed_at is not None and now - self.refreshed_at <= self.ttl
+
+    def refresh(self):
+        status, body = self.query()
+        with self.lock:
+            self.status = status
+            self.body = body
+            self.refreshed_at = time.time()
+
+    def query(self):
+        path = self.url.path or '/'
+        for attempt in range(2):
+            try:
+                if self.connection is None:
+                    self.connection = HTTPConnection(self.url.hostname, self.url.port or 80, timeout=UPSTREAM_TIMEOUT)
+                logging.debug("Query %s for health", self.url.geturl())
+                with self.lock:
+                    self.upstream_calls += 1
+                self.connection.request('GET', path, headers={"User-Agent": "Mozilla/5.0"})
+                response = self.connection.getresponse()
+                body = response.read()
+                logging.debug("Current health is %s, %s", body, response.status)
+                return response.status, body
+            except Exception:
+                # a kept alive connection the upstream closed fails once, the retry reconnects
+                logging.debug("Health query failed", exc_info=True)
+                with self.lock:
+                    self.upstream_errors += 1
+                if self.connection is not None:
+                    self.connection.close()
+                self.connection = None
+        return 503, byte_type("Could not query {}".format(self.url.geturl()), "UTF-8")
+
+    def probe(self):
+        """ Returns the status and body to answer a health probe with, querying the health url
+            if the cached value is older than the ttl.  Concurrent stale probes share one query.
+        """
+        now = time.time()
+        with self.lock:
+            self.probes += 1
+            self.probe_times.append(now)
+            self._trim_probe_times(now)
+        with self.upstream_lock:
+            with self.lock:
+                fresh = self.is_fresh(time.time())
+                if not fresh:
+                    self.stale_probes += 1
+            if not fresh:
+                self.refresh()
+        with self.lock:
+            return self.status, self.body
+
+    def _trim_probe_times(self, now):
+        while self.probe_times and now - self.probe_times[0] > PROBE_RATE_WINDOW:
+            self.probe_times.popleft()
+
+    def counters(self):
+        now = time.time()
+        with self.lock:
+            self._trim_probe_times(now)
+            uptime = now - self.started_at
+            return {
+                'uptime': round(uptime, 3),
+                'probes': self.probes,
+                'stale_probes': self.stale_probes,
+                'probes_per_second': round(self.probes / uptime, 3) if uptime else 0.0,
+                'recent_probes_per_second': round(len(self.probe_times) / float(min(uptime, PROBE_RATE_WINDOW) or 1), 3),
+                'upstream_calls': self.upstream_calls,
+                'upstream_errors': self.upstream_errors,
+                'upstream_calls_per_second': round(self.upstream_calls / uptime, 3) if uptime else 0.0,
+                'health_status': self.status,
+                'health_age': round(now - self.refreshed_at, 3) if self.refreshed_at else None
+            }
+
+
+def make_handler(appId, version, health):
     """
     Factory method that creates a handler class.
     """
@@ -52,12 +170,7 @@ def make_handler(appId, version, url):
             return
 
         def check_health(self):
-            logging.debug("Query %s for health", url)
-            url_req = Request(url, headers={"User-Agent": "Mozilla/5.0"})
-            response = urlopen(url_req)
-            res = response.read()
-            status = response_status(response)
-            logging.debug("Current health is %s, %s", res, status)
+            status, res = health.probe()
 
             self.send_response(status)
             self.send_header('Content-type', 'text/html')
@@ -68,11 +181,21 @@ def make_handler(appId, version, url):
             logging.debug("Done processing health request.")
             return
 
+        def handle_counters(self):
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+
+            self.wfile.write(byte_type(json.dumps(health.counters(), sort_keys=True), "UTF-8"))
+            return
+
         def do_GET(self):
             try:
                 logging.debug("Got GET request")
                 if self.path == '/ping':
                     return self.handle_ping()
+                elif self.path == '/counters':
+                    return self.handle_counters()
                 else:
                     return self.check_health()
             except:
@@ -97,17 +220,28 @@ if __name__ == "__main__":
     logging.info(platform.python_version())
     logging.debug(sys.argv)
 
-    port = int(sys.argv[1])
-    appId = sys.argv[2]
-    version = sys.argv[3]
-    url = "{}/{}".format(sys.argv[4], port)
+    parser = argparse.ArgumentParser(description='Mocks an app whose health is reported by a health url.')
+    parser.add_argument('port', type=int)
+    parser.add_argument('appId')
+    parser.add_argument('version')
+    parser.add_argument('url', help='health url, the port is appended to it')
+    parser.add_argument('--ttl', type=float, default=HEALTH_TTL,
+                        help='seconds a health result is served for before a probe queries it again')
+    args = parser.parse_args()
+
+    port = args.port
+    appId = args.appId
+    version = args.version
+    url = "{}/{}".format(args.url, port)
     taskId = os.getenv("MESOS_TASK_ID", "<UNKNOWN>")
 
+    health = HealthCache(url, args.ttl)
+
     HTTPServer.allow_reuse_address = True
-    httpd = HTTPServer(("", port), make_handler(appId, version, url))
+    httpd = HTTPServer(("", port), make_handler(appId, version, health))
     msg = "AppMock[%s %s]: %s has taken the stage at port %d. "\
-          "Will query %s for health status."
-    logging.info(msg, appId, version, taskId, port, url)
+          "Will query %s for health status at most every %ss."
+    logging.info(msg, appId, version, taskId, port, url, args.ttl)
 
     try:
         httpd.serve_forever()
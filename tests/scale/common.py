@@ -1,18 +1,40 @@
+import calendar
+import contextlib
+import math
 import pytest
 import retrying
 import shakedown
+import threading
 import time
 import traceback
+import tracing
 
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import timedelta
 from dcos.mesos import DCOSClient
 from dcos import mesos
+from controller import create_controller
+from events import DeploymentTracker
+from histogram import Histogram, merged, PERCENTILES
 from shakedown import *
 from utils import *
 
 MAX_CONSECUTIVE_SCALE_FAILS = 9
 MAX_HOURS_OF_TEST = 4
 
+# initial and max number of launch requests in flight against marathon
+LAUNCH_CONCURRENCY = 10
+LAUNCH_MAX_CONCURRENCY = 64
+# number of launched apps after which the count test waits for scale
+LAUNCH_WAIT_EVERY = 100
+LAUNCH_REQUEST_TIMEOUT = 60
+
+# sharded group tests post their shards 'concurrent'ly (bounded by the load controller) or 'sequential'ly
+GROUP_SHARD_MODE = 'concurrent'
+
+# load controller pacing the polls and launches of a test: step, aimd or latency
+LOAD_CONTROLLER = 'aimd'
+
 EVENT_HEADER = '    event:'
 
 ERROR_LAUNCH = 'Error (launch failure):'
@@ -31,8 +53,22 @@ ERRORS = [ERROR_LAUNCH, ERROR_SCALING, ERROR_SCALE_TIMEOUT, ERROR_MARATHON_TIMEO
           ERROR_DEPLOYMENT, FATAL_CONSECUTIVE_LAUNCH, FATAL_NOT_SCALING,
           FATAL_CONSECUTIVE_DEPLOYMENT, FATAL_CONSECUTIVE_UNDEPLOYMENT, FATAL_CONSECUTIVE_SCALING]
 
+TEST_STYLES = ['instances', 'count', 'group']
+
+# rows of the scale-test.csv for each test style, in order
+STAT_KEYS = ['target', 'max', 'deploy_time', 'human_deploy_time', 'launch_status', 'deployment_status', 'errors',
+             'response_p50', 'response_p90', 'response_p99', 'response_max',
+             'staging_p50', 'staging_p90', 'staging_p99', 'running_p50', 'running_p90', 'running_p99', 'predicted_time']
+
+# per task times from the launch request, see TaskTimer
+TASK_TIMES = ['staging', 'running']
+
+# mesos master gauges of tasks which are not terminal
+ACTIVE_TASK_METRICS = ['master/tasks_staging', 'master/tasks_starting', 'master/tasks_running', 'master/tasks_killing']
+
 SKIP_RESOURCES = 'Insufficient Resources'
 SKIP_PREVIOUS_TEST_FAILED = 'Previous Scale Test Failed'
+SKIP_PREDICTED_TOO_LONG = 'Predicted Deploy Time Over Budget'
 
 
 def app(id=1, instances=1):
@@ -66,6 +102,27 @@ def group(gcount=1, instances=1):
     return group
 
 
+def group_shards(gcount=1, instances=1, shards=1):
+    """ Splits the apps of `group` into `shards` sub groups of (nearly) equal size,
+        `/2deep/group/shard1` to `/2deep/group/shard<shards>`.
+    """
+    id = "/2deep/group"
+    shard_size = int(math.ceil(gcount / float(shards)))
+    groups = []
+
+    for shard, first in enumerate(range(1, gcount + 1, shard_size), 1):
+        shard_id = "{}/shard{}".format(id, shard)
+        shard_group = {
+            "id": shard_id,
+            "apps": []
+        }
+        for num in range(first, min(first + shard_size, gcount + 1)):
+            shard_group['apps'].append(app(shard_id + "/" + str(num), instances))
+        groups.append(shard_group)
+
+    return groups
+
+
 def constraints(name, operator, value=None):
     constraints = [name, operator]
     if value is not None:
@@ -77,34 +134,66 @@ def unique_host_constraint():
     return constraints('hostname', 'UNIQUE')
 
 
-def delete_all_apps():
-    client = marathon.create_client()
-    client.remove_group("/", True)
+def delete_all_apps(test_obj=None):
+    """ Deletes all apps and pods, returns the id of the deployment.
+    """
+    return remove_group('/', phase_results(test_obj, 'undeploy'))
 
 
-def time_deployment(test=""):
-    client = marathon.create_client()
+def time_deployment(test="", test_obj=None, deployment_ids=None):
+    """ Times the deployments `deployment_ids`, by default those launched by `test_obj`
+        (see `ScaleTest.launched`) or without a test the deployments active now.
+        Other deployments (ex. a MoM restart) are not waited for.
+    """
+    if deployment_ids is None and test_obj is not None:
+        deployment_ids = test_obj.deployment_ids
     start = time.time()
-    deployment_count = 1
-    while deployment_count > 0:
-        # need protection when tearing down
-        try:
-            deployments = client.get_deployments()
-            deployment_count = len(deployments)
-            if deployment_count > 0:
-                time.sleep(1)
-        except:
-            wait_for_service_endpoint('marathon-user')
-            pass
-
+    wait_for_deployment_ids(deployment_ids, test_obj, phase_results(test_obj, 'deploy'))
     end = time.time()
     elapse = round(end - start, 3)
     return elapse
 
 
 def delete_group(group="/2deep/group"):
-    client = marathon.create_client()
-    client.remove_group(group, True)
+    return remove_group(group)
+
+
+def remove_group(group_id, results=None):
+    """ Force deletes the group `group_id` with all of its apps and pods, returns the id of the deployment.
+    """
+    with timed(results, 'remove_group'):
+        response = http.delete(marathon_url('v2/groups/{}'.format(group_id.strip('/'))), params={'force': 'true'})
+    return deployment_id_of(response)
+
+
+def deployment_id_of(response):
+    """ The id of the deployment started by a marathon `response`, None if there is none.
+        Pods report it with the `Marathon-Deployment-Id` header, groups and deletes as
+        `deploymentId` and new apps in their `deployments`.
+    """
+    deployment_id = response.headers.get('Marathon-Deployment-Id')
+    if deployment_id is not None:
+        return deployment_id
+
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    return deployment_id_in(body)
+
+
+def deployment_id_in(body):
+    """ The id of the deployment in the JSON `body` of a marathon response, ex. the app or group
+        returned by `add_app` or `create_group` of the dcos client.  None if there is none.
+    """
+    if 'deploymentId' in body:
+        return body['deploymentId']
+    deployments = body.get('deployments') or [{}]
+    return deployments[0].get('id')
+
+
+def active_deployment_ids():
+    return set(deployment['id'] for deployment in stream_json(marathon_url('v2/deployments'), ['*'], ['id']))
 
 
 def deployment_less_than_predicate(count=10):
@@ -117,9 +206,32 @@ def launch_group(test_obj):
         of the apps defined by count.  It is common to launch X apps as a group
         with only 1 instance each.  It is possible to control the number of instances
         of an app.
+        Sharded group tests post the group as `shards` sub groups instead, see `launch_group_shards`.
     """
-    client = marathon.create_client()
-    client.create_group(group(test_obj.count, test_obj.instance))
+    if test_obj.shard_size is not None:
+        launch_group_shards(test_obj)
+        return
+
+    with tracing.span('group', args={'apps': test_obj.count}):
+        group_json = group(test_obj.count, test_obj.instance)
+    client = timed_client(test_obj.launch_results)
+    test_obj.task_timer.posted(group_json)
+    test_obj.launched(deployment_id_in(client.create_group(group_json)))
+
+
+def launch_group_shards(test_obj):
+    """ Launches a sharded group test: the apps of the group are posted as `shards` sub groups,
+        concurrently with as many in flight as the load controller allows, or one after the
+        other with a `GROUP_SHARD_MODE` of 'sequential'.
+    """
+    with tracing.span('group_shards', args={'apps': test_obj.count, 'shards': test_obj.shards}):
+        shards = group_shards(test_obj.count, test_obj.instance, test_obj.shards)
+    with Launcher(test_obj, 'v2/groups', 'create_group', test_obj.task_timer.posted) as launcher:
+        for shard in shards:
+            launcher.submit(shard)
+            if GROUP_SHARD_MODE == 'sequential':
+                launcher.wait()
+        launcher.wait()
 
 
 def count_test_app(test_obj):
@@ -133,7 +245,7 @@ def count_test_app(test_obj):
     :param test_obj: Is of type ScaleTest and defines the criteria for the test and logs the results and events of the test.
     """
 
-    with clean_marathon_state(test_obj):
+    with tracked_deployments(test_obj), clean_marathon_state(test_obj):
         # launch
         test_obj.start_test()
         launch_results = test_obj.launch_results
@@ -162,49 +274,335 @@ def launch_apps(test_obj):
         for instance and count tests.   Instance test will only have 1 count with X
         instances and is the simple case.
         The group test uses a different launch function.
+
+        Apps are posted concurrently by a `Launcher` with as many requests in flight
+        as the load controller of the test allows.  Every `LAUNCH_WAIT_EVERY`
+        apps the in flight requests are drained and we wait for scale up.
     """
 
-    client = marathon.create_client()
     count = test_obj.count
     instances = test_obj.instance
-    launch_results = test_obj.launch_results
     deploy_results = test_obj.deploy_results
-    scale_failure_count = 0
-    for num in range(1, count + 1):
-        try:
-            client.add_app(app(num, instances))
-            scale_failure_count = 0
+
+    with Launcher(test_obj, on_post=test_obj.task_timer.posted) as launcher:
+        for num in range(1, count + 1):
+            launcher.submit(app(num, instances))
 
             # every 100 adds wait for scale up
-            if not num % 100:
+            if not num % LAUNCH_WAIT_EVERY:
+                launcher.wait()
                 target = num * instances
-                deploy_results.set_current_scale(current_scale())
+                try:
+                    deploy_results.set_current_scale(current_scale())
+                except Exception as e:
+                    log_error_event(test_obj, e, ERROR_LAUNCH)
+
                 # wait for target
                 if count_deployment(test_obj, target):
                     abort_msg = 'Count test launch failure at {} out of {}'.format(num, test_obj.target)
                     test_obj.add_event(abort_msg)
                     raise Exception(abort_msg)
 
-        except Exception as e:
-            log_error_event(test_obj, e, ERROR_LAUNCH)
 
-            scale_failure_count = scale_failure_count + 1
+class Launcher(object):
+    """ Launches resources (HTTP POST) against marathon with a bounded number of requests in flight.
+        The bound is the launch concurrency of the load controller of the test, checked before
+        each submit, so it follows the controller while launching.
+        All requests share one keep-alive session.  The response time of each request is
+        recorded with the launch results of the test under `endpoint`.
 
-            # 9 tries to see if scale increases, if no abort
-            if scale_failure_count > MAX_CONSECUTIVE_SCALE_FAILS:
-                abort_msg = 'Aborting based on too many failures: {}'.format(scale_failure_count)
-                log_error_event(test_obj, abort_msg, FATAL_CONSECUTIVE_DEPLOYMENT, True)
-                raise Exception(abort_msg)
-            # need some time
+        Failures are logged as `ERROR_LAUNCH` events.  After a failure the launcher backs off
+        before submitting more requests, and it aborts after `MAX_CONSECUTIVE_SCALE_FAILS`
+        consecutive failures.
+
+        `on_post(resource)` is called from the request thread just before each POST and
+        `on_failure(resource)` after a POST which failed.
+        The deployment of each launched resource is recorded with the test, see `ScaleTest.launched`.
+    """
+
+    def __init__(self, test_obj, path='v2/apps', endpoint='add_app', on_post=None, on_failure=None):
+        max_concurrency = test_obj.controller.max_concurrency
+
+        self.test_obj = test_obj
+        self.url = marathon_url(path)
+        self.endpoint = endpoint
+        self.on_post = on_post
+        self.on_failure = on_failure
+        self.session = keep_alive_session(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.in_flight = 0
+        self.slots = threading.Condition()
+        self.lock = threading.Lock()
+        self.futures = []
+        self.failure_count = 0
+        self.backoff_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def submit(self, resource):
+        """ Queues the `resource` to be posted.  Blocks while all request slots are in use.
+        """
+        self._check_failures()
+        controller = self.test_obj.controller
+        with self.slots:
+            self.slots.wait_for(lambda: self.in_flight < controller.launch_concurrency())
+            self.in_flight += 1
+        future = self.executor.submit(self._post, resource)
+        future.add_done_callback(self._done)
+        self.futures.append(future)
+        return future
+
+    def wait(self):
+        """ Waits for all submitted requests to finish.
+        """
+        wait(self.futures)
+        self.futures = []
+        self._check_failures()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def _post(self, resource):
+        if self.on_post is not None:
+            self.on_post(resource)
+        try:
+            with timed(self.test_obj.launch_results, self.endpoint):
+                response = self.session.post(self.url, json=resource, timeout=LAUNCH_REQUEST_TIMEOUT)
+
+            if response.status_code >= 400:
+                raise DCOSException('Unable to launch {}: {} {}'.format(
+                    resource.get('id'),
+                    response.status_code,
+                    response.text))
+        except Exception:
+            if self.on_failure is not None:
+                self.on_failure(resource)
+            raise
+        return response
+
+    def _done(self, future):
+        with self.slots:
+            self.in_flight -= 1
+            self.slots.notify_all()
+        error = future.exception()
+        with self.lock:
+            if error is None:
+                self.failure_count = 0
+                self.backoff_count = 0
+                self.test_obj.launched(deployment_id_of(future.result()))
             else:
-                time.sleep(calculate_scale_wait_time(test_obj, scale_failure_count))
-                quiet_wait_for_marathon_up(test_obj)
+                log_error_event(self.test_obj, error, ERROR_LAUNCH)
+                self.failure_count = self.failure_count + 1
+
+    def _check_failures(self):
+        """ Runs in the submitting thread.  Aborts the launch on too many consecutive failures,
+            otherwise backs off once for each new failure.
+        """
+        with self.lock:
+            failure_count = self.failure_count
+
+        # 9 tries to see if scale increases, if no abort
+        if failure_count > MAX_CONSECUTIVE_SCALE_FAILS:
+            abort_msg = 'Aborting based on too many failures: {}'.format(failure_count)
+            log_error_event(self.test_obj, abort_msg, FATAL_CONSECUTIVE_LAUNCH, True)
+            raise Exception(abort_msg)
+
+        # need some time
+        if failure_count > self.backoff_count:
+            self.backoff_count = failure_count
+            tracing.sleep(calculate_scale_wait_time(self.test_obj, failure_count), 'scale_backoff')
+            quiet_wait_for_marathon_up(self.test_obj)
+
+
+class PodInstanceTimer(object):
+    """ Times each pod instance from the POST of its pod until all of its containers are running.
+        Pods are registered with `posted` (ex. as the `on_post` of a `Launcher`) and unregistered
+        with `failed` when their POST fails (its `on_failure`).  Instances are
+        seen running from the `status_update_event`s of the event stream (`on_event`), or from
+        polls of `/v2/pods/::status` (`observe_status`) which only time to the poll interval.
+        The times are recorded in `histogram`.
+    """
+
+    def __init__(self, histogram=None):
+        self.histogram = histogram if histogram is not None else Histogram()
+        self.posted_at = {}
+        self.containers = {}
+        self.expected = 0
+        self.running = {}
+        self.done = set()
+        self.condition = threading.Condition()
+
+    def posted(self, pod):
+        with self.condition:
+            self.posted_at[pod['id']] = time.monotonic()
+            self.containers[pod['id']] = len(pod['containers'])
+            self.expected += pod['scaling']['instances']
+
+    def failed(self, pod):
+        """ Unregisters a pod whose POST failed, its instances are not expected to run.
+        """
+        with self.condition:
+            if self.posted_at.pop(pod['id'], None) is not None:
+                del self.containers[pod['id']]
+                self.expected -= pod['scaling']['instances']
+                self.condition.notify_all()
+
+    def on_event(self, event):
+        if event.get('eventType') != 'status_update_event' or event.get('appId') not in self.posted_at:
+            return
+
+        # pod task ids are <instance id>.<container name>
+        task_id = event['taskId']
+        instance_id = task_id.rsplit('.', 1)[0]
+        with self.condition:
+            running = self.running.setdefault(instance_id, set())
+            if event['taskStatus'] == 'TASK_RUNNING':
+                running.add(task_id)
+            else:
+                running.discard(task_id)
+
+            if len(running) == self.containers[event['appId']]:
+                self._instance_running(event['appId'], instance_id)
+
+    def observe_status(self, pod_statuses):
+        """ Records the instances which are running in a poll of `/v2/pods/::status`.
+        """
+        with self.condition:
+            for pod_status in pod_statuses:
+                pod_id = pod_status['id']
+                if pod_id not in self.posted_at:
+                    continue
+                for instance in pod_status.get('instances', []):
+                    containers = instance.get('containers', [])
+                    if len(containers) == self.containers[pod_id] and \
+                            all(container.get('status') == 'TASK_RUNNING' for container in containers):
+                        self._instance_running(pod_id, instance['id'])
+
+    def completed(self):
+        with self.condition:
+            return len(self.done) >= self.expected
+
+    def wait(self, timeout):
+        """ Waits up to `timeout` seconds for all instances to be running.
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: len(self.done) >= self.expected, timeout)
+
+    def _instance_running(self, pod_id, instance_id):
+        if instance_id in self.done:
+            return
+        self.done.add(instance_id)
+        self.histogram.record(time.monotonic() - self.posted_at[pod_id])
+        self.condition.notify_all()
+
+
+class TaskTimer(object):
+    """ Times each task from the launch request of its app to TASK_STAGING and to TASK_RUNNING.
+        Launch requests are registered with `posted` (an app or a group).  Task states are seen
+        from the `status_update_event`s of the event stream (`on_event`), timed on arrival with
+        the local clock.  Tasks the stream missed can be timed from the `stagedAt` and `startedAt`
+        of marathon tasks (`observe_tasks`), which depends on the clocks of the cluster and the
+        harness agreeing.  The times are recorded in the `staging` and `running` histograms.
+    """
+
+    def __init__(self):
+        self.posted_at = {}
+        self.staging = Histogram()
+        self.running = Histogram()
+        self.staged_tasks = set()
+        self.running_tasks = set()
+        self.lock = threading.Lock()
+
+    def posted(self, resource):
+        """ Registers the launch request of an app, or of all the apps of a group.
+        """
+        now = (time.monotonic(), time.time())
+        with self.lock:
+            for app_id in app_ids(resource):
+                self.posted_at.setdefault(app_id, now)
+
+    def on_event(self, event):
+        if event.get('eventType') != 'status_update_event':
+            return
+        with self.lock:
+            posted_at = self.posted_at.get(event.get('appId'))
+            if posted_at is not None:
+                self._record(event['taskId'], event['taskStatus'], time.monotonic() - posted_at[0])
+
+    def observe_tasks(self, tasks):
+        """ Times the marathon `tasks` which were not seen on the event stream.
+        """
+        with self.lock:
+            for task in tasks:
+                posted_at = self.posted_at.get(task.get('appId'))
+                if posted_at is None:
+                    continue
+                if task.get('stagedAt'):
+                    self._record(task['id'], 'TASK_STAGING', parse_timestamp(task['stagedAt']) - posted_at[1])
+                if task.get('startedAt'):
+                    self._record(task['id'], 'TASK_RUNNING', parse_timestamp(task['startedAt']) - posted_at[1])
+
+    def timed_count(self):
+        with self.lock:
+            return len(self.running_tasks)
+
+    def summary(self):
+        return {
+            'staging': self.staging.summary(),
+            'running': self.running.summary()
+        }
+
+    def _record(self, task_id, state, elapsed):
+        if state == 'TASK_STAGING' and task_id not in self.staged_tasks:
+            self.staged_tasks.add(task_id)
+            self.staging.record(max(elapsed, 0))
+        elif state == 'TASK_RUNNING' and task_id not in self.running_tasks:
+            self.running_tasks.add(task_id)
+            self.running.record(max(elapsed, 0))
+
+
+def app_ids(resource):
+    """ The ids of the app `resource`, or of all the apps of a group `resource`.
+    """
+    if 'apps' not in resource and 'groups' not in resource:
+        return [resource['id']]
+
+    ids = [app['id'] for app in resource.get('apps', [])]
+    for sub_group in resource.get('groups', []):
+        ids.extend(app_ids(sub_group))
+    return ids
+
+
+def parse_timestamp(timestamp):
+    """ Seconds since the epoch of a marathon timestamp, ex. `2017-03-15T17:50:02.371Z`.
+    """
+    seconds = calendar.timegm(time.strptime(timestamp[:19], '%Y-%m-%dT%H:%M:%S'))
+    fraction = timestamp[19:].rstrip('Z')
+    return seconds + (float(fraction) if fraction else 0.0)
+
+
+def record_task_times(test_obj):
+    """ Times the tasks of the test the event stream did not report from the marathon tasks.
+    """
+    if test_obj.task_timer.timed_count() >= test_obj.deploy_results.current_scale:
+        return
+    try:
+        with timed(test_obj.deploy_results, 'get_tasks'):
+            test_obj.task_timer.observe_tasks(marathon_tasks(fields=['id', 'appId', 'stagedAt', 'startedAt']))
+    except Exception as e:
+        log_error_event(test_obj, e, ERROR_DEPLOYMENT)
 
 
 def log_error_event(test_obj, message, message_type='', noisy=False):
     full_message = '{} {}'.format(message_type, message)
     if test_obj is not None:
         test_obj.add_event(full_message)
+        test_obj.controller.observe_error(full_message)
     if noisy:
         print(full_message)
 
@@ -220,7 +618,7 @@ def instance_test_app(test_obj):
     :param test_obj: Is of type ScaleTest and defines the criteria for the test and logs the results and events of the test.
     """
 
-    with clean_marathon_state(test_obj):
+    with tracked_deployments(test_obj), clean_marathon_state(test_obj):
         # launch
         test_obj.start_test()
         launch_results = test_obj.launch_results
@@ -253,7 +651,7 @@ def group_test_app(test_obj):
     :param test_obj: Is of type ScaleTest and defines the criteria for the test and logs the results and events of the test.
     """
 
-    with clean_marathon_state(test_obj):
+    with tracked_deployments(test_obj), clean_marathon_state(test_obj):
         # launch
         test_obj.start_test()
         launch_results = test_obj.launch_results
@@ -283,8 +681,9 @@ def delete_all_apps_wait(test_obj=None, msg='undeployment failure'):
     if test_obj is not None and test_obj.deploy_results.current_scale > 0:
         test_obj.add_event('Undeploying {} tasks'.format(test_obj.deploy_results.current_scale))
 
+    deployment_ids = None
     try:
-        delete_all_apps()
+        deployment_ids = [delete_all_apps(test_obj)]
     except Exception as e:
         log_error_event(test_obj, e, noisy=True)
 
@@ -292,35 +691,22 @@ def delete_all_apps_wait(test_obj=None, msg='undeployment failure'):
     # however it is a marathon internal issue on getting a timely response
     # all tested situations the remove did succeed
     try:
-        undeployment_wait(test_obj)
+        undeployment_wait(test_obj, deployment_ids)
     except Exception as e:
         log_error_event(test_obj, e, noisy=True)
         assert False, e
 
 
-def undeployment_wait(test_obj=None):
-    client = marathon.create_client()
+def undeployment_wait(test_obj=None, deployment_ids=None):
+    """ Waits for the undeployment `deployment_ids`, by default the deployments active now.
+    """
     start = time.time()
-    deployment_count = 1
-    failure_count = 0
-    while deployment_count > 0:
-        # need protection when tearing down
-        try:
-            deployments = client.get_deployments()
-            deployment_count = len(deployments)
-
-            if deployment_count > 0:
-                time.sleep(1)
-                failure_count = 0
-        except:
-            failure_count += 1
-            # consecutive failures great than x
-            if failure_count > 10 and test_obj is not None:
-                test_obj.failed('Too many failures waiting for undeploy', FATAL_CONSECUTIVE_UNDEPLOYMENT)
-                raise TestException()
-
-            wait_for_marathon_up(test_obj)
-            pass
+    try:
+        wait_for_deployment_ids(deployment_ids, test_obj, phase_results(test_obj, 'undeploy'), max_failures=10)
+    except DCOSException:
+        if test_obj is not None:
+            test_obj.failed('Too many failures waiting for undeploy', FATAL_CONSECUTIVE_UNDEPLOYMENT)
+        raise
 
     if test_obj is not None:
         test_obj.undeploy_complete(start)
@@ -329,7 +715,6 @@ def undeployment_wait(test_obj=None):
 def count_deployment(test_obj, step_target):
 
     deploy_results = test_obj.deploy_results
-    client = marathon.create_client()
 
     deploying = True
     abort = False
@@ -339,16 +724,15 @@ def count_deployment(test_obj, step_target):
     while deploying and not abort:
         try:
 
-            task_count = current_scale()
+            task_count = tracked_scale(test_obj)
             deploy_results.set_current_scale(task_count)
 
             deploying = task_count < step_target
 
             if deploying:
-                time.sleep(calculate_deployment_wait_time(test_obj))
+                wait_for_scale_event(test_obj, step_target, calculate_deployment_wait_time(test_obj))
                 # reset failure count,  it is used for consecutive failures
                 failure_count = 0
-                quiet_wait_for_marathon_up(test_obj)
 
             abort = abort_deployment_check(test_obj)
             scale_failure_count = 0
@@ -365,7 +749,7 @@ def count_deployment(test_obj, step_target):
                 abort = True
             # need some time
             else:
-                time.sleep(calculate_scale_wait_time(test_obj, scale_failure_count))
+                tracing.sleep(calculate_scale_wait_time(test_obj, scale_failure_count), 'scale_backoff')
                 quiet_wait_for_marathon_up(test_obj)
 
         except DCOSNotScalingException as e:
@@ -382,7 +766,7 @@ def count_deployment(test_obj, step_target):
                 deploy_results.failed(message, FATAL_CONSECUTIVE_DEPLOYMENT)
                 raise TestException(message)
 
-            time.sleep(calculate_deployment_wait_time(test_obj, failure_count))
+            tracing.sleep(calculate_deployment_wait_time(test_obj, failure_count), 'deployment_backoff')
             quiet_wait_for_marathon_up(test_obj)
             pass
 
@@ -399,7 +783,6 @@ def time_deployment2(test_obj):
     """
 
     deploy_results = test_obj.deploy_results
-    client = marathon.create_client()
 
     deploying = True
     abort = False
@@ -409,16 +792,15 @@ def time_deployment2(test_obj):
     while deploying and not abort:
         try:
 
-            task_count = current_scale()
+            task_count = tracked_scale(test_obj)
             deploy_results.set_current_scale(task_count)
 
             deploying = not deploy_results.is_target_reached()
 
             if deploying:
-                time.sleep(calculate_deployment_wait_time(test_obj))
+                wait_for_scale_event(test_obj, test_obj.target, calculate_deployment_wait_time(test_obj))
                 # reset failure count,  it is used for consecutive failures
                 failure_count = 0
-                quiet_wait_for_marathon_up(test_obj)
 
             abort = abort_deployment_check(test_obj)
             scale_failure_count = 0
@@ -434,7 +816,7 @@ def time_deployment2(test_obj):
                 abort = True
             # need some time
             else:
-                time.sleep(calculate_scale_wait_time(test_obj, scale_failure_count))
+                tracing.sleep(calculate_scale_wait_time(test_obj, scale_failure_count), 'scale_backoff')
                 quiet_wait_for_marathon_up(test_obj)
 
         except DCOSNotScalingException as e:
@@ -452,20 +834,136 @@ def time_deployment2(test_obj):
                 deploy_results.failed(message, FATAL_CONSECUTIVE_LAUNCH)
                 raise TestException(message)
 
-            time.sleep(calculate_deployment_wait_time(test_obj, failure_count))
+            tracing.sleep(calculate_deployment_wait_time(test_obj, failure_count), 'deployment_backoff')
             quiet_wait_for_marathon_up(test_obj)
 
     loop_msg = 'loop count: {}'.format(test_obj.loop_count)
     print(loop_msg)
     test_obj.add_event(loop_msg)
+    record_task_times(test_obj)
     if deploy_results.is_target_reached():
         deploy_results.completed()
     else:
         deploy_results.failed('Target NOT reached')
 
 
+@contextlib.contextmanager
+def tracked_deployments(test_obj):
+    """ Context manager which subscribes the test to the marathon event stream.
+        While the tracker is connected the deployment loops are woken by events and
+        marathon is only polled to reconcile the tracker.
+    """
+    tracker = DeploymentTracker()
+    tracker.add_listener(test_obj.task_timer.on_event)
+    if not tracker.start():
+        test_obj.add_event('Unable to subscribe to marathon events, polling instead')
+    test_obj.tracker = tracker
+    try:
+        yield tracker
+    finally:
+        test_obj.tracker = None
+        tracker.stop()
+
+
+def phase_results(test_obj, phase):
+    """ Returns the results of the `phase` (launch, deploy or undeploy) of the test, if any.
+    """
+    if test_obj is None:
+        return None
+    return getattr(test_obj, '{}_results'.format(phase))
+
+
+def tracker_of(test_obj):
+    """ Returns the event tracker of the test if it is connected, otherwise None.
+    """
+    if test_obj is None or test_obj.tracker is None or not test_obj.tracker.connected:
+        return None
+    return test_obj.tracker
+
+
+def tracked_scale(test_obj):
+    """ Provides the count of active tasks.  With a connected tracker the count is kept
+        by the event stream.  When a reconcile is due the count is checked against the
+        cheap Mesos metrics count, and the full task list is only fetched if they differ.
+    """
+    results = test_obj.deploy_results
+    tracker = tracker_of(test_obj)
+    if tracker is None:
+        with timed(results, 'current_scale'):
+            return current_scale()
+
+    if tracker.needs_reconcile():
+        with timed(results, 'current_scale'):
+            task_count = current_scale()
+
+        if task_count == tracker.active_count():
+            tracker.reconcile()
+        else:
+            since = tracker.mark()
+            with timed(results, 'get_active_tasks'):
+                task_states = {task['id']: task['state'] for task in active_tasks(['id', 'state'])}
+            tracker.reconcile(task_states, since)
+    return tracker.active_count()
+
+
+def wait_for_scale_event(test_obj, target, wait_time):
+    """ Waits `wait_time` seconds or until the event stream reports `target` active tasks.
+    """
+    tracker = tracker_of(test_obj)
+    if tracker is None:
+        tracing.sleep(wait_time, 'deployment_wait')
+        quiet_wait_for_marathon_up(test_obj)
+    else:
+        with tracing.span('wait_for_scale_event', 'wait', {'target': target, 'timeout': wait_time}):
+            tracker.wait_for(lambda t: t.active_count() >= target, wait_time)
+
+
+def wait_for_deployment_ids(deployment_ids=None, test_obj=None, results=None, timeout=None, max_failures=None,
+                            poll_interval=1):
+    """ Waits until the deployments `deployment_ids` (by default those active now) are finished,
+        ignoring any other deployment.  With a connected tracker of the test they are resolved by
+        the deployment events and `/v2/deployments` is only polled at the start and when no event
+        arrived for the reconcile interval, otherwise it is polled every `poll_interval` seconds.
+        A failing poll waits for marathon, after more than `max_failures` consecutive failures it
+        raises a `DCOSException`, as it does if they are not finished within `timeout`.
+    """
+    pending = None if deployment_ids is None else set(deployment_ids) - set([None])
+    deadline = None if timeout is None else time.time() + timeout
+    failure_count = 0
+    while pending is None or pending:
+        # need protection when tearing down
+        try:
+            with timed(results, 'get_deployments'):
+                active = active_deployment_ids()
+            pending = active if pending is None else pending & active
+            failure_count = 0
+        except Exception as e:
+            failure_count += 1
+            if max_failures is not None and failure_count > max_failures:
+                raise DCOSException('Too many failures waiting for deployments: {}'.format(e))
+            quiet_wait_for_marathon_up(test_obj)
+            continue
+
+        if not pending:
+            break
+        if deadline is not None and time.time() > deadline:
+            raise DCOSException('Timeout waiting for deployments {}'.format(', '.join(sorted(pending))))
+
+        tracker = tracker_of(test_obj)
+        if tracker is None:
+            tracing.sleep(poll_interval, 'deployment_poll')
+        else:
+            with tracing.span('wait_for_deployment_ids', 'wait', {'pending': len(pending)}):
+                tracker.wait_for(lambda t: pending <= t.finished, tracker.reconcile_interval)
+            with tracker.condition:
+                pending -= tracker.finished
+
+
 def calculate_scale_wait_time(test_obj, failure_count):
-    return failure_count * 10
+    """ Time in seconds to back off after `failure_count` consecutive scale failures,
+        as decided by the load controller of the test.
+    """
+    return test_obj.controller.backoff_time(failure_count)
 
 
 def abort_deployment_check(test_obj):
@@ -474,41 +972,19 @@ def abort_deployment_check(test_obj):
     """
 
     if elapse_time(test_obj.start) > timedelta(hours=MAX_HOURS_OF_TEST).total_seconds():
-        log_error_event(test_obj, 'Test taking longer than {} hours'.format(hours), ERROR_SCALE_TIMEOUT)
+        log_error_event(test_obj, 'Test taking longer than {} hours'.format(MAX_HOURS_OF_TEST), ERROR_SCALE_TIMEOUT)
         return True
 
     return False
 
 
 def calculate_deployment_wait_time(test_obj, failure_count=0):
-    """ Calculates wait time based potentially a number of factors.
-        If we need an exponential backoff this is the place.
-
-        possbilities:
-            deploy_results.avg_response_time,
-            deploy_results.last_response_time
-            failure_count
-            outstanding_deployments
-            current_scale
-
-        max response time is 10s, as we approach that bad things happen
-
-        return time in seconds to wait
+    """ Calculates the time in seconds to wait before polling the deployment again.
+        This is decided by the load controller of the test (see `LOAD_CONTROLLER`), which is
+        fed with the response times of every marathon call and with the error events
+        (ex. "Futures timed out" or 503s) of the test.
     """
-    deploy_results = test_obj.deploy_results
-
-    wait_time = 1
-    if deploy_results.last_response_time < 1:
-        wait_time = 1
-    elif deploy_results.last_response_time > 8:
-        wait_time = 5
-
-    if failure_count > 3 and failure_count < 7:
-        wait_time = wait_time + 5
-    elif failure_count > 7:
-        wait_time = wait_time + 10
-
-    return wait_time
+    return test_obj.controller.poll_interval(failure_count)
 
 
 def elapse_time(start, end=None):
@@ -523,30 +999,113 @@ def write_meta_data(metadata={}, filename='meta-data.json'):
         json.dump(metadata, out)
 
 
-def get_cluster_metadata():
+class ClusterSnapshot(object):
+    """ The agents, resources and versions of the cluster, each read once on first use.
+        A snapshot is taken per phase (ex. the setup of a test module) and shared by its
+        skip decisions and the meta-data, see `cluster_snapshot`.  Whatever changes the
+        cluster (over-provisioning the agents, installing MoM) has to invalidate it.
+    """
 
-    try:
-        version = ee_version()
-    except:
-        version = None
-
-    resources = available_resources()
-    metadata = {
-        'dcos-version': dcos_version(),
-        'marathon-version': get_marathon_version(),
-        'private-agents': len(get_private_agents()),
-        'master-count': len(shakedown.get_all_masters()),
-        'resources': {
-            'cpus': resources.cpus,
-            'memory': resources.mem
-        },
-        'marathon': 'root'
-    }
+    def __init__(self):
+        self.taken = time.time()
+        self.values = {}
+
+    def cached(self, name, read):
+        if name not in self.values:
+            self.values[name] = read()
+        return self.values[name]
+
+    def invalidate(self, *names):
+        """ Drops `names` (all values without any) to be read again on next use.
+        """
+        if not names:
+            names = list(self.values)
+        for name in names:
+            self.values.pop(name, None)
+
+    @property
+    def private_agents(self):
+        return self.cached('private_agents', get_private_agents)
+
+    @property
+    def public_agents(self):
+        return self.cached('public_agents', get_public_agents)
+
+    @property
+    def masters(self):
+        return self.cached('masters', shakedown.get_all_masters)
+
+    @property
+    def resources(self):
+        return self.cached('resources', available_resources)
+
+    @property
+    def public_resources(self):
+        return len(self.public_agents) * Resources(4, 14018.0)
+
+    @property
+    def private_resources(self):
+        return self.resources - self.public_resources
+
+    @property
+    def dcos_version(self):
+        return self.cached('dcos_version', dcos_version)
+
+    @property
+    def marathon_version(self):
+        return self.cached('marathon_version', get_marathon_version)
+
+    @property
+    def security(self):
+        def read_security():
+            try:
+                return ee_version()
+            except:
+                return None
+
+        return self.cached('security', read_security)
+
+    def metadata(self):
+        metadata = {
+            'dcos-version': self.dcos_version,
+            'marathon-version': self.marathon_version,
+            'private-agents': len(self.private_agents),
+            'master-count': len(self.masters),
+            'resources': {
+                'cpus': self.resources.cpus,
+                'memory': self.resources.mem
+            },
+            'marathon': 'root'
+        }
+
+        if self.security is not None:
+            metadata['security'] = self.security
+
+        return metadata
 
-    if version is not None:
-        metadata['security'] = version
 
-    return metadata
+# the snapshot of the current phase, see `cluster_snapshot`
+current_snapshot = None
+
+
+def cluster_snapshot():
+    """ The snapshot of the cluster, taken on the first call after `invalidate_cluster_snapshot`.
+    """
+    global current_snapshot
+    if current_snapshot is None:
+        current_snapshot = ClusterSnapshot()
+    return current_snapshot
+
+
+def invalidate_cluster_snapshot():
+    """ Starts a new phase, the next `cluster_snapshot` reads the cluster again.
+    """
+    global current_snapshot
+    current_snapshot = None
+
+
+def get_cluster_metadata():
+    return cluster_snapshot().metadata()
 
 
 def get_marathon_version():
@@ -573,6 +1132,7 @@ def install_mom(version='v1.3.6'):
     client.add_app(get_mom_json(version))
     print("Installing MoM: {}".format(version))
     deployment_wait()
+    invalidate_cluster_snapshot()
 
 
 def uninstall_mom():
@@ -608,6 +1168,7 @@ def uninstall_mom():
                 pass
 
     delete_zk_node('universe/marathon-user')
+    invalidate_cluster_snapshot()
 
 
 def wait_for_marathon_up(test_obj=None, timeout=60 * 5):
@@ -651,7 +1212,7 @@ def is_mom_version(version):
     while not check_complete:
         try:
             max_times == 1
-            with shakedown.marathon_on_marathon()::
+            with shakedown.marathon_on_marathon():
                 client = marathon.create_client()
                 about = client.get_about()
                 same_version = version == about.get("version")
@@ -699,16 +1260,45 @@ class DCOSNotScalingException(DCOSException):
         return self.message
 
 
-class LaunchResults(object):
-    """ Provides timing and test data for the first phase of a ScaleTest.
+class PhaseResults(object):
+    """ Response time data common to the phases of a ScaleTest.
+        Every call against marathon in a phase is timed with a monotonic clock into a
+        histogram for its endpoint (ex. `add_app` or `get_deployments`).
     """
 
     def __init__(self, this_test):
         self.success = False
-        self.avg_response_time = 0.0
         self.last_response_time = 0.0
+        self.response_times = {}
         self.start = this_test.start
         self.current_test = this_test
+        self.lock = threading.Lock()
+
+    @property
+    def avg_response_time(self):
+        return round(self.all_response_times().mean(), 3)
+
+    def record_response_time(self, endpoint, response_time):
+        """ Records the duration in seconds of a single call to `endpoint`.
+        """
+        with self.lock:
+            histogram = self.response_times.setdefault(endpoint, Histogram())
+        histogram.record(response_time)
+        self.last_response_time = response_time
+        self.current_test.controller.observe_response(response_time)
+
+    def all_response_times(self):
+        with self.lock:
+            return merged(self.response_times.values())
+
+    def response_time_summary(self):
+        with self.lock:
+            return {endpoint: histogram.summary() for endpoint, histogram in self.response_times.items()}
+
+
+class LaunchResults(PhaseResults):
+    """ Provides timing and test data for the first phase of a ScaleTest.
+    """
 
     def __str__(self):
         return "launch  success: {} avg response time: {} last response time: {}".format(
@@ -722,42 +1312,30 @@ class LaunchResults(object):
             self.avg_response_time,
             self.last_response_time)
 
-    def current_response_time(self, response_time):
-        if response_time > 0.0:
-            self.last_response_time = response_time
-            if self.avg_response_time == 0.0:
-                self.avg_response_time = response_time
-            else:
-                self.avg_response_time = (self.avg_response_time + response_time)/2
-
     def completed(self):
         self.success = True
-        self.current_response_time(time.time())
         self.current_test.add_event('launch successful')
+        self.current_test.end_launch_phase()
 
     def failed(self, message='', failure_type=ERROR_LAUNCH):
         self.success = False
-        self.current_response_time(time.time())
         self.current_test.add_event('{} {}'.format(failure_type, message))
+        self.current_test.end_launch_phase()
 
 
-class DeployResults(object):
+class DeployResults(PhaseResults):
     """ Provides timing and test data for the second phase of a ScaleTest.
     """
 
     def __init__(self, this_test):
-        self.success = False
-        self.avg_response_time = 0.0
-        self.last_response_time = 0.0
+        super(DeployResults, self).__init__(this_test)
         self.current_scale = 0
         self.target = this_test.target
-        self.start = this_test.start
-        self.current_test = this_test
         self.end_time = None
 
     def __str__(self):
         return "deploy  failure: {} avg response time: {} last response time: {} scale: {}".format(
-            self.failure,
+            self.success,
             self.avg_response_time,
             self.last_response_time,
             self.current_scale)
@@ -795,38 +1373,28 @@ class DeployResults(object):
     def is_target_reached(self):
         return self.current_scale >= self.target
 
-    def current_response_time(self, response_time):
-        if response_time > 0.0:
-            self.last_response_time = response_time
-            if self.avg_response_time == 0.0:
-                self.avg_response_time = response_time
-            else:
-                self.avg_response_time = (self.avg_response_time + response_time)/2
-
     def completed(self):
         self.success = True
         self.current_test.successful()
-        self.current_response_time(time.time())
         self.current_test.add_event('Deployment successful')
         self.current_test.add_event('Scale reached: {}'.format(self.current_scale))
+        self.current_test.trace.end('deploy', {'scale': self.current_scale})
 
     def failed(self, message='', failure_type=ERROR_DEPLOYMENT):
         self.current_test.failed(message)
         self.success = False
-        self.current_response_time(time.time())
         self.current_test.add_event('Scale reached: {}'.format(self.current_scale))
         self.current_test.add_event('{} {}'.format(failure_type, message))
+        self.current_test.trace.end('deploy', {'scale': self.current_scale})
 
 
-class UnDeployResults(object):
+class UnDeployResults(PhaseResults):
     """ Provides timing and test data for the last phase of a ScaleTest.
     """
 
     def __init__(self, this_test):
+        super(UnDeployResults, self).__init__(this_test)
         self.success = True
-        self.avg_response_time = 0.0
-        self.last_response_time = 0.0
-        self.start = this_test.start
 
     def __str__(self):
         return "undeploy  failure: {} avg response time: {} last response time: {}".format(
@@ -841,6 +1409,51 @@ class UnDeployResults(object):
             self.last_response_time)
 
 
+class TimedClient(object):
+    """ Wraps a marathon client and records the response time of each call
+        with the `results` of a test phase, keyed by the client method name.
+    """
+
+    def __init__(self, client, results):
+        self.client = client
+        self.results = results
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def timed_call(*args, **kwargs):
+            with timed(self.results, name):
+                return attr(*args, **kwargs)
+
+        return timed_call
+
+
+def timed_client(results=None):
+    """ Creates a marathon client which times its calls into `results` if provided.
+    """
+    with tracing.span('create_client'):
+        client = marathon.create_client()
+    if results is None:
+        return client
+    return TimedClient(client, results)
+
+
+@contextlib.contextmanager
+def timed(results, endpoint):
+    """ Context manager which records the duration of its block as a response time
+        of `endpoint` with `results` (ignored if None) and as a span of the trace.
+    """
+    start = time.monotonic()
+    try:
+        with tracing.span(endpoint, 'marathon'):
+            yield
+    finally:
+        if results is not None:
+            results.record_response_time(endpoint, time.monotonic() - start)
+
+
 class ScaleTest(object):
     """ Defines a marathon scale test and collects the scale test data.
         A scale test has 3 phases of interest:  1) launching, 2) deploying and 3) undeploying
@@ -876,6 +1489,27 @@ class ScaleTest(object):
         self.undeploy_time = None
         self.skipped = False
         self.loop_count = 0
+        self.tracker = None
+        self.task_timer = TaskTimer()
+
+        # deploy time predicted before the test, see planner.py
+        self.predicted_time = None
+
+        # deployments started by the launches of the test, see `launched`
+        self.deployment_ids = set()
+
+        # spans of the test, written as trace-<name>.json (see tracing.py)
+        self.trace = tracing.TraceRecorder(name)
+        tracing.activate(self.trace)
+
+        # sharded group tests only
+        self.shards = 1
+        self.shard_size = None
+        self.controller = create_controller(
+            LOAD_CONTROLLER,
+            self,
+            concurrency=LAUNCH_CONCURRENCY,
+            max_concurrency=LAUNCH_MAX_CONCURRENCY)
 
         # results are in these objects
         self.launch_results = LaunchResults(self)
@@ -897,6 +1531,7 @@ class ScaleTest(object):
             len(self.events))
 
     def add_event(self, eventInfo):
+        self.trace.mark(eventInfo, 'event')
         self.events.append('{} {} (time in test: {})'.format(EVENT_HEADER, eventInfo, pretty_duration_safe(elapse_time(self.start))))
 
     def _status(self, status):
@@ -920,9 +1555,23 @@ class ScaleTest(object):
         self._status('skipped')
         self.skipped = True
 
+    def launched(self, deployment_id):
+        """ Records the deployment started by a launch of the test (ignored if None).
+        """
+        if deployment_id is not None:
+            self.deployment_ids.add(deployment_id)
+
+    def end_launch_phase(self):
+        """ Ends the launch phase of the trace and starts its deploy phase.
+        """
+        if 'launch' in self.trace.phases:
+            self.trace.end('launch')
+            self.trace.begin('deploy')
+
     def undeploy_complete(self, start):
         self.add_event('Undeployment complete')
         self.undeploy_time = elapse_time(start)
+        self.trace.complete('undeploy', 'phase', start * 1000000, tracing.now_us())
 
     def start_test(self):
         """ Starts the timers for the test.   There can be a delay of cleanup of the
@@ -936,6 +1585,7 @@ class ScaleTest(object):
         self.launch_results.start = start_time
         self.deploy_results.start = start_time
         self.undeploy_results.start = start_time
+        self.trace.begin('launch')
 
     def increment_loop_count(self):
         self.loop_count = self.loop_count + 1
@@ -948,10 +1598,32 @@ class ScaleTest(object):
             print(event)
 
     def log_stats(self):
-        print('    *status*: {}, deploy: {}, undeploy: {}'.format(
+        print('    *status*: {}, deploy: {} (predicted: {}), undeploy: {}'.format(
             self.status,
             pretty_duration_safe(self.test_time),
+            pretty_duration_safe(self.predicted_time),
             pretty_duration_safe(self.undeploy_time)))
+        print('    *response times*: {}'.format(self.response_times()))
+        print('    *time to staging*: {}'.format(self.task_timer.staging))
+        print('    *time to running*: {}'.format(self.task_timer.running))
+        print('    *load controller*: {}'.format(self.controller))
+
+    def phases(self):
+        return {
+            'launch': self.launch_results,
+            'deploy': self.deploy_results,
+            'undeploy': self.undeploy_results
+        }
+
+    def response_times(self):
+        """ Histogram of the response times of all marathon calls made by the test.
+        """
+        return merged(results.all_response_times() for results in self.phases().values())
+
+    def response_time_summary(self):
+        """ Response time percentiles of the test by phase and endpoint.
+        """
+        return {phase: results.response_time_summary() for phase, results in self.phases().items()}
 
 
 def start_test(name, marathons=None):
@@ -966,28 +1638,32 @@ def start_test(name, marathons=None):
     return test
 
 
-def create_test_object(marathon_name='root', under_test='apps', style='instances', num_apps=1, num_instances=1):
+def create_test_object(marathon_name='root', under_test='apps', style='instances', num_apps=1, num_instances=1,
+                       shards=None):
+    """ Creates a ScaleTest.  With `shards` the apps of a group test are posted as that many sub groups.
+    """
     test_name = 'test_{}_{}_{}_{}_{}'.format(marathon_name, under_test, style, num_apps, num_instances)
+    if shards is not None:
+        test_name = '{}_{}'.format(test_name, shards)
     test = ScaleTest(test_name, marathon_name, under_test, style, num_apps, num_instances)
     test.mom_version = marathon_name
+    if shards is not None:
+        test.shards = int(shards)
+        test.shard_size = int(math.ceil(test.count / float(test.shards)))
     return test
 
 
 def scaletest_resources(test_obj):
-
-    @retrying.retry(wait_fixed=1000, stop_max_delay=10000)
-    def get_resource_need():
-        return resources_needed(test_obj.target, .01, 32)
-
-    return get_resource_need()
+    """ The resources needed by the tasks of a test, computed without asking the cluster.
+    """
+    return resources_needed(test_obj.target, .01, 32)
 
 
 def outstanding_deployments():
     """ Provides a count of deployments still looking to land.
     """
     count = 0
-    client = marathon.create_client()
-    queued_apps = client.get_queued_apps()
+    queued_apps = stream_json(marathon_url('v2/queue'), ['queue', '*'], ['count'])
     for app in queued_apps:
         count = count + app['count']
 
@@ -1000,19 +1676,46 @@ def is_deployment_active():
 
 
 def current_scale():
-    """ Provides a count of tasks which are running on Mesos.  The default
-        app_id is None which provides a count of all tasks.
+    """ Provides a count of tasks which are active (not terminal) on Mesos.
+        The count is read from the master metrics snapshot, which is a few hundred bytes
+        regardless of scale.  If metrics are unavailable the full task list is counted.
     """
-    return len(get_active_tasks())
+    try:
+        return mesos_task_count()
+    except Exception:
+        return sum(1 for task in active_tasks(['id']))
+
+
+def mesos_task_count():
+    """ Sums the active task gauges of the Mesos master metrics snapshot.
+    """
+    response = http.get(dcos_url_path('mesos/metrics/snapshot'))
+    metrics = response.json()
+    return int(sum(metrics[gauge] for gauge in ACTIVE_TASK_METRICS))
 
 
 def current_marathon_scale(app_id=None):
     """ Provides a count of tasks which are running on marathon.  The default
         app_id is None which provides a count of all tasks.
     """
-    client = marathon.create_client()
-    tasks = client.get_tasks(app_id)
-    return len(tasks)
+    return sum(1 for task in marathon_tasks(app_id, ['id']))
+
+
+def marathon_tasks(app_id=None, fields=None):
+    """ Streams the tasks of marathon, or of the app `app_id`, keeping only `fields`.
+    """
+    if app_id is None:
+        url = marathon_url('v2/tasks')
+    else:
+        url = marathon_url('v2/apps/{}/tasks'.format(app_id.strip('/')))
+    return stream_json(url, ['tasks', '*'], fields)
+
+
+def active_tasks(fields=None):
+    """ Streams the active tasks of all frameworks from the Mesos master state, keeping only `fields`.
+        At 50k tasks the state is tens of megabytes, which is never loaded as a whole.
+    """
+    return stream_json(dcos_url_path('mesos/master/state'), ['frameworks', '*', 'tasks', '*'], fields)
 
 
 def commaify(number):
@@ -1047,11 +1750,11 @@ def start_root_marathon():
 
 
 def private_resources_available():
-    return available_resources() - public_resources_available()
+    return cluster_snapshot().private_resources
 
 
 def public_resources_available():
-    return len(get_public_agents()) * Resources(4, 14018.0)
+    return cluster_snapshot().public_resources
 
 
 @retrying.retry(wait_fixed=1000, stop_max_delay=3000)
@@ -1077,15 +1780,67 @@ def clean_marathon_state(test_obj=None):
     ensure_clean_state(test_obj)
 
 
+def total_errors(events):
+    error_events = [event for event in events if is_error(event)]
+    return len(error_events)
+
+
+def is_error(event):
+    # strip 'event: header'
+    message = event[len(EVENT_HEADER) + 1:]
+    # take the event message if any
+    event_header = message[:message.find(':') + 1]
+    return event_header in ERRORS
+
+
+def pass_status(test, successful):
+    if test.skipped:
+        return 's'
+    if successful:
+        return 'p'
+    else:
+        return 'f'
+
+
 def get_test_style_key_base(current_test):
     """ The style key is historical and is the key to recording test results.
     For root marathon the key is `root_instances` or `root_group`.
+    Sharded group tests include their shard size, ex. `root_group-shard1000`.
     """
-    return get_style_key_base(current_test.mom, current_test.style)
+    return get_style_key_base(current_test.mom, get_test_style(current_test))
 
 
 def get_test_key(current_test, key):
-    return get_key(current_test.mom, current_test.style, key)
+    return get_key(current_test.mom, get_test_style(current_test), key)
+
+
+def get_test_style(current_test):
+    return sharded_style(current_test.style, current_test.shard_size)
+
+
+def sharded_style(style, shard_size=None):
+    """ The style of a test in the stats keys, with the shard size of sharded tests, ex. `group-shard1000`.
+    """
+    if shard_size is None:
+        return style
+    return '{}-shard{}'.format(style, shard_size)
+
+
+def shard_size_of(style):
+    """ The shard size of a sharded style, otherwise None.
+    """
+    if '-shard' not in style:
+        return None
+    return int(style.split('-shard')[1])
+
+
+def stats_styles(stats, marathon_name='root'):
+    """ The test styles with stats, `TEST_STYLES` first and then the sharded styles by shard size.
+    """
+    prefix = get_style_key_base(marathon_name, '')
+    styles = set(key[len(prefix):].split('_')[0] for key in stats if key.startswith(prefix))
+    sharded = sorted((style for style in styles if shard_size_of(style) is not None), key=shard_size_of)
+    return TEST_STYLES + sharded
 
 
 def get_style_key_base(marathon_name, style):
@@ -1097,26 +1852,8 @@ def get_key(marathon_name, style, key):
 
 
 def empty_stats():
-        return {
-            'root_instances_target': [],
-            'root_instances_max': [],
-            'root_instances_deploy_time': [],
-            'root_instances_human_deploy_time': [],
-            'root_instances_launch_status': [],
-            'root_instances_deployment_status': [],
-            'root_instances_errors': [],
-            'root_count_target': [],
-            'root_count_max': [],
-            'root_count_deploy_time': [],
-            'root_count_human_deploy_time': [],
-            'root_count_launch_status': [],
-            'root_count_deployment_status': [],
-            'root_count_errors': [],
-            'root_group_target': [],
-            'root_group_max': [],
-            'root_group_deploy_time': [],
-            'root_group_human_deploy_time': [],
-            'root_group_launch_status': [],
-            'root_group_deployment_status': [],
-            'root_group_errors': []
-        }
+    stats = {}
+    for style in TEST_STYLES:
+        for stat_key in STAT_KEYS:
+            stats[get_key('root', style, stat_key)] = []
+    return stats
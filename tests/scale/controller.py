@@ -0,0 +1,192 @@
+import threading
+
+from histogram import Histogram
+"""
+    Load controllers for scale tests.
+    A controller decides how long the harness waits between polls and how many launch
+    requests it keeps in flight, based on the response times and errors it observes.
+"""
+
+CONTROLLER_EVENT = 'Load controller:'
+
+# errors which mean marathon is overloaded rather than the request being wrong
+OVERLOAD_ERRORS = ['Futures timed out', '503', 'Service Unavailable', 'timed out', 'Read timed out',
+                   'Connection aborted', 'Max retries exceeded']
+
+
+def is_overload_error(message):
+    message = str(message)
+    return any(overload in message for overload in OVERLOAD_ERRORS)
+
+
+class LoadController(object):
+    """ Base of the load controllers.  Holds the current poll interval (seconds) and launch
+        concurrency within their bounds and logs every change into the events of the test.
+        Subclasses react to `observe_response` and `observe_error`.
+    """
+
+    def __init__(self, test_obj, concurrency=10, min_concurrency=1, max_concurrency=64,
+                 interval=1.0, min_interval=0.5, max_interval=15.0, max_backoff=60.0):
+        self.test_obj = test_obj
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_backoff = max_backoff
+        self.lock = threading.RLock()
+
+    def __str__(self):
+        return "{} concurrency: {} interval: {}".format(type(self).__name__, self.concurrency, self.interval)
+
+    def observe_response(self, response_time):
+        """ Called with the duration in seconds of each marathon call.
+        """
+        pass
+
+    def observe_error(self, message):
+        """ Called with the message of each error event of the test.
+        """
+        pass
+
+    def poll_interval(self, failure_count=0):
+        """ Seconds to wait before polling marathon again.
+        """
+        return self.interval
+
+    def backoff_time(self, failure_count):
+        """ Seconds to wait after `failure_count` consecutive failures.
+        """
+        return min(self.max_backoff, self.interval * 2 ** failure_count)
+
+    def launch_concurrency(self):
+        """ Number of launch requests to keep in flight.
+        """
+        return self.concurrency
+
+    def _set(self, concurrency, interval, reason):
+        concurrency = int(max(self.min_concurrency, min(self.max_concurrency, concurrency)))
+        interval = round(max(self.min_interval, min(self.max_interval, interval)), 3)
+        with self.lock:
+            if concurrency == self.concurrency and interval == self.interval:
+                return
+            self.test_obj.add_event('{} concurrency {} -> {}, interval {} -> {} ({})'.format(
+                CONTROLLER_EVENT,
+                self.concurrency,
+                concurrency,
+                self.interval,
+                interval,
+                reason))
+            self.concurrency = concurrency
+            self.interval = interval
+
+
+class StepController(LoadController):
+    """ The original fixed backoff: poll every 1s, or 5s when the last response took
+        longer than 8s, +5/+10s on consecutive failures and `failure_count * 10` for scale errors.
+        Launch concurrency is fixed.
+    """
+
+    def poll_interval(self, failure_count=0):
+        deploy_results = self.test_obj.deploy_results
+
+        wait_time = 1
+        if deploy_results.last_response_time < 1:
+            wait_time = 1
+        elif deploy_results.last_response_time > 8:
+            wait_time = 5
+
+        if failure_count > 3 and failure_count < 7:
+            wait_time = wait_time + 5
+        elif failure_count > 7:
+            wait_time = wait_time + 10
+
+        return wait_time
+
+    def backoff_time(self, failure_count):
+        return failure_count * 10
+
+
+class AIMDController(LoadController):
+    """ Additive increase, multiplicative decrease.
+        After each round of `concurrency` responses faster than `latency_target` the concurrency
+        grows by 1 and the poll interval shrinks by `interval_step`.  A response slower than the
+        target or an overload error ("Futures timed out", 503, timeouts) halves the concurrency
+        and doubles the interval, at most once per round so a burst counts once.
+    """
+
+    def __init__(self, test_obj, latency_target=1.0, interval_step=0.5, **kwargs):
+        super(AIMDController, self).__init__(test_obj, **kwargs)
+        self.latency_target = latency_target
+        self.interval_step = interval_step
+        self.observed = 0
+        self.backed_off = False
+
+    def observe_response(self, response_time):
+        with self.lock:
+            if response_time > self.latency_target:
+                self._decrease('response time {:.3f}s over target {}s'.format(response_time, self.latency_target))
+
+            # end of round
+            self.observed += 1
+            if self.observed >= self.concurrency:
+                if not self.backed_off:
+                    self._set(self.concurrency + 1, self.interval - self.interval_step, 'round under latency target')
+                self.observed = 0
+                self.backed_off = False
+
+    def observe_error(self, message):
+        if is_overload_error(message):
+            with self.lock:
+                self._decrease('overload error')
+
+    def _decrease(self, reason):
+        if self.backed_off:
+            return
+        self.backed_off = True
+        self._set(self.concurrency // 2, self.interval * 2, reason)
+
+
+class LatencyTargetController(LoadController):
+    """ Steers towards a p90 response time of `latency_target`.
+        At the end of each window of `window` responses the concurrency is scaled by
+        target / p90 (by at most half or 1.5x) and the poll interval is set to
+        `interval_factor` times the p90.  Overload errors halve the concurrency and double the interval.
+    """
+
+    def __init__(self, test_obj, latency_target=1.0, window=20, interval_factor=4.0, **kwargs):
+        super(LatencyTargetController, self).__init__(test_obj, **kwargs)
+        self.latency_target = latency_target
+        self.window = window
+        self.interval_factor = interval_factor
+        self.histogram = Histogram()
+
+    def observe_response(self, response_time):
+        self.histogram.record(response_time)
+        with self.lock:
+            if self.histogram.count < self.window:
+                return
+
+            p90 = max(self.histogram.percentile(90), 0.001)
+            self.histogram = Histogram()
+            ratio = max(0.5, min(1.5, self.latency_target / p90))
+            self._set(round(self.concurrency * ratio), p90 * self.interval_factor,
+                      'p90 {:.3f}s for target {}s'.format(p90, self.latency_target))
+
+    def observe_error(self, message):
+        if is_overload_error(message):
+            self._set(self.concurrency // 2, self.interval * 2, 'overload error')
+
+
+CONTROLLERS = {
+    'step': StepController,
+    'aimd': AIMDController,
+    'latency': LatencyTargetController
+}
+
+
+def create_controller(name, test_obj, **kwargs):
+    """ Creates the load controller registered as `name` for `test_obj`.
+    """
+    return CONTROLLERS[name](test_obj, **kwargs)
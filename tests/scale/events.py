@@ -0,0 +1,206 @@
+import json
+import logging
+import socket
+import threading
+import time
+
+from utils import keep_alive_session, marathon_url
+"""
+    Marathon event stream tracking for scale tests.
+    Subscribes to `/v2/events` so deployment progress is seen as it happens instead of
+    being polled for.
+"""
+
+RECONCILE_INTERVAL = 60
+
+TRACKED_EVENTS = ['status_update_event', 'deployment_success', 'deployment_failed']
+
+TASK_TERMINAL_STATES = ['TASK_FINISHED', 'TASK_FAILED', 'TASK_KILLED', 'TASK_LOST', 'TASK_ERROR',
+                        'TASK_DROPPED', 'TASK_GONE', 'TASK_GONE_BY_OPERATOR']
+
+
+class DeploymentTracker(object):
+    """ Keeps the active tasks and the finished deployment ids of marathon up to date from
+        the `status_update_event` and deployment events of the `/v2/events` SSE stream.
+        The stream is read by a daemon thread from `start()` until `stop()`.
+        Listeners added with `add_listener` are called with every event after it was tracked.
+
+        Events can be missed (ex. on reconnect) so the tracker is reconciled with a full
+        poll from time to time.  `needs_reconcile()` reports when that is due: before the
+        first reconcile, after a reconnect and every `reconcile_interval` seconds.
+        A poll is started with `mark()` so events which arrive while it runs are kept.
+    """
+
+    def __init__(self, reconcile_interval=RECONCILE_INTERVAL):
+        self.url = marathon_url('v2/events')
+        self.session = keep_alive_session(1)
+        self.reconcile_interval = reconcile_interval
+        self.tasks = {}
+        # event number of the last status update of each task, see `mark`
+        self.updated = {}
+        self.terminated = set()
+        self.finished = set()
+        self.event_count = 0
+        self.connected = False
+        self.last_reconcile = None
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.response = None
+        self.thread = None
+        self.listeners = []
+
+    def start(self, timeout=10):
+        """ Starts reading the event stream.  Returns True if it connected within `timeout`
+            seconds, otherwise it keeps trying to connect in the background.
+        """
+        self.thread = threading.Thread(target=self._run, name='marathon-events')
+        self.thread.daemon = True
+        self.thread.start()
+        with self.condition:
+            self.condition.wait_for(lambda: self.connected or self.stopped.is_set(), timeout)
+            return self.connected
+
+    def stop(self):
+        self.stopped.set()
+        self._disconnect()
+        with self.condition:
+            self.connected = False
+            self.condition.notify_all()
+
+    def add_listener(self, listener):
+        """ Calls `listener(event)` from the reading thread for every event of the stream.
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def active_count(self):
+        """ Number of tasks which are not in a terminal state.
+        """
+        with self.condition:
+            return len(self.tasks)
+
+    def running_count(self):
+        with self.condition:
+            return len([state for state in self.tasks.values() if state == 'TASK_RUNNING'])
+
+    def wait_for(self, predicate, timeout):
+        """ Waits up to `timeout` seconds until `predicate(tracker)` is true.
+            Returns early with False if the stream disconnects.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: predicate(self) or not self.connected, timeout)
+            return predicate(self)
+
+    def needs_reconcile(self):
+        with self.condition:
+            return (not self.connected or
+                    self.last_reconcile is None or
+                    time.monotonic() - self.last_reconcile > self.reconcile_interval)
+
+    def mark(self):
+        """ Returns the position in the event stream to pass to `reconcile` with a poll started now.
+        """
+        with self.condition:
+            return self.event_count
+
+    def reconcile(self, task_states=None, since=None):
+        """ Merges `task_states`, a map of task id to task state from a full poll started at the
+            `mark()` `since`, into the tracked tasks.  Tasks updated by the stream after `since` keep
+            their streamed state, others take the state of the poll or are dropped if it does not
+            have them.  Tasks the stream already reported as terminated are ignored.
+            Without `since` the poll replaces the tracked tasks.
+            Without `task_states` the tracked tasks are confirmed as they are.
+        """
+        with self.condition:
+            if task_states is not None:
+                since = self.event_count if since is None else since
+                tasks = {task_id: state for task_id, state in task_states.items()
+                         if task_id not in self.terminated and state not in TASK_TERMINAL_STATES}
+                for task_id, state in self.tasks.items():
+                    if self.updated.get(task_id, 0) > since:
+                        tasks[task_id] = state
+                self.tasks = tasks
+                self.updated = {task_id: number for task_id, number in self.updated.items() if number > since}
+            self.last_reconcile = time.monotonic()
+            self.condition.notify_all()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                self._stream()
+            except Exception as e:
+                if not self.stopped.is_set():
+                    logging.debug('Marathon event stream failed: %s', e)
+
+            with self.condition:
+                # events may have been missed while disconnected
+                self.connected = False
+                self.last_reconcile = None
+                self.condition.notify_all()
+            self.stopped.wait(1)
+
+        self.session.close()
+
+    def _disconnect(self):
+        """ Closing the response would block until the reading thread is done with it.
+            Shutting down the socket unblocks the read instead.
+        """
+        try:
+            self.response.raw.connection.sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+
+    def _stream(self):
+        self.response = self.session.get(
+            self.url,
+            params={'event_type': TRACKED_EVENTS},
+            headers={'Accept': 'text/event-stream'},
+            stream=True,
+            timeout=(10, None))
+        try:
+            self.response.raise_for_status()
+            with self.condition:
+                self.connected = True
+                self.condition.notify_all()
+
+            data = []
+            for line in self.response.iter_lines():
+                if self.stopped.is_set():
+                    return
+                if isinstance(line, bytes):
+                    line = line.decode('utf-8')
+
+                # an empty line dispatches the event
+                if line:
+                    if line.startswith('data:'):
+                        data.append(line[5:].strip())
+                elif data:
+                    self._on_event(json.loads('\n'.join(data)))
+                    data = []
+        finally:
+            self.response.close()
+
+    def _on_event(self, event):
+        event_type = event.get('eventType')
+        with self.condition:
+            self.event_count += 1
+            if event_type == 'status_update_event':
+                task_id = event['taskId']
+                self.updated[task_id] = self.event_count
+                if event['taskStatus'] in TASK_TERMINAL_STATES:
+                    self.tasks.pop(task_id, None)
+                    self.terminated.add(task_id)
+                else:
+                    self.tasks[task_id] = event['taskStatus']
+            elif event_type in ['deployment_success', 'deployment_failed']:
+                self.finished.add(event['id'])
+            self.condition.notify_all()
+
+        for listener in list(self.listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                logging.debug('Marathon event listener failed: %s', e)
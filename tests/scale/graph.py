@@ -4,22 +4,71 @@ import click
 import csv
 import json
 import math
-import matplotlib.pyplot as plt
-import numpy as np
+import os
+import svgplot
 import sys
+import warnings
 
 from dcos.errors import DCOSException
 
-from common import get_key, empty_stats
+from common import get_key, empty_stats, shard_size_of, stats_styles, STAT_KEYS
+from store import ResultStore
 """
     Graph functions for scale graphs.
     Prints 1up and 2up graphs of scale timings and errors.
 
-    If you are running this on a Mac, you will likely need to create a ~/.matplotlib/matplotlibrc
-    file and include `backend: TkAgg`.
-    http://stackoverflow.com/questions/21784641/installation-issue-with-matplotlib-python
+    matplotlib (and numpy) are only imported when a graph is rendered, with the non interactive
+    Agg backend, so importing this module is cheap and rendering works without a display.
+    Graphs named *.svg are rendered by svgplot.py, which needs neither.
+
+    Several runs (csv files or stored runs) can be compared against a baseline run:
+    ./graph.py --compare old.csv --compare new.csv
+    ./graph.py --store scale-results.db --compare-last 5 --threshold 0.2
+    which graphs them to compare.png and writes the verdict to verdict.json.
 """
 
+# matplotlib only renders to files, which works on hosts without a display
+MATPLOTLIB_BACKEND = 'Agg'
+
+# a deploy time more than this fraction slower than the baseline is a regression
+REGRESSION_THRESHOLD = 0.2
+
+# more errors than the baseline by more than this is a regression
+ERROR_THRESHOLD = 0
+
+
+def pyplot():
+    """ Imports matplotlib.pyplot with the non interactive backend on first use.
+    """
+    import matplotlib
+    matplotlib.use(MATPLOTLIB_BACKEND)
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def subplots(file_name, nrows=1):
+    """ Creates the figure of `nrows` plots to save as `file_name`.
+        Returns the figure, the list of its plots and the file name to save it as, which is
+        changed to .svg when matplotlib is not installed.
+    """
+    if not file_name.endswith('.svg'):
+        try:
+            plt = pyplot()
+            fig, plots = plt.subplots(nrows=nrows)
+            return fig, plots.tolist() if nrows > 1 else [plots], file_name
+        except ImportError as e:
+            file_name = '{}.svg'.format(os.path.splitext(file_name)[0])
+            print('{}, rendering {} instead'.format(e, file_name))
+
+    fig, plots = svgplot.subplots(nrows=nrows)
+    return fig, plots if nrows > 1 else [plots], file_name
+
+
+def save_figure(fig, file_name):
+    fig.savefig(file_name)
+    if not isinstance(fig, svgplot.SvgFigure):
+        pyplot().close(fig)
+
 
 def index_of_first_failure(stats, marathon_type, test_type):
     """ Finds the first occurance of an error during a deployment
@@ -37,11 +86,9 @@ def index_of_first_failure(stats, marathon_type, test_type):
 def pad(array, size):
     current_size = len(array)
     if current_size < size:
-        pad = np.zeros(size - current_size)
-        padded = array.tolist() + pad.tolist()
-        return np.array(padded)
+        return list(array) + [0.0] * (size - current_size)
     else:
-        return array
+        return list(array)
 
 
 def plot_test_timing(plot, stats, marathon_type, test_type, xticks):
@@ -65,9 +112,8 @@ def plot_test_timing(plot, stats, marathon_type, test_type, xticks):
     if deploy_time is None or len(deploy_time) == 0 or deploy_time[0] <= 0.0:
         return
 
-    timings = np.array(deploy_time)
     title = '{} Scale Times'.format(test_type.title())
-    timings = pad(timings, len(xticks))
+    timings = pad(deploy_time, len(xticks))
     timings_handle, = plot.plot(xticks, timings, label=title)
 
     fail_index = index_of_first_failure(stats, marathon_type, test_type)
@@ -106,9 +152,8 @@ def plot_test_errors(plot, stats, marathon_type, test_type, xticks):
         return 0
 
     plot.set_title("Errors During Test")
-    errors = np.array(test_errors)
     title = '{} Errors'.format(test_type.title())
-    errors = pad(errors, len(errors))
+    errors = pad(test_errors, len(xticks))
     errors_handle, = plot.plot(xticks, errors, label=title, marker='o', linestyle='None')
     return max(test_errors)
 
@@ -117,6 +162,7 @@ def create_scale_graph(stats, metadata, file_name='scale.png'):
     """ Creates a 1up or 2up scale graph depending on if error information is provided.
         The first 1up graph "time_plot", is x = scale and y = time to reach scale
         The second graph "error_plot", is an error graph that plots the number of errors that occurred during the test.
+        The marathon response times and the task time to running are graphed below when they were recorded.
 
         :param stats: This map contains the data to be plotted
         :type stats: map
@@ -131,18 +177,29 @@ def create_scale_graph(stats, metadata, file_name='scale.png'):
 
     marathon_type = metadata['marathon']
     error_plot = None
+    response_plot = None
+    running_plot = None
     fig = None
     time_plot = None
 
     # figure and plots setup
-    if error_graph_enabled(stats, marathon_type, test_types):
-        fig, (time_plot, error_plot) = plt.subplots(nrows=2)
-    else:
-        fig, time_plot = plt.subplots(nrows=1)
+    error_enabled = error_graph_enabled(stats, marathon_type, test_types)
+    response_enabled = percentile_graph_enabled(stats, marathon_type, test_types, 'response')
+    running_enabled = percentile_graph_enabled(stats, marathon_type, test_types, 'running')
+    nrows = 1 + int(error_enabled) + int(response_enabled) + int(running_enabled)
+    fig, plots, file_name = subplots(file_name, nrows)
+    plots = list(plots)
+    time_plot = plots.pop(0)
+    if error_enabled:
+        error_plot = plots.pop(0)
+    if response_enabled:
+        response_plot = plots.pop(0)
+    if running_enabled:
+        running_plot = plots.pop(0)
 
     # figure size, borders and padding
     fig.subplots_adjust(left=0.12, bottom=0.08, right=0.90, top=0.90, wspace=0.25, hspace=0.40)
-    fig.set_size_inches(8.5, 6)
+    fig.set_size_inches(8.5, 3 * nrows)
 
     # Titles and X&Y setup
     time_plot.title.set_text('Marathon Scale Test for v{}'.format(metadata['marathon-version']))
@@ -150,10 +207,12 @@ def create_scale_graph(stats, metadata, file_name='scale.png'):
     if targets is None:
         raise GraphException('Unable to create graph due without targets')
 
-    xticks = np.array(range(len(targets)))
+    xticks = list(range(len(targets)))
 
-    plt.xticks(xticks, targets)
-    time_plot.set_xticks(xticks, targets)
+    for plot in [time_plot, error_plot, response_plot, running_plot]:
+        if plot is not None:
+            plot.set_xticks(xticks)
+            plot.set_xticklabels([int(target) for target in targets])
     agents, cpus, mem = get_resources(metadata)
     time_plot.set_xlabel('Scale Targets on {} nodes with {} cpus and {} mem'.format(agents, cpus, mem))
     time_plot.set_ylabel('Time to Reach Scale (sec)')
@@ -175,7 +234,346 @@ def create_scale_graph(stats, metadata, file_name='scale.png'):
         error_plot.legend(loc='upper left')
         error_plot.set_ylim(bottom=0, top=roundup_to_nearest_10(top))
 
-    plt.savefig(file_name)
+    # graph the marathon response times if they were recorded
+    if response_plot is not None:
+        response_plot.set_title("Marathon Response Times")
+        response_plot.set_ylabel('Response Time (sec)')
+        response_plot.grid(True)
+        for test_type in test_types:
+            plot_test_percentiles(response_plot, stats, marathon_type, test_type, xticks, 'response')
+        response_plot.legend(loc='upper left')
+
+    # graph the time from launch request to running of the tasks if they were recorded
+    if running_plot is not None:
+        running_plot.set_title("Task Time to Running")
+        running_plot.set_ylabel('Time to Running (sec)')
+        running_plot.grid(True)
+        for test_type in test_types:
+            plot_test_percentiles(running_plot, stats, marathon_type, test_type, xticks, 'running')
+        running_plot.legend(loc='upper left')
+
+    save_figure(fig, file_name)
+
+
+def plot_test_percentiles(plot, stats, marathon_type, test_type, xticks, prefix='response'):
+    """ Plots the p50 (solid) and p99 (dashed) of the `prefix` times for a given test,
+        ex. `response` for marathon response times or `running` for task time to running.
+
+        :param plot: The matplotlib subplot object is the object that will be plotted
+        :type plot: matplotlib subplot
+        :param stats: This map contains the data to be plotted
+        :type stats: map
+        :param marathon_type: The type of marathon is part of the map key.  For scale tests it is `root` (vs. mom1)
+        :type marathon_type: str
+        :param test_type: Defines the test type, usually {instances, count, group}
+        :type test_type: str
+        :param xticks: An array of scale targets (1, 10, 100) for the x axis of the plot
+        :type xticks: array
+        :param prefix: The prefix of the percentile stats, usually {response, staging, running}
+        :type prefix: str
+
+    """
+    p50 = stats.get(get_key(marathon_type, test_type, '{}_p50'.format(prefix)))
+    p99 = stats.get(get_key(marathon_type, test_type, '{}_p99'.format(prefix)))
+    if p50 is None or len(p50) == 0:
+        return
+
+    p50_handle, = plot.plot(xticks, pad(p50, len(xticks)), label='{} p50'.format(test_type.title()))
+    plot.plot(xticks, pad(p99, len(xticks)), label='{} p99'.format(test_type.title()),
+              linestyle='--', color=p50_handle.get_color())
+
+
+def shard_throughputs(stats, marathon_type):
+    """ Returns the deploy throughput (tasks per second) of the sharded group tests by
+        target and shard size, ex. {50000: {1000: 120.5, 5000: 98.2}}.  Failed tests are ignored.
+
+        :param stats: This map contains the data to be plotted
+        :type stats: map
+        :param marathon_type: The type of marathon is part of the map key.  For scale tests it is `root` (vs. mom1)
+        :type marathon_type: str
+    """
+    throughputs = {}
+    for test_type in stats_styles(stats, marathon_type):
+        shard_size = shard_size_of(test_type)
+        if shard_size is None:
+            continue
+
+        targets = stats.get(get_key(marathon_type, test_type, 'target'), [])
+        deploy_times = stats.get(get_key(marathon_type, test_type, 'deploy_time'), [])
+        deploy_status = stats.get(get_key(marathon_type, test_type, 'deployment_status'), [])
+        for target, deploy_time, status in zip(targets, deploy_times, deploy_status):
+            if status == 'p' and deploy_time > 0:
+                throughputs.setdefault(int(target), {})[shard_size] = target / deploy_time
+
+    return throughputs
+
+
+def best_shard_sizes(stats, marathon_type):
+    """ Returns the shard size with the best deploy throughput for each target of the sharded group tests.
+
+        :param stats: This map contains the data to be plotted
+        :type stats: map
+        :param marathon_type: The type of marathon is part of the map key.  For scale tests it is `root` (vs. mom1)
+        :type marathon_type: str
+    """
+    throughputs = shard_throughputs(stats, marathon_type)
+    return {target: max(by_size, key=by_size.get) for target, by_size in throughputs.items()}
+
+
+def create_shard_graph(stats, metadata, file_name='shards.png'):
+    """ Creates a graph of the deploy throughput against the shard size of the sharded group tests,
+        one line per target.  Nothing is created if there are no sharded group tests.
+
+        :param stats: This map contains the data to be plotted
+        :type stats: map
+        :param metadata: The JSON object that contains the metadata for the cluster under test
+        :type metadata: JSON
+        :param file_name: The file name of the graph to create
+        :type file_name: str
+
+    """
+    throughputs = shard_throughputs(stats, metadata['marathon'])
+    if not throughputs:
+        return
+
+    fig, plots, file_name = subplots(file_name)
+    plot = plots[0]
+    fig.set_size_inches(8.5, 4)
+    fig.subplots_adjust(left=0.12, bottom=0.15, right=0.90, top=0.88)
+    plot.set_title('Group Deploy Throughput by Shard Size for v{}'.format(metadata['marathon-version']))
+    plot.set_xlabel('Apps per Shard')
+    plot.set_ylabel('Throughput (tasks/sec)')
+    plot.set_xscale('log')
+    plot.grid(True)
+
+    for target in sorted(throughputs):
+        by_size = throughputs[target]
+        sizes = sorted(by_size)
+        plot.plot(sizes, [by_size[size] for size in sizes], label='{} apps'.format(target), marker='o')
+
+    plot.legend(loc='upper left')
+    save_figure(fig, file_name)
+
+
+def load_runs(csvfiles=(), store=None, run_ids=(), last=None):
+    """ Loads the runs to compare as (label, stats) pairs: the csv files in the given order,
+        then the stored `run_ids` or else the `last` stored runs, oldest first.
+
+        :param csvfiles: The scale-test.csv files of runs
+        :type csvfiles: array
+        :param store: The name of a results database, see store.py
+        :type store: str
+        :param run_ids: The ids of the runs to load from the store
+        :type run_ids: array
+        :param last: The number of last runs to load from the store if no run ids are given
+        :type last: int
+    """
+    runs = [(csvfile, load(csvfile)) for csvfile in csvfiles]
+    if store is not None:
+        with ResultStore(store) as results:
+            if not run_ids:
+                run_ids = [row['id'] for row in reversed(results.runs(last or 2))]
+            for run_id in run_ids:
+                metadata = results.load_metadata(run_id)
+                label = 'run {} v{}'.format(run_id, metadata.get('marathon-version'))
+                runs.append((label, results.load_stats(run_id)))
+
+    return runs
+
+
+def status_values(statuses):
+    """ Passed is 1, failed 0 and skipped NaN, a skipped test neither passed nor failed.
+    """
+    return [1.0 if status == 'p' else float('nan') if status == 's' else 0.0 for status in statuses]
+
+
+def align_runs(runs, marathon_type, test_type, stat, convert=None):
+    """ Aligns the `stat` of a test across the runs by scale target.
+        Returns the sorted targets of all runs and a (runs x targets) array of the stat, NaN where
+        a run has no value for a target.
+
+        :param runs: The (label, stats) pairs of the runs
+        :type runs: array
+        :param marathon_type: The type of marathon is part of the map key.  For scale tests it is `root` (vs. mom1)
+        :type marathon_type: str
+        :param test_type: Defines the test type, usually {instances, count, group}
+        :type test_type: str
+        :param stat: The stat to align, ex. `deploy_time`
+        :type stat: str
+        :param convert: Converts the values of a run to numbers, ex. `status_values`
+        :type convert: function
+    """
+    import numpy as np
+
+    run_targets = []
+    run_values = []
+    for label, stats in runs:
+        values = stats.get(get_key(marathon_type, test_type, stat), [])
+        if convert is not None:
+            values = convert(values)
+        targets = stats.get(get_key(marathon_type, test_type, 'target'), [])[:len(values)]
+        run_targets.append(np.array(targets, dtype=float))
+        run_values.append(np.array(values[:len(targets)], dtype=float))
+
+    targets = np.unique(np.concatenate(run_targets)) if run_targets else np.array([])
+    aligned = np.full((len(runs), len(targets)), np.nan)
+    for row, (run_target, values) in enumerate(zip(run_targets, run_values)):
+        aligned[row, np.searchsorted(targets, run_target)] = values
+
+    return targets, aligned
+
+
+def compare_styles(runs, marathon_type):
+    styles = []
+    for label, stats in runs:
+        for test_type in stats_styles(stats, marathon_type):
+            if test_type not in styles:
+                styles.append(test_type)
+    return styles
+
+
+def json_value(value):
+    return None if math.isnan(value) else round(float(value), 3)
+
+
+def compare_runs(runs, baseline=0, threshold=REGRESSION_THRESHOLD, error_threshold=ERROR_THRESHOLD,
+                 marathon_type='root'):
+    """ Compares every run against the `baseline` run, target by target.  A target regressed when
+        its deploy time is more than `threshold` (a fraction) slower, it has more than `error_threshold`
+        errors more, or its deployment failed where the baseline passed.
+        Returns the verdict (JSON) and the aligned deploy times by test type for graphing.
+
+        :param runs: The (label, stats) pairs of the runs
+        :type runs: array
+        :param baseline: The index of the baseline run in `runs`
+        :type baseline: int
+        :param threshold: The fraction a deploy time may be slower than the baseline
+        :type threshold: float
+        :param error_threshold: The number of errors a test may have more than the baseline
+        :type error_threshold: int
+        :param marathon_type: The type of marathon is part of the map key.  For scale tests it is `root` (vs. mom1)
+        :type marathon_type: str
+    """
+    import numpy as np
+
+    labels = [label for label, stats in runs]
+    regressions = []
+    comparisons = {}
+    for test_type in compare_styles(runs, marathon_type):
+        targets, times = align_runs(runs, marathon_type, test_type, 'deploy_time')
+        if len(targets) == 0:
+            continue
+        _, errors = align_runs(runs, marathon_type, test_type, 'errors')
+        _, passed = align_runs(runs, marathon_type, test_type, 'deployment_status', status_values)
+        times[times <= 0] = np.nan
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            change = times / times[baseline] - 1
+            slower = change > threshold
+            more_errors = errors - errors[baseline] > error_threshold
+            failed = ~np.isnan(passed) & (passed == 0) & (passed[baseline] == 1)
+        flagged = slower | more_errors | failed
+        flagged[baseline] = False
+        comparisons[test_type] = {'targets': targets, 'times': times, 'flagged': flagged}
+
+        for run, column in zip(*np.nonzero(flagged)):
+            reasons = [reason for reason, flags in [('slower', slower), ('errors', more_errors), ('failed', failed)]
+                       if flags[run, column]]
+            regressions.append({
+                'run': labels[run],
+                'style': test_type,
+                'target': int(targets[column]),
+                'reasons': reasons,
+                'deploy_time': json_value(times[run, column]),
+                'baseline_deploy_time': json_value(times[baseline, column]),
+                'change': json_value(change[run, column]),
+                'errors': json_value(errors[run, column]),
+                'baseline_errors': json_value(errors[baseline, column])
+            })
+
+    verdict = {
+        'verdict': 'regressed' if regressions else 'pass',
+        'baseline': labels[baseline],
+        'runs': labels,
+        'threshold': threshold,
+        'error_threshold': error_threshold,
+        'regressions': regressions
+    }
+    return verdict, comparisons
+
+
+def create_compare_graph(comparisons, verdict, baseline=0, file_name='compare.png'):
+    """ Creates a graph per test type of the deploy times of the compared runs by target: the
+        median with a band from the min to the max over the runs, the baseline run dashed and
+        the regressed targets marked.
+
+        :param comparisons: The aligned deploy times by test type of `compare_runs`
+        :type comparisons: map
+        :param verdict: The verdict of `compare_runs`
+        :type verdict: JSON
+        :param baseline: The index of the baseline run
+        :type baseline: int
+        :param file_name: The file name of the graph to create
+        :type file_name: str
+    """
+    import numpy as np
+
+    if not comparisons:
+        raise GraphException('Unable to create graph without deploy times to compare')
+
+    nrows = len(comparisons)
+    fig, plots, file_name = subplots(file_name, nrows)
+    # leave 0.8in above the plots for the title
+    fig.subplots_adjust(left=0.12, bottom=0.08, right=0.90, top=1 - 0.8 / (3 * nrows), wspace=0.25, hspace=0.50)
+    fig.set_size_inches(8.5, 3 * nrows)
+    fig.suptitle('{} Runs against {}: {}'.format(len(verdict['runs']), verdict['baseline'], verdict['verdict']))
+
+    for plot, test_type in zip(plots, comparisons):
+        comparison = comparisons[test_type]
+        times = comparison['times']
+        xticks = np.arange(len(comparison['targets']))
+        with warnings.catch_warnings():
+            # targets no run reached are all NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            median = np.nanmedian(times, axis=0)
+            low = np.nanmin(times, axis=0)
+            high = np.nanmax(times, axis=0)
+
+        plot.set_title('{} Scale Times'.format(test_type.title()))
+        plot.set_ylabel('Time (sec)')
+        plot.set_xticks(xticks)
+        plot.set_xticklabels([int(target) for target in comparison['targets']])
+        plot.grid(True)
+        median_handle, = plot.plot(xticks, median, label='median', marker='o')
+        plot.fill_between(xticks, low, high, color=median_handle.get_color(), alpha=0.2, label='min - max')
+        plot.plot(xticks, times[baseline], label='baseline', linestyle='--', color='gray')
+
+        flagged = comparison['flagged'].any(axis=0)
+        if flagged.any():
+            plot.plot(xticks[flagged], high[flagged], label='regressed', marker='x', color='red', linestyle='None',
+                      markersize=10)
+        plot.legend(loc='upper left')
+
+    save_figure(fig, file_name)
+
+
+def write_verdict(verdict, file_name='verdict.json'):
+    with open(file_name, 'w') as f:
+        json.dump(verdict, f, indent=2)
+
+
+def print_verdict(verdict):
+    print('{} runs against {}: {}'.format(len(verdict['runs']), verdict['baseline'], verdict['verdict']))
+    for regression in verdict['regressions']:
+        print('  {} {} at {}: {} (deploy time {} vs {}, errors {} vs {})'.format(
+            regression['run'],
+            regression['style'],
+            regression['target'],
+            ', '.join(regression['reasons']),
+            regression['deploy_time'],
+            regression['baseline_deploy_time'],
+            regression['errors'],
+            regression['baseline_errors']))
 
 
 def roundup_to_nearest_10(x):
@@ -225,6 +623,26 @@ def error_graph_enabled(stats, marathon_type, test_types):
     return False
 
 
+def percentile_graph_enabled(stats, marathon_type, test_types, prefix='response'):
+    """ Returns true if there are `prefix` percentiles to graph
+
+        :param stats: This map contains the data to be plotted
+        :type stats: map
+        :param marathon_type: The type of marathon is part of the map key.  For scale tests it is `root` (vs. mom1)
+        :type marathon_type: str
+        :param test_types: An array of test types to be graphed, usually {instances, count, group}
+        :type test_types: array
+        :param prefix: The prefix of the percentile stats, usually {response, staging, running}
+        :type prefix: str
+    """
+    for test_type in test_types:
+        percentiles = stats.get(get_key(marathon_type, test_type, '{}_p99'.format(prefix)))
+        if percentiles is not None and any(percentiles):
+            return True
+
+    return False
+
+
 def get_resources(metadata):
     agents = 0
     cpus = 0
@@ -250,8 +668,21 @@ def load(csvfile):
         4 - launch_status
         5 - deployment_status
         6 - errors
+        7 - response_p50
+        8 - response_p90
+        9 - response_p99
+        10 - response_max
+        11 - staging_p50 - time from launch request to TASK_STAGING of the tasks
+        12 - staging_p90
+        13 - staging_p99
+        14 - running_p50 - time from launch request to TASK_RUNNING of the tasks
+        15 - running_p90
+        16 - running_p99
+        17 - predicted_time - deploy time predicted by the planner before the test (planner.py)
+        Files written before response times were recorded only have the first 7 rows,
+        before task times were recorded the first 11 rows and before predictions the first 17 rows.
     """
-    row_keys = ['target', 'max', 'deploy_time', 'human_deploy_time', 'launch_status', 'deployment_status', 'errors']
+    row_keys = STAT_KEYS
     stats = empty_stats()
     current_marathon = None
     current_test_type = None
@@ -276,19 +707,56 @@ def load_metadata(file):
         return json.load(json_data)
 
 
+def load_run(store, run_id=None):
+    """ Loads the stats and metadata of a stored run, by default the last one.
+    """
+    with ResultStore(store) as results:
+        return results.load_stats(run_id), results.load_metadata(run_id)
+
+
 @click.command()
 @click.option('--csvfile', default='scale-test.csv', help='Name of csv file to graph')
 @click.option('--metadatafile', default='meta-data.json', help='Name of meta-data file to use for graphing')
 @click.option('--graphfile', default='scale.png', help='Name of graph to create')
-def main(csvfile, metadatafile, graphfile):
+@click.option('--shardgraphfile', default='shards.png', help='Name of the shard size graph to create (if there are sharded group tests)')
+@click.option('--store', default=None, help='Name of a results database to graph from instead of the csv file')
+@click.option('--run', default=None, type=int, help='Run in the results database to graph (default: the last one)')
+@click.option('--compare', multiple=True, help='Csv file of a run to compare, repeat for each run (the first is the baseline)')
+@click.option('--compare-runs', 'compare_run_ids', multiple=True, type=int, help='Run in the results database to compare, repeat for each run')
+@click.option('--compare-last', default=None, type=int, help='Number of last runs in the results database to compare')
+@click.option('--baseline', default=0, help='Index of the baseline among the compared runs')
+@click.option('--threshold', default=REGRESSION_THRESHOLD, help='Fraction a deploy time may be slower than the baseline')
+@click.option('--error-threshold', default=ERROR_THRESHOLD, help='Number of errors a test may have more than the baseline')
+@click.option('--comparefile', default='compare.png', help='Name of the comparison graph to create')
+@click.option('--verdictfile', default='verdict.json', help='Name of the comparison verdict to write')
+def main(csvfile, metadatafile, graphfile, shardgraphfile, store, run, compare, compare_run_ids, compare_last, baseline,
+         threshold, error_threshold, comparefile, verdictfile):
     """
         CLI entry point for graphing scale data.
         Typically, scale tests create a scale-test.csv file which contains the graph points.
         It also produces a meta-data.json which is necessary for the graphing process.
+        Both are also saved in the results database (see store.py) which can be graphed with --store.
+        With --compare, --compare-runs or --compare-last several runs are compared against a baseline
+        instead, which exits with 1 if any of them regressed.
     """
-    stats = load(csvfile)
-    metadata = load_metadata(metadatafile)
+    if compare or compare_run_ids or compare_last:
+        compare_store = store if compare_run_ids or compare_last else None
+        runs = load_runs(compare, compare_store, compare_run_ids, compare_last)
+        if len(runs) < 2:
+            raise click.UsageError('At least 2 runs are needed to compare, found {}'.format(len(runs)))
+        verdict, comparisons = compare_runs(runs, baseline, threshold, error_threshold)
+        create_compare_graph(comparisons, verdict, baseline, comparefile)
+        write_verdict(verdict, verdictfile)
+        print_verdict(verdict)
+        sys.exit(1 if verdict['regressions'] else 0)
+
+    if store is not None:
+        stats, metadata = load_run(store, run)
+    else:
+        stats = load(csvfile)
+        metadata = load_metadata(metadatafile)
     create_scale_graph(stats, metadata, graphfile)
+    create_shard_graph(stats, metadata, shardgraphfile)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,118 @@
+import math
+import threading
+"""
+    Log-bucketed histograms for the response times of the scale tests.
+"""
+
+PERCENTILES = [50, 90, 99]
+
+
+class Histogram(object):
+    """ A compact histogram of durations in seconds.
+        Values are counted in logarithmic buckets, each `growth` times wider than the previous
+        one starting at `resolution`.  Percentiles are accurate to within the bucket width (8%
+        by default) at any magnitude, and the memory used is bounded by the number of distinct
+        buckets hit (~200 from 1ms to 1h) instead of the number of values.
+    """
+
+    def __init__(self, resolution=0.001, growth=1.08):
+        self.resolution = resolution
+        self.growth = growth
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def __str__(self):
+        return "count: {count} mean: {mean} p50: {p50} p90: {p90} p99: {p99} max: {max}".format(**self.summary())
+
+    def __repr__(self):
+        return self.__str__()
+
+    def record(self, value):
+        index = self._index(value)
+        with self.lock:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def merge(self, other):
+        """ Adds the values of `other`, which must have the same bucket layout.
+        """
+        with self.lock:
+            for index, count in other.buckets.items():
+                self.buckets[index] = self.buckets.get(index, 0) + count
+            self.count += other.count
+            self.total += other.total
+            if other.min is not None and (self.min is None or other.min < self.min):
+                self.min = other.min
+            self.max = max(self.max, other.max)
+
+    def mean(self):
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    def percentile(self, percent):
+        """ Returns the upper bound of the bucket holding the `percent` percentile,
+            bounded by the smallest and largest recorded values.
+        """
+        if self.count == 0:
+            return 0.0
+
+        rank = max(1, int(math.ceil(percent / 100.0 * self.count)))
+        seen = 0
+        with self.lock:
+            for index in sorted(self.buckets):
+                seen += self.buckets[index]
+                if seen >= rank:
+                    return max(self.min, min(self._upper_bound(index), self.max))
+        return self.max
+
+    def summary(self):
+        summary = {
+            'count': self.count,
+            'mean': round(self.mean(), 3),
+            'max': round(self.max, 3)
+        }
+        for percent in PERCENTILES:
+            summary['p{}'.format(percent)] = round(self.percentile(percent), 3)
+        return summary
+
+    def _index(self, value):
+        if value <= self.resolution:
+            return 0
+        return int(math.ceil(math.log(value / self.resolution) / math.log(self.growth)))
+
+    def _upper_bound(self, index):
+        return self.resolution * self.growth ** index
+
+
+def merged(histograms):
+    """ Returns a new histogram with the values of all `histograms`.
+    """
+    total = Histogram()
+    for histogram in histograms:
+        total.merge(histogram)
+    return total
+
+
+def from_buckets(buckets, resolution=0.001, growth=1.08):
+    """ Rebuilds a histogram from its bucket counts (ex. as stored by the result store).
+        The exact values are gone, so the min, max and total are estimated from the bucket bounds.
+    """
+    histogram = Histogram(resolution, growth)
+    for index, count in buckets.items():
+        histogram.buckets[index] = histogram.buckets.get(index, 0) + count
+        histogram.count += count
+        histogram.total += count * histogram._upper_bound(index)
+    if histogram.buckets:
+        histogram.min = histogram._upper_bound(min(histogram.buckets) - 1)
+        histogram.max = histogram._upper_bound(max(histogram.buckets))
+    return histogram
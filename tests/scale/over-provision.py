@@ -1,17 +1,66 @@
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+from dcos import http
+from dcos.errors import DCOSException
 from shakedown import *
 
+from common import cluster_snapshot
 from utils import file_dir
+"""
+    Over-provisions the private agents with over-provision.sh, `PROVISION_CONCURRENCY` agents at a time,
+    then waits until each agent registered again with the master advertising `OVER_PROVISIONED_CPUS`.
+    Prints a table of the status and times of each agent.
+"""
 
+# cpus over-provision.sh configures an agent with
+OVER_PROVISIONED_CPUS = 100
 
-private_agents = sorted(get_private_agents())
-count = 0
+# agents provisioned at the same time
+PROVISION_CONCURRENCY = 10
 
-for agent in private_agents:
-    count = count + 1
-    if count > 0 :
-        print(agent)
+# seconds to wait for the agents to register with their over-provisioned cpus
+READY_TIMEOUT = 300
+
+# seconds between the polls of the agents of the master
+READY_POLL_INTERVAL = 2
+
+
+class AgentProvisioning(object):
+    """ The status and times (in seconds) of over-provisioning an agent.
+        status: pending, provisioned, ready, failed or not ready
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.status = 'pending'
+        self.start = None
+        self.provision_time = None
+        self.ready_time = None
+        self.error = None
+
+    def __str__(self):
+        return '{:<20} {:<12} {:>10} {:>10}  {}'.format(
+            self.agent,
+            self.status,
+            format_seconds(self.provision_time),
+            format_seconds(self.ready_time),
+            self.error or '')
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return '-'
+    return '{:.1f}'.format(seconds)
+
+
+def provision_agent(provisioning):
+    """ Runs over-provision.sh on the agent and restarts it as a new agent, which drops the
+        agent id of its former resources.
+    """
+    agent = provisioning.agent
+    provisioning.start = time.time()
+    try:
         copy_file(agent, "{}/over-provision.sh".format(file_dir()))
         run_command(agent, "sh over-provision.sh")
         stop_agent(agent)
@@ -21,3 +70,73 @@ for agent in private_agents:
         except:
             time.sleep(1)
             start_agent(agent)
+        provisioning.status = 'provisioned'
+    except Exception as e:
+        provisioning.status = 'failed'
+        provisioning.error = str(e)
+    provisioning.provision_time = time.time() - provisioning.start
+    return provisioning
+
+
+def registered_cpus():
+    """ The cpus of the active agents of the master by hostname.
+    """
+    response = http.get(dcos_url_path('mesos/master/slaves'))
+    return {slave['hostname']: slave['resources']['cpus'] for slave in response.json()['slaves'] if slave['active']}
+
+
+def wait_until_ready(provisionings, timeout=READY_TIMEOUT):
+    """ Polls the agents of the master until the provisioned agents advertise `OVER_PROVISIONED_CPUS`,
+        the ones which do not within `timeout` are `not ready`.
+    """
+    deadline = time.time() + timeout
+    waiting = [provisioning for provisioning in provisionings if provisioning.status == 'provisioned']
+    while waiting:
+        try:
+            cpus = registered_cpus()
+        except Exception as e:
+            print('unable to read the agents of the master: {}'.format(e))
+            cpus = {}
+
+        for provisioning in list(waiting):
+            if cpus.get(provisioning.agent, 0) >= OVER_PROVISIONED_CPUS:
+                provisioning.status = 'ready'
+                provisioning.ready_time = time.time() - provisioning.start
+                waiting.remove(provisioning)
+
+        if waiting and time.time() > deadline:
+            for provisioning in waiting:
+                provisioning.status = 'not ready'
+                provisioning.error = 'not registered with {} cpus after {}s'.format(OVER_PROVISIONED_CPUS, timeout)
+            break
+
+        if waiting:
+            time.sleep(READY_POLL_INTERVAL)
+
+
+def over_provision(agents, concurrency=PROVISION_CONCURRENCY):
+    """ Over-provisions `agents` with at most `concurrency` at a time and waits until they are ready.
+        Returns the `AgentProvisioning` of each agent.
+    """
+    provisionings = [AgentProvisioning(agent) for agent in agents]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for provisioning in executor.map(provision_agent, provisionings):
+            print('{}: {}'.format(provisioning.agent, provisioning.status))
+
+    wait_until_ready(provisionings)
+    return provisionings
+
+
+def print_provisionings(provisionings):
+    print('{:<20} {:<12} {:>10} {:>10}  {}'.format('agent', 'status', 'provision', 'ready', 'error'))
+    for provisioning in provisionings:
+        print(provisioning)
+
+
+provisionings = over_provision(sorted(cluster_snapshot().private_agents))
+print_provisionings(provisionings)
+
+not_ready = [provisioning.agent for provisioning in provisionings if provisioning.status != 'ready']
+if not_ready:
+    raise DCOSException('{} of {} agents are not over-provisioned: {}'.format(
+        len(not_ready), len(provisionings), ', '.join(not_ready)))
@@ -0,0 +1,98 @@
+import math
+import os
+
+from common import get_test_style, sharded_style, MAX_HOURS_OF_TEST
+from store import ResultStore, STORE_FILE
+"""
+    Predicts the deploy time of the upcoming scale tests from those which completed,
+    to skip the tests which can not finish within `MAX_HOURS_OF_TEST`.
+    The deploy time of a test style grows about as a power of its target, which is a line in
+    log-log space:  log(deploy_time) = log(a) + b * log(target).   The line is fit to the largest
+    targets which completed in this session, or while there are too few of them, together with
+    the deploy times of the last runs in the results database.
+"""
+
+# distinct targets needed to fit the deploy time of a style
+MIN_FIT_TARGETS = 2
+
+# largest distinct targets the fit uses, the small ones are dominated by the constant overhead of a test
+FIT_TARGETS = 3
+
+# last runs of the results database which are used as history
+HISTORY_RUNS = 5
+
+
+def fit_deploy_time(points):
+    """ Fits deploy_time = a * target ** b to (target, deploy_time) `points`, by least squares in log-log
+        space over the `FIT_TARGETS` largest targets.  Returns (a, b) or None with fewer than
+        `MIN_FIT_TARGETS` distinct targets.   b is never negative, larger targets do not deploy faster.
+    """
+    points = [(target, deploy_time) for target, deploy_time in points if target > 0 and deploy_time > 0]
+    targets = sorted(set(target for target, _ in points))[-FIT_TARGETS:]
+    if len(targets) < MIN_FIT_TARGETS:
+        return None
+
+    xs = [math.log(target) for target, _ in points if target in targets]
+    ys = [math.log(deploy_time) for target, deploy_time in points if target in targets]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    b = max(0.0, sxy / sxx)
+    return math.exp(mean_y - b * mean_x), b
+
+
+def load_history(filename=STORE_FILE, marathon='root', runs=HISTORY_RUNS):
+    """ The (target, deploy_time) points of the successful tests of the last `runs` runs by style,
+        empty if there is no results database.
+    """
+    history = {}
+    if not os.path.exists(filename):
+        return history
+
+    with ResultStore(filename) as store:
+        for row in store.deploy_times(marathon, runs):
+            style = sharded_style(row['style'], row['shard_size'])
+            history.setdefault(style, []).append((row['target'], row['deploy_time']))
+    return history
+
+
+class Planner(object):
+    """ Predicts the deploy time of scale tests from the tests observed in the session and the
+        `history` of previous runs (see `load_history`), and decides which fit in the `budget` (seconds).
+    """
+
+    def __init__(self, budget=MAX_HOURS_OF_TEST * 3600, history=None):
+        self.budget = budget
+        self.history = history or {}
+        self.session = {}
+
+    def observe(self, scale_test):
+        """ Adds the deploy time of a completed test.  Skipped and failed tests are ignored.
+        """
+        if scale_test.skipped or scale_test.status != 'successful':
+            return
+        points = self.session.setdefault(get_test_style(scale_test), [])
+        points.append((scale_test.target, scale_test.test_time))
+
+    def points(self, style):
+        session = self.session.get(style, [])
+        if len(set(target for target, _ in session)) >= MIN_FIT_TARGETS:
+            return session
+        return session + self.history.get(style, [])
+
+    def predict(self, style, target):
+        """ The predicted deploy time in seconds of `style` at `target`, None if it can not be fit yet.
+        """
+        fit = fit_deploy_time(self.points(style))
+        if fit is None:
+            return None
+        a, b = fit
+        return round(a * target ** b, 3)
+
+    def plan(self, scale_test):
+        """ Records the predicted deploy time with `scale_test` and returns whether it fits the budget.
+            Tests without a prediction are run.
+        """
+        scale_test.predicted_time = self.predict(get_test_style(scale_test), scale_test.target)
+        return scale_test.predicted_time is None or scale_test.predicted_time <= self.budget
@@ -0,0 +1,852 @@
+#!/usr/bin/env python
+
+import click
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from queue import Empty, Queue
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+"""
+    Local Marathon REST API simulator for running the scale harness offline.
+
+    Serves the marathon endpoints the harness uses (`/v2/apps`, `/v2/groups`, `/v2/pods`,
+    `/v2/deployments`, `/v2/queue`, `/v2/tasks`, `/v2/events`, `/v2/info`) and the Mesos
+    master endpoints (`/mesos/master/state`, `/mesos/master/state-summary`,
+    `/mesos/metrics/snapshot`) from an in memory cluster.  Tasks are launched at a
+    configurable rate, and each endpoint can be given latency and a failure rate.
+
+    Marathon paths are served with and without a `/service/<name>` prefix so the simulator
+    can stand in for `core.dcos_url` (root marathon and MoM) or for `marathon.url`.
+"""
+
+FRAMEWORK_ID = 'simulated-marathon-0000'
+MARATHON_VERSION = '1.5.0-simulated'
+TIMED_OUT = 'Futures timed out after [10000 milliseconds]'
+
+TASK_TERMINAL_STATES = ['TASK_FINISHED', 'TASK_FAILED', 'TASK_KILLED', 'TASK_LOST', 'TASK_ERROR']
+
+
+def timestamp():
+    return datetime.utcnow().isoformat()[:23] + 'Z'
+
+
+def absolute_id(spec_id, parent='/'):
+    if spec_id.startswith('/'):
+        return spec_id.rstrip('/') or '/'
+    return '{}/{}'.format(parent.rstrip('/'), spec_id).rstrip('/')
+
+
+def in_group(spec_id, group_id):
+    group_id = group_id.rstrip('/')
+    return group_id == '' or spec_id == group_id or spec_id.startswith(group_id + '/')
+
+
+class SimulatorException(Exception):
+    """ Raised by the simulated cluster for requests marathon would reject.
+    """
+
+    def __init__(self, status, message, **details):
+        self.status = status
+        self.message = message
+        self.details = details
+
+    def __str__(self):
+        return self.message
+
+
+class SimulatedCluster(object):
+    """ In memory marathon and Mesos state.
+        Apps and pods are run specs with a target number of tasks (for pods: instances times
+        containers).  A ticker thread launches missing tasks at `launch_rate` tasks per second,
+        moves them from TASK_STAGING to TASK_RUNNING after `staging_time` seconds, kills
+        surplus tasks at `kill_rate` and completes deployments whose run specs converged.
+        Status and deployment events are published to the `/v2/events` subscribers.
+    """
+
+    def __init__(self, launch_rate=500, kill_rate=None, staging_time=0.5, agents=10,
+                 task_failure_rate=0.0, tick=0.05):
+        self.launch_rate = launch_rate
+        self.kill_rate = kill_rate or launch_rate
+        self.staging_time = staging_time
+        self.task_failure_rate = task_failure_rate
+        self.tick = tick
+        self.agents = ['10.0.{}.{}'.format(i // 250, i % 250 + 1) for i in range(agents)]
+
+        self.lock = threading.RLock()
+        self.apps = {}
+        self.pods = {}
+        self.tasks = {}
+        self.spec_tasks = {}
+        # (instance id, container) of the pod instances still to launch, by pod id
+        self.pod_slots = {}
+        self.deployments = {}
+        self.pending = set()
+        self.subscribers = []
+        self.launch_budget = 0.0
+        self.kill_budget = 0.0
+        self.next_agent = 0
+        self.counters = {'launched': 0, 'killed': 0, 'failed': 0}
+        self.stopped = threading.Event()
+
+    def start(self):
+        thread = threading.Thread(target=self._run, name='simulator-ticker')
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    # events
+
+    def subscribe(self, event_types=None):
+        queue = Queue()
+        with self.lock:
+            self.subscribers.append((queue, set(event_types or [])))
+        return queue
+
+    def unsubscribe(self, queue):
+        with self.lock:
+            self.subscribers = [(q, types) for q, types in self.subscribers if q is not queue]
+
+    def publish(self, event):
+        event['timestamp'] = timestamp()
+        with self.lock:
+            for queue, event_types in self.subscribers:
+                if not event_types or event['eventType'] in event_types:
+                    queue.put(event)
+
+    # run specs
+
+    def target_tasks(self, spec_id):
+        if spec_id in self.apps:
+            return self.apps[spec_id]['instances']
+        if spec_id in self.pods:
+            pod = self.pods[spec_id]
+            return pod['scaling']['instances'] * len(pod['containers'])
+        return 0
+
+    def add_app(self, app, force=False):
+        app = self._app_defaults(app)
+        with self.lock:
+            if app['id'] in self.apps:
+                raise SimulatorException(409, 'An app with id [{}] already exists.'.format(app['id']))
+            self.apps[app['id']] = app
+            return self._deploy([app['id']], force)
+
+    def update_app(self, app_id, app, force=False):
+        with self.lock:
+            current = self.apps.get(app_id, {'id': app_id})
+            updated = dict(current)
+            updated.update(app)
+            updated['id'] = app_id
+            self.apps[app_id] = self._app_defaults(updated)
+            return self._deploy([app_id], force)
+
+    def update_apps(self, apps, force=False):
+        with self.lock:
+            for app in apps:
+                app_id = absolute_id(app['id'])
+                updated = dict(self.apps.get(app_id, {}))
+                updated.update(app)
+                updated['id'] = app_id
+                self.apps[app_id] = self._app_defaults(updated)
+            return self._deploy([absolute_id(app['id']) for app in apps], force)
+
+    def remove_app(self, app_id, force=False):
+        with self.lock:
+            if app_id not in self.apps:
+                raise SimulatorException(404, "App '{}' does not exist".format(app_id))
+            del self.apps[app_id]
+            return self._deploy([app_id], force)
+
+    def add_pod(self, pod, force=False):
+        pod = dict(pod)
+        pod['id'] = absolute_id(pod['id'])
+        pod.setdefault('scaling', {'kind': 'fixed', 'instances': 1})
+        pod['scaling'].setdefault('instances', 1)
+        pod.setdefault('containers', [{'name': 'container-1'}])
+        pod['version'] = timestamp()
+        with self.lock:
+            if pod['id'] in self.pods:
+                raise SimulatorException(409, 'Pod {} already exists'.format(pod['id']))
+            self.pods[pod['id']] = pod
+            return self._deploy([pod['id']], force)
+
+    def remove_pod(self, pod_id, force=False):
+        with self.lock:
+            if pod_id not in self.pods:
+                raise SimulatorException(404, "Pod '{}' does not exist".format(pod_id))
+            del self.pods[pod_id]
+            return self._deploy([pod_id], force)
+
+    def update_group(self, group, group_id='/', force=False):
+        """ Creates or updates the apps and pods of `group` and its sub groups.
+        """
+        group_id = absolute_id(group.get('id', group_id))
+        specs = []
+        with self.lock:
+            self._collect_group(group, group_id, specs)
+            return self._deploy(specs, force)
+
+    def remove_group(self, group_id, force=False):
+        with self.lock:
+            removed = [spec_id for spec_id in list(self.apps) + list(self.pods) if in_group(spec_id, group_id)]
+            for spec_id in removed:
+                self.apps.pop(spec_id, None)
+                self.pods.pop(spec_id, None)
+            return self._deploy(removed, force)
+
+    def remove_deployment(self, deployment_id, force=False):
+        with self.lock:
+            deployment = self.deployments.pop(deployment_id, None)
+            if deployment is None:
+                raise SimulatorException(404, 'DeploymentPlan {} does not exist'.format(deployment_id))
+            self.publish({'eventType': 'deployment_failed', 'id': deployment_id, 'plan': deployment})
+            return deployment
+
+    def _collect_group(self, group, group_id, specs):
+        for app in group.get('apps', []):
+            app = dict(app)
+            app['id'] = absolute_id(app['id'], group_id)
+            self.apps[app['id']] = self._app_defaults(app)
+            specs.append(app['id'])
+        for pod in group.get('pods', []):
+            pod = dict(pod)
+            pod['id'] = absolute_id(pod['id'], group_id)
+            self.pods[pod['id']] = pod
+            specs.append(pod['id'])
+        for sub_group in group.get('groups', []):
+            self._collect_group(sub_group, absolute_id(sub_group['id'], group_id), specs)
+
+    def _app_defaults(self, app):
+        app = dict(app)
+        app['id'] = absolute_id(app['id'])
+        app.setdefault('instances', 1)
+        app.setdefault('cpus', 1)
+        app.setdefault('mem', 128)
+        app.setdefault('disk', 0)
+        app['version'] = timestamp()
+        return app
+
+    # deployments
+
+    def _deploy(self, spec_ids, force):
+        locking = [deployment for deployment in self.deployments.values()
+                   if set(deployment['affectedApps'] + deployment['affectedPods']) & set(spec_ids)]
+        if locking and not force:
+            raise SimulatorException(409, 'App is locked by one or more deployments.',
+                                     deployments=[{'id': deployment['id']} for deployment in locking])
+        for deployment in locking:
+            self.remove_deployment(deployment['id'])
+
+        deployment = {
+            'id': str(uuid.uuid4()),
+            'version': timestamp(),
+            'affectedApps': [spec_id for spec_id in spec_ids if spec_id not in self.pods],
+            'affectedPods': [spec_id for spec_id in spec_ids if spec_id in self.pods],
+            'currentActions': [],
+            'currentStep': 1,
+            'totalSteps': 1,
+            'steps': []
+        }
+        self.deployments[deployment['id']] = deployment
+        self.pending.update(spec_ids)
+        self.publish({'eventType': 'deployment_info', 'plan': deployment, 'currentStep': {'actions': []}})
+        return deployment
+
+    def _converged(self, spec_id):
+        tasks = [self.tasks[task_id] for task_id in self.spec_tasks.get(spec_id, [])]
+        target = self.target_tasks(spec_id)
+        return len(tasks) == target and all(task['state'] == 'TASK_RUNNING' for task in tasks)
+
+    # ticker
+
+    def _run(self):
+        last = time.monotonic()
+        while not self.stopped.wait(self.tick):
+            now = time.monotonic()
+            with self.lock:
+                self._step(now, now - last)
+            last = now
+
+    def _step(self, now, elapsed):
+        self.launch_budget = min(self.launch_budget + self.launch_rate * elapsed, self.launch_rate)
+        self.kill_budget = min(self.kill_budget + self.kill_rate * elapsed, self.kill_rate)
+
+        for spec_id in list(self.pending):
+            task_ids = self.spec_tasks.setdefault(spec_id, set())
+
+            # promote staged tasks
+            for task_id in list(task_ids):
+                task = self.tasks[task_id]
+                if task['state'] == 'TASK_STAGING' and now >= task['running_at']:
+                    if random.random() < self.task_failure_rate:
+                        self.counters['failed'] += 1
+                        self._remove_task(task, 'TASK_FAILED')
+                    else:
+                        self._update_task(task, 'TASK_RUNNING')
+                        task['startedAt'] = timestamp()
+
+            missing = self.target_tasks(spec_id) - len(task_ids)
+            while missing > 0 and self.launch_budget >= 1:
+                self._launch_task(spec_id, now)
+                self.launch_budget -= 1
+                missing -= 1
+
+            if missing <= 0:
+                self.pod_slots.pop(spec_id, None)
+
+            while missing < 0 and self.kill_budget >= 1:
+                task = self.tasks[max(task_ids)]
+                self._remove_task(task, 'TASK_KILLED')
+                self.kill_budget -= 1
+                missing += 1
+
+            if self._converged(spec_id):
+                self.pending.discard(spec_id)
+                if not task_ids:
+                    del self.spec_tasks[spec_id]
+
+        for deployment in list(self.deployments.values()):
+            affected = deployment['affectedApps'] + deployment['affectedPods']
+            if not any(spec_id in self.pending for spec_id in affected):
+                del self.deployments[deployment['id']]
+                self.publish({'eventType': 'deployment_success', 'id': deployment['id'], 'plan': deployment})
+
+    def _launch_task(self, spec_id, now):
+        agent = self.agents[self.next_agent % len(self.agents)]
+        self.next_agent += 1
+        self.counters['launched'] += 1
+
+        if spec_id in self.pods:
+            instance_id, container = self._next_pod_slot(spec_id)
+            task_id = '{}.{}'.format(instance_id, container)
+        else:
+            instance_id = '{}.{}'.format(spec_id.strip('/').replace('/', '_'), uuid.uuid4())
+            task_id = instance_id
+
+        task = {
+            'id': task_id,
+            'instanceId': instance_id,
+            'appId': spec_id,
+            'host': agent,
+            'slaveId': 'agent-{}'.format(agent),
+            'ports': [],
+            'ipAddresses': [{'ipAddress': agent, 'protocol': 'IPv4'}],
+            'state': 'TASK_STAGING',
+            'stagedAt': timestamp(),
+            'startedAt': None,
+            'running_at': now + self.staging_time,
+            'version': timestamp(),
+            'statuses': []
+        }
+        self.tasks[task_id] = task
+        self.spec_tasks[spec_id].add(task_id)
+        self._update_task(task, 'TASK_STAGING')
+
+    def _next_pod_slot(self, spec_id):
+        """ The (instance id, container name) to launch the next task of a pod as.  Failed containers
+            are relaunched in their instance, otherwise a new instance is started with a unique id.
+        """
+        slots = self.pod_slots.setdefault(spec_id, [])
+        if not slots:
+            instance_id = '{}.instance-{}'.format(spec_id.strip('/').replace('/', '_'), uuid.uuid4())
+            containers = [container.get('name', 'container') for container in self.pods[spec_id]['containers']]
+            slots.extend((instance_id, container) for container in reversed(containers))
+        return slots.pop()
+
+    def _remove_task(self, task, state):
+        if state == 'TASK_KILLED':
+            self.counters['killed'] += 1
+        if state == 'TASK_FAILED' and task['appId'] in self.pods:
+            self.pod_slots.setdefault(task['appId'], []).append((task['instanceId'], task['id'].split('.')[-1]))
+        self._update_task(task, state)
+        del self.tasks[task['id']]
+        self.spec_tasks[task['appId']].discard(task['id'])
+
+    def _update_task(self, task, state):
+        task['state'] = state
+        task['statuses'].append({'state': state, 'timestamp': time.time()})
+        self.publish({
+            'eventType': 'status_update_event',
+            'slaveId': task['slaveId'],
+            'taskId': task['id'],
+            'taskStatus': state,
+            'message': '',
+            'appId': task['appId'],
+            'host': task['host'],
+            'ipAddresses': task['ipAddresses'],
+            'ports': task['ports'],
+            'version': task['version']
+        })
+
+    # marathon representations
+
+    def app_json(self, app):
+        tasks = [self.tasks[task_id] for task_id in self.spec_tasks.get(app['id'], [])]
+        app = dict(app)
+        app['tasksRunning'] = len([task for task in tasks if task['state'] == 'TASK_RUNNING'])
+        app['tasksStaged'] = len([task for task in tasks if task['state'] == 'TASK_STAGING'])
+        app['tasksHealthy'] = 0
+        app['tasksUnhealthy'] = 0
+        app['deployments'] = [{'id': deployment['id']} for deployment in self.deployments.values()
+                              if app['id'] in deployment['affectedApps']]
+        return app
+
+    def task_json(self, task):
+        return {key: value for key, value in task.items() if key not in ['running_at', 'statuses', 'instanceId']}
+
+    def pod_status(self, pod):
+        instances = {}
+        for task_id in self.spec_tasks.get(pod['id'], []):
+            task = self.tasks[task_id]
+            instance = instances.setdefault(task['instanceId'], {
+                'id': task['instanceId'],
+                'agentHostname': task['host'],
+                'containers': []
+            })
+            instance['containers'].append({'name': task['id'].split('.')[-1], 'status': task['state']})
+
+        for instance in instances.values():
+            running = all(container['status'] == 'TASK_RUNNING' for container in instance['containers'])
+            instance['status'] = 'STABLE' if running else 'PENDING'
+
+        deploying = pod['id'] in self.pending
+        return {
+            'id': pod['id'],
+            'spec': pod,
+            'status': 'DEPLOYING' if deploying else 'STABLE',
+            'instances': list(instances.values())
+        }
+
+    def queue(self):
+        queue = []
+        for spec_id in self.pending:
+            count = self.target_tasks(spec_id) - len(self.spec_tasks.get(spec_id, []))
+            if count > 0 and spec_id in self.apps:
+                queue.append({'app': self.apps[spec_id], 'count': count, 'delay': {'timeLeftSeconds': 0, 'overdue': False}})
+        return queue
+
+    # mesos representations
+
+    def mesos_state(self):
+        tasks = []
+        for task in self.tasks.values():
+            mesos_task = {
+                'id': task['id'],
+                'name': task['appId'].strip('/').replace('/', '.'),
+                'framework_id': FRAMEWORK_ID,
+                'slave_id': task['slaveId'],
+                'state': task['state'],
+                'resources': {'cpus': 0.01, 'mem': 32, 'disk': 0},
+                'statuses': task['statuses']
+            }
+            if task['appId'] in self.pods:
+                mesos_task['discovery'] = {'name': task['appId'].strip('/')}
+            tasks.append(mesos_task)
+
+        return {
+            'version': '1.2.0',
+            'frameworks': [{
+                'id': FRAMEWORK_ID,
+                'name': 'marathon',
+                'active': True,
+                'tasks': tasks,
+                'completed_tasks': []
+            }],
+            'slaves': self.agents_json()
+        }
+
+    def agents_json(self):
+        resources = {'cpus': 100.0, 'mem': 250000.0, 'disk': 35577.0, 'gpus': 0.0}
+        return [{
+            'id': 'agent-{}'.format(agent),
+            'hostname': agent,
+            'active': True,
+            'attributes': {},
+            'resources': resources,
+            'unreserved_resources': resources,
+            'used_resources': {'cpus': 0.0, 'mem': 0.0, 'disk': 0.0},
+            'reserved_resources': {}
+        } for agent in self.agents]
+
+    def metrics(self):
+        counts = {}
+        for task in self.tasks.values():
+            counts[task['state']] = counts.get(task['state'], 0) + 1
+        return {
+            'master/tasks_staging': counts.get('TASK_STAGING', 0),
+            'master/tasks_starting': counts.get('TASK_STARTING', 0),
+            'master/tasks_running': counts.get('TASK_RUNNING', 0),
+            'master/tasks_killing': counts.get('TASK_KILLING', 0),
+            'master/slaves_active': len(self.agents),
+            'simulator/tasks_launched': self.counters['launched'],
+            'simulator/tasks_killed': self.counters['killed'],
+            'simulator/tasks_failed': self.counters['failed']
+        }
+
+
+class EndpointFaults(object):
+    """ Per endpoint latency and failure injection.  Endpoints are path prefixes
+        (ex. `/v2/apps` or `/mesos/master/state`), the longest matching prefix wins.
+    """
+
+    def __init__(self, latency=None, failure_rate=None):
+        self.latency = latency or {}
+        self.failure_rate = failure_rate or {}
+
+    def delay(self, path):
+        return self._match(self.latency, path)
+
+    def should_fail(self, path):
+        return random.random() < self._match(self.failure_rate, path)
+
+    def _match(self, settings, path):
+        matches = [prefix for prefix in settings if path.startswith(prefix)]
+        if not matches:
+            return 0.0
+        return settings[max(matches, key=len)]
+
+
+def make_handler(cluster, faults):
+    """
+    Factory method that creates a handler class.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        ROUTES = [
+            ('GET', r'/v2/info$', 'get_info'),
+            ('GET', r'/v2/leader$', 'get_leader'),
+            ('GET', r'/ping$', 'get_ping'),
+            ('GET', r'/v2/apps$', 'get_apps'),
+            ('POST', r'/v2/apps$', 'post_app'),
+            ('PUT', r'/v2/apps$', 'put_apps'),
+            ('GET', r'/v2/apps(?P<id>/.+?)/tasks$', 'get_app_tasks'),
+            ('GET', r'/v2/apps(?P<id>/.+)$', 'get_app'),
+            ('PUT', r'/v2/apps(?P<id>/.+)$', 'put_app'),
+            ('DELETE', r'/v2/apps(?P<id>/.+)$', 'delete_app'),
+            ('GET', r'/v2/groups(?P<id>/.*)?$', 'get_group'),
+            ('POST', r'/v2/groups(?P<id>/.*)?$', 'put_group'),
+            ('PUT', r'/v2/groups(?P<id>/.*)?$', 'put_group'),
+            ('DELETE', r'/v2/groups(?P<id>/.*)?$', 'delete_group'),
+            ('GET', r'/v2/pods/?$', 'get_pods'),
+            ('GET', r'/v2/pods/?::status$', 'get_pods_status'),
+            ('POST', r'/v2/pods/?$', 'post_pod'),
+            ('GET', r'/v2/pods(?P<id>/.+)::status$', 'get_pod_status'),
+            ('GET', r'/v2/pods(?P<id>/.+)$', 'get_pod'),
+            ('DELETE', r'/v2/pods(?P<id>/.+)$', 'delete_pod'),
+            ('GET', r'/v2/deployments$', 'get_deployments'),
+            ('DELETE', r'/v2/deployments/(?P<id>.+)$', 'delete_deployment'),
+            ('GET', r'/v2/queue$', 'get_queue'),
+            ('GET', r'/v2/tasks$', 'get_tasks'),
+            ('GET', r'/v2/events$', 'get_events'),
+            ('GET', r'/mesos/master/state(\.json)?$', 'get_mesos_state'),
+            ('GET', r'/mesos/master/state-summary$', 'get_mesos_state_summary'),
+            ('GET', r'/mesos/master/slaves$', 'get_mesos_slaves'),
+            ('GET', r'/mesos/metrics/snapshot$', 'get_metrics'),
+            ('GET', r'/mesos/master/metrics/snapshot$', 'get_metrics'),
+        ]
+
+        def log_message(self, format, *args):
+            logging.debug(format, *args)
+
+        def do_GET(self):
+            self.route('GET')
+
+        def do_POST(self):
+            self.route('POST')
+
+        def do_PUT(self):
+            self.route('PUT')
+
+        def do_DELETE(self):
+            self.route('DELETE')
+
+        def route(self, method):
+            url = urlparse(self.path)
+            # strip /service/<name> and /marathon prefixes
+            path = re.sub(r'^/service/[^/]+', '', url.path)
+            path = re.sub(r'^/marathon(?=/)', '', path)
+            self.query = parse_qs(url.query)
+
+            delay = faults.delay(path)
+            if delay > 0:
+                time.sleep(delay)
+            if faults.should_fail(path):
+                return self.send_json({'message': TIMED_OUT}, 503)
+
+            for route_method, pattern, handler_name in self.ROUTES:
+                match = re.match(pattern, path)
+                if route_method == method and match:
+                    try:
+                        arguments = {key: value for key, value in match.groupdict().items() if value is not None}
+                        return getattr(self, handler_name)(**arguments)
+                    except SimulatorException as e:
+                        body = {'message': e.message}
+                        body.update(e.details)
+                        return self.send_json(body, e.status)
+                    except ValueError as e:
+                        return self.send_json({'message': 'Invalid JSON: {}'.format(e)}, 400)
+
+            return self.send_json({'message': 'Not found: {} {}'.format(method, path)}, 404)
+
+        def force(self):
+            return self.query.get('force', ['false'])[0] == 'true'
+
+        def read_json(self):
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length).decode('utf-8'))
+
+        def send_json(self, body, status=200, headers=None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def send_deployment(self, deployment, status=200, body=None):
+            if body is None:
+                body = {'version': deployment['version'], 'deploymentId': deployment['id']}
+            self.send_json(body, status, {'Marathon-Deployment-Id': deployment['id']})
+
+        # marathon
+
+        def get_info(self):
+            self.send_json({
+                'name': 'marathon',
+                'version': MARATHON_VERSION,
+                'frameworkId': FRAMEWORK_ID,
+                'leader': 'localhost:{}'.format(self.server.server_port),
+                'elected': True
+            })
+
+        def get_leader(self):
+            self.send_json({'leader': 'localhost:{}'.format(self.server.server_port)})
+
+        def get_ping(self):
+            data = b'pong'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def get_apps(self):
+            with cluster.lock:
+                self.send_json({'apps': [cluster.app_json(app) for app in cluster.apps.values()]})
+
+        def get_app(self, id):
+            with cluster.lock:
+                if id not in cluster.apps:
+                    raise SimulatorException(404, "App '{}' does not exist".format(id))
+                self.send_json({'app': cluster.app_json(cluster.apps[id])})
+
+        def get_app_tasks(self, id):
+            with cluster.lock:
+                tasks = [cluster.task_json(cluster.tasks[task_id]) for task_id in cluster.spec_tasks.get(id, [])]
+            self.send_json({'tasks': tasks})
+
+        def post_app(self):
+            app = self.read_json()
+            deployment = cluster.add_app(app, self.force())
+            with cluster.lock:
+                body = cluster.app_json(cluster.apps[absolute_id(app['id'])])
+            self.send_deployment(deployment, 201, body)
+
+        def put_app(self, id):
+            self.send_deployment(cluster.update_app(id, self.read_json(), self.force()))
+
+        def put_apps(self):
+            self.send_deployment(cluster.update_apps(self.read_json(), self.force()))
+
+        def delete_app(self, id):
+            self.send_deployment(cluster.remove_app(id, self.force()))
+
+        def get_group(self, id='/'):
+            with cluster.lock:
+                self.send_json({
+                    'id': absolute_id(id),
+                    'apps': [cluster.app_json(app) for app in cluster.apps.values() if in_group(app['id'], id)],
+                    'pods': [pod for pod in cluster.pods.values() if in_group(pod['id'], id)],
+                    'groups': [],
+                    'dependencies': []
+                })
+
+        def put_group(self, id='/'):
+            deployment = cluster.update_group(self.read_json(), absolute_id(id), self.force())
+            self.send_deployment(deployment, 201)
+
+        def delete_group(self, id='/'):
+            self.send_deployment(cluster.remove_group(absolute_id(id), self.force()))
+
+        def get_pods(self):
+            with cluster.lock:
+                self.send_json(list(cluster.pods.values()))
+
+        def get_pods_status(self):
+            with cluster.lock:
+                self.send_json([cluster.pod_status(pod) for pod in cluster.pods.values()])
+
+        def get_pod(self, id):
+            with cluster.lock:
+                if id not in cluster.pods:
+                    raise SimulatorException(404, "Pod '{}' does not exist".format(id))
+                self.send_json(cluster.pods[id])
+
+        def get_pod_status(self, id):
+            with cluster.lock:
+                if id not in cluster.pods:
+                    raise SimulatorException(404, "Pod '{}' does not exist".format(id))
+                self.send_json(cluster.pod_status(cluster.pods[id]))
+
+        def post_pod(self):
+            pod = self.read_json()
+            deployment = cluster.add_pod(pod, self.force())
+            self.send_deployment(deployment, 201, cluster.pods[absolute_id(pod['id'])])
+
+        def delete_pod(self, id):
+            self.send_deployment(cluster.remove_pod(id, self.force()), 202, {})
+
+        def get_deployments(self):
+            with cluster.lock:
+                self.send_json(list(cluster.deployments.values()))
+
+        def delete_deployment(self, id):
+            self.send_deployment(cluster.remove_deployment(id, self.force()))
+
+        def get_queue(self):
+            with cluster.lock:
+                self.send_json({'queue': cluster.queue()})
+
+        def get_tasks(self):
+            with cluster.lock:
+                tasks = [cluster.task_json(task) for task in cluster.tasks.values()]
+            self.send_json({'tasks': tasks})
+
+        def get_events(self):
+            """ Server sent events, written as chunks of an HTTP/1.1 chunked response.
+            """
+            queue = cluster.subscribe(self.query.get('event_type'))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                while not cluster.stopped.is_set():
+                    try:
+                        event = queue.get(timeout=1)
+                    except Empty:
+                        continue
+                    data = 'event: {}\ndata: {}\n\n'.format(event['eventType'], json.dumps(event)).encode('utf-8')
+                    self.wfile.write('{:x}\r\n'.format(len(data)).encode('ascii') + data + b'\r\n')
+                    self.wfile.flush()
+            except (IOError, OSError):
+                pass
+            finally:
+                cluster.unsubscribe(queue)
+                self.close_connection = True
+
+        # mesos
+
+        def get_mesos_state(self):
+            with cluster.lock:
+                self.send_json(cluster.mesos_state())
+
+        def get_mesos_state_summary(self):
+            with cluster.lock:
+                self.send_json({
+                    'slaves': cluster.agents_json(),
+                    'frameworks': [{'id': FRAMEWORK_ID, 'name': 'marathon', 'active': True,
+                                    'TASK_RUNNING': cluster.metrics()['master/tasks_running']}]
+                })
+
+        def get_mesos_slaves(self):
+            with cluster.lock:
+                self.send_json({'slaves': cluster.agents_json()})
+
+        def get_metrics(self):
+            with cluster.lock:
+                self.send_json(cluster.metrics())
+
+    return Handler
+
+
+class SimulatorServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def create_simulator(port=8080, cluster=None, faults=None):
+    """ Creates (but does not start serving) a simulator server on `port` (0 for any free port).
+        The cluster ticker is started.
+    """
+    if cluster is None:
+        cluster = SimulatedCluster()
+    if faults is None:
+        faults = EndpointFaults()
+
+    cluster.start()
+    server = SimulatorServer(('', port), make_handler(cluster, faults))
+    server.cluster = cluster
+    return server
+
+
+def parse_settings(settings):
+    """ Parses `PATH=VALUE` options into a map of path to float.
+    """
+    parsed = {}
+    for setting in settings:
+        path, value = setting.rsplit('=', 1)
+        parsed[path] = float(value)
+    return parsed
+
+
+@click.command()
+@click.option('--port', default=8080, help='Port to serve on')
+@click.option('--launch-rate', default=500.0, help='Tasks launched per second')
+@click.option('--kill-rate', default=None, type=float, help='Tasks killed per second (default: launch rate)')
+@click.option('--staging-time', default=0.5, help='Seconds a task stays in TASK_STAGING')
+@click.option('--agents', default=10, help='Number of simulated private agents')
+@click.option('--task-failure-rate', default=0.0, help='Fraction of staged tasks which fail instead of running')
+@click.option('--latency', multiple=True, help='PATH=SECONDS latency added to an endpoint, ex. /v2/apps=0.05')
+@click.option('--failure', multiple=True, help='PATH=RATE fraction of requests answered with a 503, ex. /v2/deployments=0.01')
+@click.option('--verbose', is_flag=True, help='Log every request')
+def main(port, launch_rate, kill_rate, staging_time, agents, task_failure_rate, latency, failure, verbose):
+    """
+        CLI entry point for the marathon simulator.
+        Point the harness at it with `dcos config set core.dcos_url http://localhost:<port>`.
+    """
+    logging.basicConfig(
+        format='%(asctime)s %(levelname)-8s: %(message)s',
+        level=logging.DEBUG if verbose else logging.INFO)
+
+    cluster = SimulatedCluster(launch_rate, kill_rate, staging_time, agents, task_failure_rate)
+    faults = EndpointFaults(parse_settings(latency), parse_settings(failure))
+    server = create_simulator(port, cluster, faults)
+    logging.info('Marathon simulator serving on port %d', port)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    cluster.stop()
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main()
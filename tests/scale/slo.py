@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+import click
+import json
+import os
+
+from common import get_test_style, sharded_style, shard_size_of, total_errors, MAX_HOURS_OF_TEST
+from store import ResultStore
+"""
+    Scale SLOs: the budgets a scale run has to stay within, by test style.
+    slo.json has for each style (`instances`, `count`, `group`) any of
+        deploy_time     - max seconds to reach the target, at most `MAX_HOURS_OF_TEST`
+        max_errors      - max error events during the test
+    A budget is either a number for every target or a map of target to number, in which case
+    only the listed targets are checked.  Sharded group styles (`group-shard1000`) use the
+    budgets of their own style if listed, otherwise those of `group`.
+    A test the planner skipped because its predicted deploy time is over the time of a test
+    violates its deploy time budget with the prediction, so a slowdown can not pass by being skipped.
+
+    ./slo.py check --store scale-results.db --run 12
+"""
+
+SLO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'slo.json')
+
+# environment variable naming another SLO file, `none` disables the SLO gate
+SLO_FILE_ENV = 'SCALE_SLO_FILE'
+
+# a deploy time budget over the time a test may take can never be exceeded
+MAX_DEPLOY_TIME_BUDGET = MAX_HOURS_OF_TEST * 3600
+
+
+def slo_file():
+    return os.environ.get(SLO_FILE_ENV, SLO_FILE)
+
+
+def load_slos(filename=None):
+    """ The SLOs by style, or None if there is no SLO file (or it is disabled).
+    """
+    filename = filename or slo_file()
+    if filename.lower() == 'none' or not os.path.exists(filename):
+        return None
+    with open(filename) as f:
+        slos = json.load(f)
+
+    for style, slo in slos.items():
+        deploy_time = slo.get('deploy_time')
+        limits = deploy_time.items() if isinstance(deploy_time, dict) else [('every target', deploy_time)]
+        for target, limit in limits:
+            if limit is not None and limit > MAX_DEPLOY_TIME_BUDGET:
+                raise ValueError('The deploy_time budget of {} {} in {} is {}s, over the {} hours a test may take'.format(
+                    style, target, filename, limit, MAX_HOURS_OF_TEST))
+    return slos
+
+
+def style_slos(slos, style):
+    if style in slos:
+        return slos[style]
+    if shard_size_of(style) is not None:
+        return slos.get(style.split('-shard')[0], {})
+    return {}
+
+
+def budget(slo, name, target):
+    """ The budget `name` of the style `slo` at `target`, None if there is none.
+    """
+    value = slo.get(name)
+    if isinstance(value, dict):
+        return value.get(str(target))
+    return value
+
+
+class Violation(object):
+    """ A budget exceeded by a test.
+    """
+
+    def __init__(self, test_name, style, target, name, value, limit, unit='', predicted=False):
+        self.test_name = test_name
+        self.style = style
+        self.target = target
+        self.name = name
+        self.value = value
+        self.limit = limit
+        self.unit = unit
+        self.predicted = predicted
+
+    def __str__(self):
+        if self.value is None:
+            return '{} {}: {} did not reach the target (budget {:g}{})'.format(
+                self.style, self.target, self.name, self.limit, self.unit)
+
+        name = '{} predicted (skipped)'.format(self.name) if self.predicted else self.name
+        change = ''
+        if self.limit:
+            change = ' ({:+.0f}%)'.format((self.value - self.limit) * 100.0 / self.limit)
+        return '{} {}: {} {:g}{} > {:g}{}{}'.format(
+            self.style, self.target, name, round(self.value, 1), self.unit, self.limit, self.unit, change)
+
+
+def check_result(test_name, style, target, skipped, success, deploy_time, errors, slos, predicted_time=None):
+    """ The violations of the SLOs by the result of one test.  Skipped tests have none, unless
+        the planner skipped them with a `predicted_time` over their deploy time budget.
+    """
+    slo = style_slos(slos, style)
+    limit = budget(slo, 'deploy_time', target)
+    if skipped:
+        if limit is not None and predicted_time is not None and predicted_time > limit:
+            return [Violation(test_name, style, target, 'deploy_time', predicted_time, limit, 's', predicted=True)]
+        return []
+
+    violations = []
+    if limit is not None:
+        if not success:
+            violations.append(Violation(test_name, style, target, 'deploy_time', None, limit, 's'))
+        elif deploy_time > limit:
+            violations.append(Violation(test_name, style, target, 'deploy_time', deploy_time, limit, 's'))
+
+    limit = budget(slo, 'max_errors', target)
+    if limit is not None and errors > limit:
+        violations.append(Violation(test_name, style, target, 'max_errors', errors, limit))
+
+    return violations
+
+
+def check_tests(scale_tests, slos):
+    """ The violations of the SLOs by the scale tests of a run.
+    """
+    violations = []
+    for scale_test in scale_tests:
+        violations.extend(check_result(
+            scale_test.name,
+            get_test_style(scale_test),
+            scale_test.target,
+            scale_test.skipped,
+            scale_test.deploy_results.success,
+            scale_test.test_time,
+            total_errors(scale_test.events),
+            slos,
+            scale_test.predicted_time))
+
+    return violations
+
+
+def slo_report(violations, checked, filename=None):
+    """ A concise report of the violations, one line each.
+    """
+    if not violations:
+        return 'SLOs met by {} tests'.format(checked)
+
+    lines = ['{} SLO violations in {} tests ({}):'.format(len(violations), checked, filename or slo_file())]
+    lines.extend('  {}'.format(violation) for violation in violations)
+    return '\n'.join(lines)
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--store', default='scale-results.db', help='Name of the results database')
+@click.option('--run', default=None, type=int, help='Run to check (default: the last one)')
+@click.option('--slos', default=None, help='SLO file (default: slo.json next to this script)')
+def check(store, run, slos):
+    """ Checks a stored run against the SLOs, exits with 1 if any was violated.
+    """
+    slo_budgets = load_slos(slos)
+    if slo_budgets is None:
+        raise click.UsageError('No SLO file {}'.format(slos or slo_file()))
+
+    with ResultStore(store) as results:
+        rows = results.test_results(run)
+
+    violations = []
+    for row in rows:
+        style = sharded_style(row['style'], row['shard_size'])
+        violations.extend(check_result(row['name'], style, row['target'], row['skipped'],
+                                       row['deploy_success'], row['deploy_time'], row['errors'], slo_budgets,
+                                       row['predicted_time']))
+
+    click.echo(slo_report(violations, len(rows), slos))
+    raise SystemExit(1 if violations else 0)
+
+
+if __name__ == '__main__':
+    cli()
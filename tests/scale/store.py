@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+
+import click
+import json
+import sqlite3
+import time
+
+from datetime import datetime
+
+from common import get_key, empty_stats, pass_status, pretty_duration_safe, sharded_style, shard_size_of, total_errors, \
+    PERCENTILES, TASK_TIMES
+from histogram import from_buckets
+"""
+    SQLite store of scale test runs.
+    Every run of a scale test module is saved with its cluster metadata, and for each test
+    its results, events, phase timings and response time histograms.  This makes it possible
+    to compare runs across marathon versions without diffing scale-test.csv files.
+
+    ./store.py runs
+    ./store.py trend --style instances --target 10000 --last 20
+"""
+
+STORE_FILE = 'scale-results.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL,
+    marathon TEXT,
+    marathon_version TEXT,
+    dcos_version TEXT,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS tests (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER REFERENCES runs(id),
+    name TEXT,
+    marathon TEXT,
+    under_test TEXT,
+    style TEXT,
+    shard_size INTEGER,
+    count INTEGER,
+    instance INTEGER,
+    target INTEGER,
+    max INTEGER,
+    status TEXT,
+    skipped INTEGER,
+    launch_success INTEGER,
+    deploy_success INTEGER,
+    deploy_time REAL,
+    undeploy_time REAL,
+    errors INTEGER,
+    response_p50 REAL,
+    response_p90 REAL,
+    response_p99 REAL,
+    response_max REAL,
+    staging_p50 REAL,
+    staging_p90 REAL,
+    staging_p99 REAL,
+    running_p50 REAL,
+    running_p90 REAL,
+    running_p99 REAL,
+    started REAL,
+    predicted_time REAL
+);
+CREATE INDEX IF NOT EXISTS tests_by_style ON tests (marathon, style, target);
+CREATE TABLE IF NOT EXISTS events (
+    test_id INTEGER REFERENCES tests(id),
+    seq INTEGER,
+    event TEXT
+);
+CREATE TABLE IF NOT EXISTS phases (
+    test_id INTEGER REFERENCES tests(id),
+    phase TEXT,
+    success INTEGER,
+    start REAL,
+    response_count INTEGER,
+    response_mean REAL,
+    response_p50 REAL,
+    response_p90 REAL,
+    response_p99 REAL,
+    response_max REAL
+);
+CREATE TABLE IF NOT EXISTS response_buckets (
+    test_id INTEGER REFERENCES tests(id),
+    phase TEXT,
+    endpoint TEXT,
+    resolution REAL,
+    growth REAL,
+    bucket INTEGER,
+    count INTEGER
+);
+"""
+
+# stats which can be queried for trends and the column holding them
+TREND_STATS = {
+    'deploy_time': 'deploy_time',
+    'undeploy_time': 'undeploy_time',
+    'max': 'max',
+    'errors': 'errors',
+    'response_p50': 'response_p50',
+    'response_p90': 'response_p90',
+    'response_p99': 'response_p99',
+    'response_max': 'response_max',
+    'staging_p50': 'staging_p50',
+    'staging_p90': 'staging_p90',
+    'staging_p99': 'staging_p99',
+    'running_p50': 'running_p50',
+    'running_p90': 'running_p90',
+    'running_p99': 'running_p99',
+    'predicted_time': 'predicted_time'
+}
+
+# columns added to the tests table after it was created, with their types, in the order they were added
+ADDED_TEST_COLUMNS = [
+    ('staging_p50', 'REAL'),
+    ('staging_p90', 'REAL'),
+    ('staging_p99', 'REAL'),
+    ('running_p50', 'REAL'),
+    ('running_p90', 'REAL'),
+    ('running_p99', 'REAL'),
+    ('shard_size', 'INTEGER'),
+    ('predicted_time', 'REAL')
+]
+
+# phase of the response_buckets rows holding the task time histograms (by task time)
+TASK_TIMES_PHASE = 'task'
+
+
+class ResultStore(object):
+    """ A SQLite database of scale test runs.  Can be used as a context manager.
+    """
+
+    def __init__(self, filename=STORE_FILE):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        self._add_columns()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _add_columns(self):
+        """ Adds the columns missing in a database of an older version of this module.
+        """
+        columns = [row['name'] for row in self.connection.execute('PRAGMA table_info(tests)')]
+        with self.connection:
+            for column, column_type in ADDED_TEST_COLUMNS:
+                if column not in columns:
+                    self.connection.execute('ALTER TABLE tests ADD COLUMN {} {}'.format(column, column_type))
+
+    def save_run(self, scale_tests, metadata):
+        """ Saves the `scale_tests` of a run (the test log of a test module) with the cluster
+            `metadata` from `get_cluster_metadata`.  Returns the id of the run.
+        """
+        started = min([scale_test.start for scale_test in scale_tests] or [time.time()])
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO runs (started, marathon, marathon_version, dcos_version, metadata) VALUES (?, ?, ?, ?, ?)',
+                (started,
+                 metadata.get('marathon'),
+                 metadata.get('marathon-version'),
+                 metadata.get('dcos-version'),
+                 json.dumps(metadata)))
+            run_id = cursor.lastrowid
+            for scale_test in scale_tests:
+                self._save_test(run_id, scale_test)
+        return run_id
+
+    def _save_test(self, run_id, scale_test):
+        response_times = scale_test.response_times().summary()
+        task_times = scale_test.task_timer.summary()
+        cursor = self.connection.execute(
+            'INSERT INTO tests (run_id, name, marathon, under_test, style, shard_size, count, instance, target, max, status, '
+            'skipped, launch_success, deploy_success, deploy_time, undeploy_time, errors, '
+            'response_p50, response_p90, response_p99, response_max, '
+            'staging_p50, staging_p90, staging_p99, running_p50, running_p90, running_p99, started, predicted_time) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (run_id,
+             scale_test.name,
+             scale_test.mom,
+             scale_test.under_test,
+             scale_test.style,
+             scale_test.shard_size,
+             scale_test.count,
+             scale_test.instance,
+             scale_test.target,
+             scale_test.deploy_results.current_scale,
+             scale_test.status,
+             scale_test.skipped,
+             scale_test.launch_results.success,
+             scale_test.deploy_results.success,
+             scale_test.test_time,
+             scale_test.undeploy_time,
+             total_errors(scale_test.events),
+             response_times['p50'],
+             response_times['p90'],
+             response_times['p99'],
+             response_times['max'],
+             task_times['staging']['p50'],
+             task_times['staging']['p90'],
+             task_times['staging']['p99'],
+             task_times['running']['p50'],
+             task_times['running']['p90'],
+             task_times['running']['p99'],
+             scale_test.start,
+             scale_test.predicted_time))
+        test_id = cursor.lastrowid
+
+        self.connection.executemany(
+            'INSERT INTO events (test_id, seq, event) VALUES (?, ?, ?)',
+            [(test_id, seq, event) for seq, event in enumerate(scale_test.events)])
+
+        for phase, results in scale_test.phases().items():
+            summary = results.all_response_times().summary()
+            self.connection.execute(
+                'INSERT INTO phases (test_id, phase, success, start, response_count, response_mean, '
+                'response_p50, response_p90, response_p99, response_max) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (test_id, phase, results.success, results.start, summary['count'], summary['mean'],
+                 summary['p50'], summary['p90'], summary['p99'], summary['max']))
+
+            for endpoint, histogram in results.response_times.items():
+                self._save_buckets(test_id, phase, endpoint, histogram)
+
+        timer = scale_test.task_timer
+        self._save_buckets(test_id, TASK_TIMES_PHASE, 'staging', timer.staging)
+        self._save_buckets(test_id, TASK_TIMES_PHASE, 'running', timer.running)
+
+    def _save_buckets(self, test_id, phase, endpoint, histogram):
+        self.connection.executemany(
+            'INSERT INTO response_buckets (test_id, phase, endpoint, resolution, growth, bucket, count) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(test_id, phase, endpoint, histogram.resolution, histogram.growth, bucket, count)
+             for bucket, count in histogram.buckets.items()])
+
+    def runs(self, limit=20):
+        """ The last `limit` runs, newest first.
+        """
+        return self.connection.execute(
+            'SELECT runs.*, COUNT(tests.id) AS tests FROM runs LEFT JOIN tests ON tests.run_id = runs.id '
+            'GROUP BY runs.id ORDER BY runs.started DESC LIMIT ?', (limit,)).fetchall()
+
+    def last_run_id(self):
+        row = self.connection.execute('SELECT id FROM runs ORDER BY started DESC LIMIT 1').fetchone()
+        if row is None:
+            raise ValueError('No runs in {}'.format(self.filename))
+        return row['id']
+
+    def trend(self, style, target, stat='deploy_time', marathon='root', limit=20):
+        """ The `stat` of the `style` test at `target` for the last `limit` runs, oldest first.
+            ex. trend('instances', 10000) is the deploy time at 10k instances over the last 20 runs.
+            Sharded group tests are queried with their sharded style, ex. `group-shard1000`.
+        """
+        shard_size = shard_size_of(style)
+        if shard_size is not None:
+            style = style.split('-shard')[0]
+        if stat not in TREND_STATS:
+            raise ValueError('Unknown stat {}, expected one of {}'.format(stat, sorted(TREND_STATS)))
+
+        rows = self.connection.execute(
+            'SELECT runs.id AS run_id, tests.started, runs.marathon_version, tests.status, tests.{} AS value '
+            'FROM tests JOIN runs ON tests.run_id = runs.id '
+            'WHERE tests.marathon = ? AND tests.style = ? AND tests.shard_size IS ? AND tests.target = ? '
+            'AND NOT tests.skipped ORDER BY tests.started DESC LIMIT ?'.format(TREND_STATS[stat]),
+            (marathon, style, shard_size, target, limit)).fetchall()
+        return list(reversed(rows))
+
+    def deploy_times(self, marathon='root', runs=5):
+        """ The style, shard size, target and deploy time of the successful tests of the last `runs` runs.
+        """
+        return self.connection.execute(
+            'SELECT style, shard_size, target, deploy_time FROM tests '
+            'WHERE marathon = ? AND NOT skipped AND deploy_success AND deploy_time > 0 AND run_id IN '
+            '(SELECT id FROM runs ORDER BY started DESC LIMIT ?)', (marathon, runs)).fetchall()
+
+    def load_metadata(self, run_id=None):
+        if run_id is None:
+            run_id = self.last_run_id()
+        row = self.connection.execute('SELECT metadata FROM runs WHERE id = ?', (run_id,)).fetchone()
+        return json.loads(row['metadata'])
+
+    def test_results(self, run_id=None):
+        """ The tests of a run (by default the last one) in the order they ran.
+        """
+        if run_id is None:
+            run_id = self.last_run_id()
+        return self.connection.execute('SELECT * FROM tests WHERE run_id = ? ORDER BY id', (run_id,)).fetchall()
+
+    def load_stats(self, run_id=None):
+        """ The stats of a run (by default the last one) in the layout of `collect_stats`,
+            which `create_scale_graph` plots.
+        """
+        stats = empty_stats()
+        for row in self.test_results(run_id):
+            values = {
+                'target': row['target'],
+                'max': row['max'],
+                'deploy_time': row['deploy_time'],
+                'human_deploy_time': pretty_duration_safe(row['deploy_time']),
+                'launch_status': status_letter(row, row['launch_success']),
+                'deployment_status': status_letter(row, row['deploy_success']),
+                'errors': row['errors'],
+                'response_max': row['response_max'],
+                'predicted_time': row['predicted_time']
+            }
+            for prefix in ['response'] + TASK_TIMES:
+                for percent in PERCENTILES:
+                    stat_key = '{}_p{}'.format(prefix, percent)
+                    values[stat_key] = row[stat_key]
+
+            style = sharded_style(row['style'], row['shard_size'])
+            for stat_key, value in values.items():
+                stats.setdefault(get_key(row['marathon'], style, stat_key), []).append(value)
+
+        return stats
+
+    def response_histogram(self, test_id, phase=None, endpoint=None):
+        """ Rebuilds the response time histogram of a test, for one phase (and endpoint) or all of them.
+            The task times are saved as the `staging` and `running` endpoints of the `task` phase.
+        """
+        query = 'SELECT * FROM response_buckets WHERE test_id = ?'
+        params = [test_id]
+        if phase is not None:
+            query += ' AND phase = ?'
+            params.append(phase)
+        else:
+            query += ' AND phase != ?'
+            params.append(TASK_TIMES_PHASE)
+        if endpoint is not None:
+            query += ' AND endpoint = ?'
+            params.append(endpoint)
+
+        buckets = {}
+        resolution, growth = 0.001, 1.08
+        for row in self.connection.execute(query, params):
+            resolution, growth = row['resolution'], row['growth']
+            buckets[row['bucket']] = buckets.get(row['bucket'], 0) + row['count']
+        return from_buckets(buckets, resolution, growth)
+
+
+class StoredTest(object):
+    """ The status attributes of a stored test which `pass_status` reads.
+    """
+
+    def __init__(self, row):
+        self.skipped = bool(row['skipped'])
+
+
+def status_letter(row, successful):
+    return pass_status(StoredTest(row), successful)
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+
+
+@click.group()
+@click.option('--store', default=STORE_FILE, help='Name of the results database')
+@click.pass_context
+def cli(ctx, store):
+    """
+        CLI entry point for querying stored scale test runs.
+    """
+    ctx.obj = store
+
+
+@cli.command()
+@click.option('--last', default=20, help='Number of runs to list')
+@click.pass_obj
+def runs(store, last):
+    """ Lists the stored runs, newest first.
+    """
+    with ResultStore(store) as results:
+        click.echo('{:>5}  {:16}  {:8}  {:20}  {:10}  {:>5}'.format('run', 'started', 'marathon', 'version', 'dcos', 'tests'))
+        for run in results.runs(last):
+            click.echo('{:>5}  {:16}  {:8}  {:20}  {:10}  {:>5}'.format(
+                run['id'],
+                format_time(run['started']),
+                str(run['marathon']),
+                str(run['marathon_version']),
+                str(run['dcos_version']),
+                run['tests']))
+
+
+@cli.command()
+@click.option('--style', default='instances', help='Test style: instances, count, group or group-shard<size>')
+@click.option('--target', default=10000, help='Scale target of the test')
+@click.option('--stat', default='deploy_time', type=click.Choice(sorted(TREND_STATS)), help='Stat to report')
+@click.option('--marathon', default='root', help='Marathon under test (root or a MoM)')
+@click.option('--last', default=20, help='Number of runs')
+@click.pass_obj
+def trend(store, style, target, stat, marathon, last):
+    """ Reports a stat of one test across the last runs, ex. the deploy time at 10k instances.
+    """
+    with ResultStore(store) as results:
+        click.echo('{} of {} {} at {} over the last {} runs'.format(stat, marathon, style, target, last))
+        for row in results.trend(style, target, stat, marathon, last):
+            click.echo('{:>5}  {:16}  {:20}  {:10}  {}'.format(
+                row['run_id'],
+                format_time(row['started']),
+                str(row['marathon_version']),
+                row['status'],
+                row['value']))
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,352 @@
+import math
+
+from xml.sax.saxutils import escape
+"""
+    Dependency free SVG rendering of the scale graphs.
+    SvgFigure and SvgAxes implement the part of the matplotlib figure and axes API used by
+    graph.py, so the same plotting functions render with or without matplotlib and numpy.
+    Only line, marker and band plots over linear or log x axes are supported.
+"""
+
+# pixels per inch of `set_size_inches`, the matplotlib default
+DPI = 100
+
+# pixels around the plot area of each axes: left, right, top, bottom
+MARGINS = (80, 30, 30, 50)
+
+# the default matplotlib color cycle
+COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22',
+          '#17becf']
+
+FONT = 'font-family="sans-serif" font-size="{}"'
+
+# stroke-dasharray of the line styles
+DASHES = {'-': None, 'solid': None, '--': '6,4', 'dashed': '6,4', ':': '2,3', 'dotted': '2,3', '-.': '6,3,2,3'}
+
+
+def is_number(value):
+    return value is not None and not (isinstance(value, float) and math.isnan(value))
+
+
+def values_of(array):
+    """ The values of a list or numpy array as floats, None where there is no value.
+    """
+    return [float(value) if is_number(value) and not math.isnan(float(value)) else None for value in array]
+
+
+def nice_limit(top):
+    """ The smallest 1, 2, 2.5 or 5 times a power of 10 which is at least `top`.
+    """
+    if top <= 0:
+        return 1
+    magnitude = 10 ** math.floor(math.log10(top))
+    for step in (1, 2, 2.5, 5, 10):
+        if step * magnitude >= top:
+            return step * magnitude
+    return 10 * magnitude
+
+
+def tick_label(value):
+    return str(int(value)) if value == int(value) else '{:g}'.format(value)
+
+
+class SvgLine(object):
+    """ The handle of a plotted line, like the `Line2D` matplotlib returns.
+    """
+
+    def __init__(self, color):
+        self.color = color
+
+    def get_color(self):
+        return self.color
+
+
+class SvgText(object):
+    """ The title of an axes, like the matplotlib `Text`.
+    """
+
+    def __init__(self):
+        self.text = ''
+
+    def set_text(self, text):
+        self.text = text
+
+
+class SvgAxes(object):
+    """ One plot of a figure.  Collects the series and renders them into the area it is given.
+    """
+
+    def __init__(self):
+        self.title = SvgText()
+        self.xlabel = ''
+        self.ylabel = ''
+        self.series = []
+        self.bands = []
+        self.texts = []
+        self.xticks = None
+        self.xticklabels = None
+        self.xscale = 'linear'
+        self.ylim = (None, None)
+        self.show_grid = False
+        self.show_legend = False
+        self.color_index = 0
+
+    def next_color(self):
+        color = COLORS[self.color_index % len(COLORS)]
+        self.color_index += 1
+        return color
+
+    def plot(self, x, y, label=None, linestyle='-', color=None, marker=None, markersize=None):
+        color = color or self.next_color()
+        self.series.append({
+            'x': values_of(x),
+            'y': values_of(y),
+            'label': label,
+            'linestyle': linestyle,
+            'color': color,
+            'marker': marker,
+            'markersize': markersize or 6
+        })
+        return [SvgLine(color)]
+
+    def fill_between(self, x, low, high, color=None, alpha=0.2, label=None):
+        self.bands.append({
+            'x': values_of(x),
+            'low': values_of(low),
+            'high': values_of(high),
+            'color': color or self.next_color(),
+            'alpha': alpha,
+            'label': label
+        })
+
+    def text(self, x, y, text, wrap=False):
+        self.texts.append((float(x), float(y), text))
+
+    def set_title(self, title):
+        self.title.set_text(title)
+
+    def set_xlabel(self, label):
+        self.xlabel = label
+
+    def set_ylabel(self, label):
+        self.ylabel = label
+
+    def set_xticks(self, ticks):
+        self.xticks = values_of(ticks)
+
+    def set_xticklabels(self, labels):
+        self.xticklabels = [str(label) for label in labels]
+
+    def set_xscale(self, scale):
+        self.xscale = scale
+
+    def set_ylim(self, bottom=None, top=None):
+        self.ylim = (bottom, top)
+
+    def grid(self, show=True):
+        self.show_grid = show
+
+    def legend(self, loc=None):
+        self.show_legend = True
+
+    def x_values(self):
+        values = [x for series in self.series for x in series['x']] + [x for band in self.bands for x in band['x']]
+        values += self.xticks or []
+        values = [x for x in values if x is not None]
+        if self.xscale == 'log':
+            values = [x for x in values if x > 0]
+        return values
+
+    def y_values(self):
+        values = [y for series in self.series for y in series['y']] + [y for band in self.bands for y in band['high']]
+        values += [y for x, y, text in self.texts]
+        return [y for y in values if y is not None]
+
+    def render(self, left, top, width, height):
+        """ The SVG elements of the axes in the area at (left, top) of `width` x `height` pixels.
+        """
+        area_left = left + MARGINS[0]
+        area_top = top + MARGINS[2]
+        area_width = width - MARGINS[0] - MARGINS[1]
+        area_height = height - MARGINS[2] - MARGINS[3]
+
+        xs = self.x_values() or [0, 1]
+        transform = math.log10 if self.xscale == 'log' else float
+        x_low = transform(min(xs))
+        x_high = transform(max(xs))
+        if x_high == x_low:
+            x_low, x_high = x_low - 1, x_high + 1
+        x_pad = (x_high - x_low) * 0.05
+        x_low, x_high = x_low - x_pad, x_high + x_pad
+
+        y_low = self.ylim[0] if self.ylim[0] is not None else min([0] + self.y_values())
+        y_high = self.ylim[1] if self.ylim[1] is not None else nice_limit(max([0] + self.y_values()))
+
+        def px(x):
+            return area_left + (transform(x) - x_low) / (x_high - x_low) * area_width
+
+        def py(y):
+            return area_top + area_height - (y - y_low) / float(y_high - y_low) * area_height
+
+        elements = ['<rect x="{:.1f}" y="{:.1f}" width="{:.1f}" height="{:.1f}" fill="none" stroke="black"/>'.format(
+            area_left, area_top, area_width, area_height)]
+
+        # y ticks and grid
+        for i in range(6):
+            value = y_low + (y_high - y_low) * i / 5.0
+            y = py(value)
+            if self.show_grid:
+                elements.append('<line x1="{:.1f}" y1="{:.1f}" x2="{:.1f}" y2="{:.1f}" stroke="#b0b0b0" '
+                                'stroke-width="0.8"/>'.format(area_left, y, area_left + area_width, y))
+            elements.append('<text x="{:.1f}" y="{:.1f}" text-anchor="end" {}>{}</text>'.format(
+                area_left - 6, y + 4, FONT.format(11), tick_label(round(value, 2))))
+
+        # x ticks and grid
+        xticks = self.xticks if self.xticks is not None else sorted(set(xs))
+        labels = self.xticklabels or [tick_label(x) for x in xticks]
+        for x, label in zip(xticks, labels):
+            if x is None or (self.xscale == 'log' and x <= 0):
+                continue
+            position = px(x)
+            if self.show_grid:
+                elements.append('<line x1="{:.1f}" y1="{:.1f}" x2="{:.1f}" y2="{:.1f}" stroke="#b0b0b0" '
+                                'stroke-width="0.8"/>'.format(position, area_top, position, area_top + area_height))
+            elements.append('<text x="{:.1f}" y="{:.1f}" text-anchor="middle" {}>{}</text>'.format(
+                position, area_top + area_height + 16, FONT.format(11), escape(label)))
+
+        for band in self.bands:
+            points = [(px(x), py(high)) for x, high in zip(band['x'], band['high']) if x is not None and high is not None]
+            points += reversed([(px(x), py(low)) for x, low in zip(band['x'], band['low'])
+                                if x is not None and low is not None])
+            if points:
+                elements.append('<polygon points="{}" fill="{}" fill-opacity="{}" stroke="none"/>'.format(
+                    ' '.join('{:.1f},{:.1f}'.format(x, y) for x, y in points), band['color'], band['alpha']))
+
+        for series in self.series:
+            elements.extend(self.render_series(series, px, py))
+
+        for x, y, text in self.texts:
+            elements.append('<text x="{:.1f}" y="{:.1f}" {}>{}</text>'.format(px(x), py(y) - 4, FONT.format(10),
+                                                                                escape(text)))
+
+        elements.append('<text x="{:.1f}" y="{:.1f}" text-anchor="middle" {}>{}</text>'.format(
+            area_left + area_width / 2.0, area_top - 10, FONT.format(13), escape(self.title.text)))
+        if self.xlabel:
+            elements.append('<text x="{:.1f}" y="{:.1f}" text-anchor="middle" {}>{}</text>'.format(
+                area_left + area_width / 2.0, area_top + area_height + 36, FONT.format(11), escape(self.xlabel)))
+        if self.ylabel:
+            elements.append('<text x="{0:.1f}" y="{1:.1f}" text-anchor="middle" transform="rotate(-90 {0:.1f} {1:.1f})" '
+                            '{2}>{3}</text>'.format(left + 20, area_top + area_height / 2.0, FONT.format(11),
+                                                    escape(self.ylabel)))
+
+        if self.show_legend:
+            elements.extend(self.render_legend(area_left + 8, area_top + 8))
+
+        return elements
+
+    def render_series(self, series, px, py):
+        elements = []
+        points = [(x, y) for x, y in zip(series['x'], series['y'])]
+        if series['linestyle'] not in ('None', 'none', ''):
+            dash = DASHES.get(series['linestyle'])
+            segment = []
+            # a missing value breaks the line
+            for x, y in points + [(None, None)]:
+                if x is not None and y is not None:
+                    segment.append('{:.1f},{:.1f}'.format(px(x), py(y)))
+                    continue
+                if len(segment) > 1:
+                    elements.append('<polyline points="{}" fill="none" stroke="{}" stroke-width="1.5"{}/>'.format(
+                        ' '.join(segment), series['color'], ' stroke-dasharray="{}"'.format(dash) if dash else ''))
+                segment = []
+
+        if series['marker'] is not None:
+            size = series['markersize'] / 2.0
+            for x, y in points:
+                if x is None or y is None:
+                    continue
+                if series['marker'] == 'x':
+                    elements.append('<path d="M{0:.1f},{1:.1f} l{2},{2} m0,-{2} l-{2},{2}" stroke="{3}" '
+                                    'stroke-width="1.5"/>'.format(px(x) - size, py(y) - size, size * 2,
+                                                                  series['color']))
+                else:
+                    elements.append('<circle cx="{:.1f}" cy="{:.1f}" r="{}" fill="{}"/>'.format(
+                        px(x), py(y), size * 0.7, series['color']))
+        return elements
+
+    def render_legend(self, left, top):
+        entries = [(series['label'], series['color'], series['linestyle'], series['marker'])
+                   for series in self.series if series['label']]
+        entries += [(band['label'], band['color'], 'band', None) for band in self.bands if band['label']]
+        if not entries:
+            return []
+
+        width = 16 + 7 * max(len(entry[0]) for entry in entries) + 24
+        elements = ['<rect x="{}" y="{}" width="{}" height="{}" fill="white" fill-opacity="0.8" stroke="#cccccc"/>'.format(
+            left, top, width, 18 * len(entries) + 6)]
+        for i, (label, color, style, marker) in enumerate(entries):
+            y = top + 14 + 18 * i
+            if style == 'band':
+                elements.append('<rect x="{}" y="{}" width="20" height="8" fill="{}" fill-opacity="0.3"/>'.format(
+                    left + 6, y - 8, color))
+            elif style in ('None', 'none', '') and marker == 'x':
+                elements.append('<path d="M{},{} l8,8 m0,-8 l-8,8" stroke="{}" stroke-width="1.5"/>'.format(
+                    left + 12, y - 8, color))
+            elif style in ('None', 'none', ''):
+                elements.append('<circle cx="{}" cy="{}" r="4" fill="{}"/>'.format(left + 16, y - 4, color))
+            else:
+                dash = DASHES.get(style)
+                elements.append('<line x1="{}" y1="{}" x2="{}" y2="{}" stroke="{}" stroke-width="2"{}/>'.format(
+                    left + 6, y - 4, left + 26, y - 4, color,
+                    ' stroke-dasharray="{}"'.format(dash) if dash else ''))
+            elements.append('<text x="{}" y="{}" {}>{}</text>'.format(left + 32, y, FONT.format(11), escape(label)))
+        return elements
+
+
+class SvgFigure(object):
+    """ A figure of `nrows` axes stacked vertically, saved as an SVG file.
+    """
+
+    def __init__(self, nrows=1):
+        self.axes = [SvgAxes() for _ in range(nrows)]
+        self.width = 8.5 * DPI
+        self.height = 3.0 * DPI * nrows
+        self.title = None
+
+    def subplots_adjust(self, **kwargs):
+        """ Margins are fixed in pixels, see MARGINS.
+        """
+        pass
+
+    def set_size_inches(self, width, height):
+        self.width = width * DPI
+        self.height = height * DPI
+
+    def suptitle(self, title):
+        self.title = title
+
+    def render(self):
+        title_height = 30 if self.title else 0
+        row_height = (self.height - title_height) / float(len(self.axes))
+        elements = ['<rect width="100%" height="100%" fill="white"/>']
+        if self.title:
+            elements.append('<text x="{:.1f}" y="20" text-anchor="middle" {}>{}</text>'.format(
+                self.width / 2.0, FONT.format(14), escape(self.title)))
+        for i, axes in enumerate(self.axes):
+            elements.extend(axes.render(0, title_height + i * row_height, self.width, row_height))
+
+        return '<svg xmlns="http://www.w3.org/2000/svg" width="{:.0f}" height="{:.0f}">\n{}\n</svg>\n'.format(
+            self.width, self.height, '\n'.join(elements))
+
+    def savefig(self, file_name):
+        with open(file_name, 'w') as f:
+            f.write(self.render())
+
+
+def subplots(nrows=1):
+    """ The figure and its axes, like `matplotlib.pyplot.subplots`.
+    """
+    figure = SvgFigure(nrows)
+    if nrows == 1:
+        return figure, figure.axes[0]
+    return figure, figure.axes
@@ -0,0 +1,69 @@
+from common import create_test_object
+from controller import create_controller, is_overload_error, CONTROLLER_EVENT
+"""
+    Unit tests of the load controllers, they do not need a cluster.
+"""
+
+
+class EventLog(object):
+    """ The events of a ScaleTest which the controllers write.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def add_event(self, event):
+        self.events.append(event)
+
+
+def test_overload_errors():
+    assert is_overload_error('Futures timed out after [10000 milliseconds]')
+    assert is_overload_error(Exception('503 Service Unavailable'))
+    assert not is_overload_error('422 Object is not valid')
+
+
+def test_step_controller():
+    scale_test = create_test_object()
+    controller = create_controller('step', scale_test)
+    assert controller.poll_interval() == 1
+    scale_test.deploy_results.last_response_time = 10
+    assert controller.poll_interval() == 5
+    assert controller.poll_interval(5) == 10
+    assert controller.backoff_time(3) == 30
+
+
+def test_aimd_grows_each_round_under_target():
+    log = EventLog()
+    controller = create_controller('aimd', log, concurrency=2, interval=2.0)
+    for _ in range(2):
+        controller.observe_response(0.1)
+    assert controller.launch_concurrency() == 3
+    assert controller.poll_interval() == 1.5
+    assert log.events[0].startswith(CONTROLLER_EVENT)
+
+
+def test_aimd_backs_off_once_per_round():
+    controller = create_controller('aimd', EventLog(), concurrency=8, interval=1.0)
+    controller.observe_response(5.0)
+    controller.observe_error('Futures timed out')
+    assert controller.launch_concurrency() == 4
+    assert controller.poll_interval() == 2.0
+
+
+def test_aimd_bounds():
+    controller = create_controller('aimd', EventLog(), concurrency=1, interval=10.0, max_interval=15.0)
+    controller.observe_error('503')
+    assert controller.launch_concurrency() == 1
+    assert controller.poll_interval() == 15.0
+
+
+def test_latency_target_scales_by_window_p90():
+    controller = create_controller('latency', EventLog(), concurrency=10, window=10, latency_target=1.0)
+    for _ in range(10):
+        controller.observe_response(2.0)
+    assert controller.launch_concurrency() == 5
+    assert 7.5 < controller.poll_interval() < 9.0
+
+    for _ in range(10):
+        controller.observe_response(0.1)
+    assert controller.launch_concurrency() == 8
@@ -0,0 +1,39 @@
+import json
+
+from common import create_test_object, deployment_id_in, deployment_id_of
+"""
+    Unit tests of the deployment ids read from marathon responses, they do not need a cluster.
+"""
+
+
+class Response(object):
+    """ The parts of a `requests.Response` which `deployment_id_of` reads.
+    """
+
+    def __init__(self, body, headers=None):
+        self.text = body if isinstance(body, str) else json.dumps(body)
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def test_deployment_id_in():
+    assert deployment_id_in({'version': '2017-01-01', 'deploymentId': 'group-1'}) == 'group-1'
+    assert deployment_id_in({'id': '/app', 'deployments': [{'id': 'app-1'}]}) == 'app-1'
+    assert deployment_id_in({'id': '/app', 'deployments': []}) is None
+    assert deployment_id_in({'id': '/app'}) is None
+
+
+def test_deployment_id_of():
+    assert deployment_id_of(Response({'id': '/pod'}, {'Marathon-Deployment-Id': 'pod-1'})) == 'pod-1'
+    assert deployment_id_of(Response({'deploymentId': 'delete-1'})) == 'delete-1'
+    assert deployment_id_of(Response('not json')) is None
+
+
+def test_launched_deployments():
+    scale_test = create_test_object()
+    scale_test.launched('app-1')
+    scale_test.launched(None)
+    scale_test.launched(deployment_id_in({'deploymentId': 'group-1'}))
+    assert scale_test.deployment_ids == {'app-1', 'group-1'}
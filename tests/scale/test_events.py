@@ -0,0 +1,72 @@
+import events
+
+from events import DeploymentTracker
+"""
+    Unit tests of the event stream tracking, the events are fed to the tracker without a stream.
+"""
+
+
+def tracker(monkeypatch):
+    monkeypatch.setattr(events, 'marathon_url', lambda path: 'http://marathon.test/{}'.format(path))
+    return DeploymentTracker()
+
+
+def status_update(tracker, task_id, state):
+    tracker._on_event({'eventType': 'status_update_event', 'taskId': task_id, 'taskStatus': state})
+
+
+def test_status_updates(monkeypatch):
+    events_tracker = tracker(monkeypatch)
+    status_update(events_tracker, 'app.1', 'TASK_STAGING')
+    status_update(events_tracker, 'app.2', 'TASK_RUNNING')
+    status_update(events_tracker, 'app.1', 'TASK_RUNNING')
+    status_update(events_tracker, 'app.2', 'TASK_KILLED')
+    events_tracker._on_event({'eventType': 'deployment_success', 'id': 'deployment-1'})
+
+    assert events_tracker.tasks == {'app.1': 'TASK_RUNNING'}
+    assert events_tracker.terminated == {'app.2'}
+    assert events_tracker.finished == {'deployment-1'}
+    assert events_tracker.active_count() == 1
+    assert events_tracker.running_count() == 1
+
+
+def test_reconcile_keeps_updates_streamed_during_the_poll(monkeypatch):
+    events_tracker = tracker(monkeypatch)
+    status_update(events_tracker, 'app.1', 'TASK_RUNNING')
+    status_update(events_tracker, 'app.gone', 'TASK_RUNNING')
+
+    since = events_tracker.mark()
+    status_update(events_tracker, 'app.2', 'TASK_STAGING')
+    status_update(events_tracker, 'app.3', 'TASK_RUNNING')
+    status_update(events_tracker, 'app.4', 'TASK_KILLED')
+
+    # the poll started before app.2, app.3 and app.4 were updated
+    events_tracker.reconcile({
+        'app.1': 'TASK_RUNNING',
+        'app.3': 'TASK_STAGING',
+        'app.4': 'TASK_RUNNING',
+        'app.5': 'TASK_RUNNING'
+    }, since)
+
+    assert events_tracker.tasks == {
+        'app.1': 'TASK_RUNNING',
+        'app.2': 'TASK_STAGING',
+        'app.3': 'TASK_RUNNING',
+        'app.5': 'TASK_RUNNING'
+    }
+    assert set(events_tracker.updated) == {'app.2', 'app.3', 'app.4'}
+    assert events_tracker.last_reconcile is not None
+
+
+def test_reconcile_without_mark_replaces_tasks(monkeypatch):
+    events_tracker = tracker(monkeypatch)
+    status_update(events_tracker, 'app.1', 'TASK_RUNNING')
+    status_update(events_tracker, 'app.2', 'TASK_RUNNING')
+
+    events_tracker.reconcile({'app.1': 'TASK_RUNNING', 'app.3': 'TASK_STAGING'})
+    assert events_tracker.tasks == {'app.1': 'TASK_RUNNING', 'app.3': 'TASK_STAGING'}
+    assert events_tracker.updated == {}
+
+    events_tracker.reconcile()
+    assert events_tracker.tasks == {'app.1': 'TASK_RUNNING', 'app.3': 'TASK_STAGING'}
+    assert events_tracker.last_reconcile is not None
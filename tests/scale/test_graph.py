@@ -0,0 +1,58 @@
+import pytest
+
+from common import empty_stats, get_key
+from graph import compare_runs, status_values
+"""
+    Unit tests of the comparison of runs, they do not need a cluster.
+"""
+
+np = pytest.importorskip('numpy')
+
+
+def run_stats(deploy_times, statuses, errors=None):
+    stats = empty_stats()
+    targets = [100, 1000, 10000][:len(deploy_times)]
+    stats[get_key('root', 'instances', 'target')] = targets
+    stats[get_key('root', 'instances', 'deploy_time')] = deploy_times
+    stats[get_key('root', 'instances', 'deployment_status')] = statuses
+    stats[get_key('root', 'instances', 'errors')] = errors or [0] * len(targets)
+    return stats
+
+
+def regressions(baseline, run, **kwargs):
+    verdict, _ = compare_runs([('baseline', baseline), ('run', run)], **kwargs)
+    return [(regression['target'], regression['reasons']) for regression in verdict['regressions']]
+
+
+def test_status_values():
+    values = status_values(['p', 'f', 's'])
+    assert values[:2] == [1.0, 0.0]
+    assert np.isnan(values[2])
+
+
+def test_same_runs_pass():
+    stats = run_stats([10.0, 100.0, 1000.0], ['p', 'p', 'p'])
+    verdict, comparisons = compare_runs([('baseline', stats), ('run', stats)])
+    assert verdict['verdict'] == 'pass'
+    assert list(comparisons) == ['instances']
+
+
+def test_slower_and_more_errors():
+    baseline = run_stats([10.0, 100.0, 1000.0], ['p', 'p', 'p'])
+    run = run_stats([10.0, 150.0, 1000.0], ['p', 'p', 'p'], [0, 0, 20])
+    assert regressions(baseline, run, threshold=0.2, error_threshold=10) == [
+        (1000, ['slower']),
+        (10000, ['errors'])
+    ]
+
+
+def test_failed_deployment():
+    baseline = run_stats([10.0, 100.0, 1000.0], ['p', 'p', 'p'])
+    run = run_stats([10.0, 100.0, 1000.0], ['p', 'p', 'f'])
+    assert regressions(baseline, run) == [(10000, ['failed'])]
+
+
+def test_skipped_target_is_not_a_failure():
+    baseline = run_stats([10.0, 100.0, 1000.0], ['p', 'p', 'p'])
+    run = run_stats([10.0, 100.0, 0.0], ['p', 'p', 's'])
+    assert regressions(baseline, run) == []
@@ -0,0 +1,67 @@
+from histogram import Histogram, from_buckets, merged
+"""
+    Unit tests of the response time histograms, they do not need a cluster.
+"""
+
+
+def test_empty_histogram():
+    histogram = Histogram()
+    assert histogram.percentile(50) == 0.0
+    assert histogram.summary() == {'count': 0, 'mean': 0.0, 'max': 0.0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0}
+
+
+def test_percentiles_within_bucket_width():
+    histogram = Histogram()
+    values = [i / 100.0 for i in range(1, 1001)]
+    for value in values:
+        histogram.record(value)
+
+    for percent in [50, 90, 99]:
+        exact = values[int(percent / 100.0 * len(values)) - 1]
+        assert exact <= histogram.percentile(percent) <= exact * histogram.growth
+    assert histogram.percentile(100) == 10.0
+    assert histogram.count == 1000
+    assert round(histogram.mean(), 3) == 5.005
+
+
+def test_percentiles_bounded_by_recorded_values():
+    histogram = Histogram()
+    histogram.record(0.5)
+    assert histogram.percentile(50) == 0.5
+    assert histogram.percentile(99) == 0.5
+
+
+def test_values_below_resolution():
+    histogram = Histogram()
+    histogram.record(0.0)
+    histogram.record(0.0005)
+    assert histogram.buckets == {0: 2}
+    assert histogram.min == 0.0
+
+
+def test_merged():
+    fast = Histogram()
+    slow = Histogram()
+    for _ in range(90):
+        fast.record(0.1)
+    for _ in range(10):
+        slow.record(10.0)
+
+    total = merged([fast, slow])
+    assert total.count == 100
+    assert total.min == 0.1
+    assert total.max == 10.0
+    assert total.percentile(90) <= 0.1 * total.growth
+    assert total.percentile(99) == 10.0
+
+
+def test_from_buckets():
+    histogram = Histogram()
+    for value in [0.01, 0.02, 0.5, 2.0]:
+        histogram.record(value)
+
+    rebuilt = from_buckets(histogram.buckets, histogram.resolution, histogram.growth)
+    assert rebuilt.count == histogram.count
+    assert rebuilt.buckets == histogram.buckets
+    for percent in [50, 90, 99]:
+        assert abs(rebuilt.percentile(percent) - histogram.percentile(percent)) <= histogram.percentile(percent) * 0.08
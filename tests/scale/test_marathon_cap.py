@@ -1,24 +1,29 @@
-from common import app, available_resources, get_cluster_metadata, ensure_mom_version
+from common import app, cluster_snapshot, deployment_id_of, ensure_mom_version, invalidate_cluster_snapshot, \
+    wait_for_deployment_ids
 from datetime import timedelta
-from dcos import marathon
+from dcos import http, marathon
 import itertools
 import logging
 import math
 import shakedown
-from utils import marathon_on_marathon
+from utils import marathon_on_marathon, marathon_url
 
 
 def setup_module(module):
     """ Setup test module
     """
     logging.basicConfig(format='%(asctime)s %(levelname)-8s: %(message)s')
+    invalidate_cluster_snapshot()
 
 
 def setup_function(function):
     """ Setup test function
     """
-    print(get_cluster_metadata())
-    print(available_resources())
+    # the tests leave their apps behind, only the resources have to be read again
+    snapshot = cluster_snapshot()
+    snapshot.invalidate('resources')
+    print(snapshot.metadata())
+    print(snapshot.resources)
 
 
 def app_def(app_id):
@@ -34,6 +39,13 @@ def app_def(app_id):
     }
 
 
+def post(path, resource):
+    """ POSTs `resource` to marathon, returns the id of the deployment it started.
+    """
+    response = http.post(marathon_url(path), json=resource)
+    return deployment_id_of(response)
+
+
 def linear_step_function(step_size=1000):
     """
     Curried linear step function that gives next instances size based on a
@@ -87,16 +99,16 @@ def test_incremental_scale():
     """
 
     client = marathon.create_client()
-    client.add_app(app_def("cap-app"))
+    deployment_id = post('v2/apps', app_def("cap-app"))
 
     for new_size in incremental_steps(linear_step_function(step_size=1000)):
         shakedown.echo("Scaling to {}".format(new_size))
-        shakedown.deployment_wait(
-            app_id='cap-app', timeout=timedelta(minutes=10).total_seconds())
+        wait_for_deployment_ids(
+            [deployment_id], timeout=timedelta(minutes=10).total_seconds())
 
-        client.scale_app('/cap-app', new_size)
-        shakedown.deployment_wait(
-            app_id='cap-app', timeout=timedelta(minutes=10).total_seconds())
+        deployment_id = client.scale_app('/cap-app', new_size)
+        wait_for_deployment_ids(
+            [deployment_id], timeout=timedelta(minutes=10).total_seconds())
         shakedown.echo("done.")
 
 
@@ -113,10 +125,10 @@ def test_incremental_app_scale():
         shakedown.echo("Add new apps")
 
         app_id = "app-{0:0>4}".format(step)
-        client.add_app(app_def(app_id))
+        deployment_id = post('v2/apps', app_def(app_id))
 
-        shakedown.deployment_wait(
-                timeout=timedelta(minutes=15).total_seconds())
+        wait_for_deployment_ids(
+                [deployment_id], timeout=timedelta(minutes=15).total_seconds())
 
         shakedown.echo("done.")
 
@@ -127,8 +139,6 @@ def test_incremental_apps_per_group_scale():
     group and decay the batch size.
     """
 
-    client = marathon.create_client()
-
     batch_size_for = exponential_decay(start=500, decay=0.3)
     for step in itertools.count(start=0):
         batch_size = batch_size_for(step)
@@ -143,9 +153,9 @@ def test_incremental_apps_per_group_scale():
             "id": group_id
         }
 
-        client.create_group(next_batch)
-        shakedown.deployment_wait(
-                timeout=timedelta(minutes=15).total_seconds())
+        deployment_id = post('v2/groups', next_batch)
+        wait_for_deployment_ids(
+                [deployment_id], timeout=timedelta(minutes=15).total_seconds())
 
         shakedown.echo("done.")
 
@@ -171,9 +181,9 @@ def test_incremental_groups_scale():
 
         # There is no app id. We simply PUT /v2/apps to create groups in
         # batches.
-        client.update_app('', app_definitions)
-        shakedown.deployment_wait(
-                timeout=timedelta(minutes=15).total_seconds())
+        deployment_id = client.update_app('', app_definitions)
+        wait_for_deployment_ids(
+                [deployment_id], timeout=timedelta(minutes=15).total_seconds())
 
         shakedown.echo("done.")
 
@@ -184,8 +194,6 @@ def test_incremental_group_nesting():
     slow the growth.
     """
 
-    client = marathon.create_client()
-
     batch_size_for = exponential_decay(start=5, decay=0.1)
     depth = 0
     for step in itertools.count(start=0):
@@ -199,8 +207,8 @@ def test_incremental_group_nesting():
         # Note: We always deploy into the same nested groups.
         app_id = '/{0}/app-1'.format(nested_groups)
 
-        client.add_app(app_def(app_id))
-        shakedown.deployment_wait(
-                timeout=timedelta(minutes=15).total_seconds())
+        deployment_id = post('v2/apps', app_def(app_id))
+        wait_for_deployment_ids(
+                [deployment_id], timeout=timedelta(minutes=15).total_seconds())
 
         shakedown.echo("done.")
@@ -1,18 +1,26 @@
 from shakedown import *
-from dcos import config
+from dcos import config, http
 from six.moves import urllib
-from utils import get_resource
+from utils import get_resource, marathon_url
 
 import requests
 import json
 import time
+import tracing
 from common import *
+from histogram import Histogram
 
 instances_results = []
 instances_teardown = []
 count_results = []
 count_teardown = []
 
+# time of each pod instance from its POST until all of its containers run, by pod template
+pod_instance_times = {}
+
+POD_TEMPLATE = 'pod-{}-containers.json'
+POD_CONTAINERS = '4'
+
 
 """
     to launch: shakedown --dcos-url=$(dcos config show core.dcos_url)
@@ -21,131 +29,183 @@ count_teardown = []
 """
 
 
-def pod(id=1, instance=1, type="4"):
-    data = get_resource("pod-{}-containers.json".format(type))
+def pod(id=1, instance=1, type=POD_CONTAINERS):
+    data = get_resource(POD_TEMPLATE.format(type))
     data['id'] = "/" + str(id)
     data['scaling']['instances'] = instance
     return data
 
 
-def pod_time_deployment():
-    global time_series
-    client = marathon.create_client()
+def pod_time_deployment(deployment_ids=None, test_obj=None):
+    """ Times the deployments `deployment_ids`, by default those launched by `test_obj`
+        or without a test the deployments active now.
+    """
+    if deployment_ids is None and test_obj is not None:
+        deployment_ids = test_obj.deployment_ids
     start = time.time()
-    deployment_count = 1
-    while deployment_count > 0:
-        time.sleep(1)
-        deployments = client.get_deployments()
-        deployment_count = len(deployments)
-
+    wait_for_deployment_ids(deployment_ids, test_obj)
     elapse = elapse_time(start)
 
     return elapse
 
 
-def launch_pods(count=1, instances=1):
-    client = marathon.create_client()
-    for num in range(1, count + 1):
-        client.add_pod(pod(num, instances))
+def launch_pods(test_obj, count=1, instances=1, type=POD_CONTAINERS, timer=None):
+    """ Posts `count` pods of `instances` each concurrently, with as many requests
+        in flight as the load controller of the test allows.
+    """
+    on_post = timer.posted if timer is not None else None
+    on_failure = timer.failed if timer is not None else None
+    with Launcher(test_obj, 'v2/pods', 'add_pod', on_post, on_failure) as launcher:
+        for num in range(1, count + 1):
+            launcher.submit(pod(num, instances, type))
+        launcher.wait()
+
+
+def wait_for_pod_instances(test_obj, timer):
+    """ Waits until every instance timed by `timer` has all of its containers running.
+        With a connected tracker the timer is fed by events and the pod status is only
+        polled when a reconcile is due.
+    """
+    while not timer.completed():
+        if abort_deployment_check(test_obj):
+            return False
+
+        tracker = tracker_of(test_obj)
+        if tracker is None or tracker.needs_reconcile():
+            try:
+                with timed(test_obj.deploy_results, 'pod_status'):
+                    timer.observe_status(pod_statuses())
+                if tracker is not None:
+                    tracker.reconcile()
+            except Exception as e:
+                log_error_event(test_obj, e, ERROR_DEPLOYMENT)
+
+        timer.wait(calculate_deployment_wait_time(test_obj))
+
+    return True
+
+
+def pod_statuses():
+    response = http.get(marathon_url('v2/pods/::status'))
+    return response.json()
 
 
 def test_pod_instances_1():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(1, 1, instances_results, instances_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(1, 1, instances_results, instances_teardown, 'instances')
 
 
 def test_pod_instances_10():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(1, 10, instances_results, instances_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(1, 10, instances_results, instances_teardown, 'instances')
 
 
 def test_pod_instances_100():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(1, 100, instances_results, instances_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(1, 100, instances_results, instances_teardown, 'instances')
 
 
 def test_pod_instances_500():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(1, 500, instances_results, instances_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(1, 500, instances_results, instances_teardown, 'instances')
 
 
 def test_pod_instances_1000():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(1, 1000, instances_results, instances_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(1, 1000, instances_results, instances_teardown, 'instances')
 
 
 def test_pod_instances_5000():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(1, 5000, instances_results, instances_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(1, 5000, instances_results, instances_teardown, 'instances')
 
 
 def test_pod_count_1():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(1, 1, count_results, count_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(1, 1, count_results, count_teardown, 'count')
 
 
 def test_pod_count_10():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(10, 1, count_results, count_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(10, 1, count_results, count_teardown, 'count')
 
 
 def test_pod_count_100():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(100, 1, count_results, count_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(100, 1, count_results, count_teardown, 'count')
 
 
 def test_pod_count_500():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(500, 1, count_results, count_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(500, 1, count_results, count_teardown, 'count')
 
 
 def test_pod_count_1000():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(1000, 1, count_results, count_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(1000, 1, count_results, count_teardown, 'count')
 
 
 def test_pod_count_5000():
-    with shakedown.marathon_on_marathon()::
-        _test_pod_scale(5000, 1, count_results, count_teardown)
+    with shakedown.marathon_on_marathon():
+        _test_pod_scale(5000, 1, count_results, count_teardown, 'count')
 
 
-def _test_pod_scale(pod_count, instances, test_results, teardown_results):
+def _test_pod_scale(pod_count, instances, test_results, teardown_results, style, type=POD_CONTAINERS):
     test = "scaling pods: " + str(pod_count) + " instances: " + str(instances)
-    client = marathon.create_client()
+    test_obj = create_test_object('mom1', 'pods', style, pod_count, instances)
     delete_all_pods()
-    pod_time_deployment()
-    test_time, teardown_time = scale_pods(pod_count, instances)
+    test_time, teardown_time, instance_times = scale_pods(test_obj, type)
     print("{} test time: {}".format(test, test_time))
     print("{} teardown time: {}".format(test, teardown_time))
+    print("{} instance times: {}".format(test, instance_times))
+    print("{} launch response times: {}".format(test, test_obj.launch_results.all_response_times()))
+    test_obj.log_events()
+    trace_file = test_obj.trace.write(tracing.trace_file_name('pods-{}-{}-{}'.format(style, pod_count, instances)))
+    print("{} trace: {}".format(test, trace_file))
 
     test_results.append(test_time)
     teardown_results.append(teardown_time)
+    pod_instance_times.setdefault(POD_TEMPLATE.format(type), Histogram()).merge(instance_times)
 
 
-def scale_pods(pod_count=1, instances=1):
+def scale_pods(test_obj, type=POD_CONTAINERS):
+    """ Launches the pods of the test and times each instance until all of its containers run.
+        Returns the test time, the teardown time and the histogram of instance times.
+    """
+    timer = PodInstanceTimer()
+    test_obj.start_test()
     start = time.time()
-    launch_pods(pod_count, instances)
-    deploy_time = pod_time_deployment()
+    with tracked_deployments(test_obj) as tracker:
+        tracker.add_listener(timer.on_event)
+        launch_pods(test_obj, test_obj.count, test_obj.instance, type, timer)
+        test_obj.end_launch_phase()
+        deployed = wait_for_pod_instances(test_obj, timer)
+        if deployed:
+            # the deployments of the pods of this test, not those of anything else on the cluster
+            pod_time_deployment(test_obj=test_obj)
+        test_obj.trace.end('deploy')
     test_end = time.time()
-    delete_all_pods()
-    pod_time_deployment()
+    with test_obj.trace.span('undeploy', 'phase'):
+        delete_all_pods()
     delete_time = elapse_time(test_end)
-    return elapse_time(start, test_end), delete_time
+    assert deployed, 'Only {} of {} pod instances running after {} hours'.format(
+        len(timer.done), timer.expected, MAX_HOURS_OF_TEST)
+    return elapse_time(start, test_end), delete_time, timer.histogram
 
 
 def delete_all_pods():
     client = marathon.create_client()
     pods = client.list_pod()
     print("deleting {} pods".format(len(pods)))
-    client.remove_group("/", True)
-    pod_time_deployment()
+    pod_time_deployment([remove_group('/')])
 
 
 def setup_module(module):
     # verify test system requirements are met (number of nodes needed)
-    agents = get_private_agents()
+    invalidate_cluster_snapshot()
+    agents = cluster_snapshot().private_agents
     print("agents: {}".format(len(agents)))
-    with shakedown.marathon_on_marathon()::
+    with shakedown.marathon_on_marathon():
         client = marathon.create_client()
         about = client.get_about()
         print("marathon version: {}".format(about.get("version")))
@@ -153,9 +213,9 @@ def setup_module(module):
 
 
 def teardown_module(module):
-    agents = get_private_agents()
+    agents = cluster_snapshot().private_agents
     print("agents: {}".format(len(agents)))
-    with shakedown.marathon_on_marathon()::
+    with shakedown.marathon_on_marathon():
         client = marathon.create_client()
         about = client.get_about()
         print("marathon version: {}".format(about.get("version")))
@@ -164,15 +224,16 @@ def teardown_module(module):
     print("instance teardown: {}".format(instances_teardown))
     print("count test: {}".format(count_results))
     print("count teardown: {}".format(count_teardown))
+    for template, instance_times in sorted(pod_instance_times.items()):
+        print("{} instance times: {}".format(template, instance_times))
 
 
 def prefetch_docker_images_on_all_nodes():
-    with shakedown.marathon_on_marathon()::
-        agents = get_private_agents()
+    with shakedown.marathon_on_marathon():
+        agents = cluster_snapshot().private_agents
         data = get_resource("pod-2-containers.json")
         data['constraints'] = unique_host_constraint()
         data['scaling']['instances'] = len(agents)
-        client = marathon.create_client()
-        client.add_pod(data)
-        time_deployment("undeploy")
+        response = http.post(marathon_url('v2/pods'), json=data)
+        pod_time_deployment([deployment_id_of(response)])
         delete_all_pods()
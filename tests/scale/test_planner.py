@@ -0,0 +1,87 @@
+from planner import fit_deploy_time, Planner, FIT_TARGETS
+"""
+    Unit tests of the deploy time predictions, they do not need a cluster.
+"""
+
+
+class Result(object):
+    """ The fields of a ScaleTest which the planner reads.
+    """
+
+    def __init__(self, style, target, test_time, status='successful', skipped=False):
+        self.style = style
+        self.target = target
+        self.test_time = test_time
+        self.status = status
+        self.skipped = skipped
+        self.shard_size = None
+        self.predicted_time = None
+
+
+def power(a, b, targets):
+    return [(target, a * target ** b) for target in targets]
+
+
+def test_fit_of_power_law():
+    a, b = fit_deploy_time(power(0.5, 1.2, [10, 100, 1000]))
+    assert round(a, 6) == 0.5
+    assert round(b, 6) == 1.2
+
+
+def test_fit_needs_two_targets():
+    assert fit_deploy_time([]) is None
+    assert fit_deploy_time([(100, 10), (100, 12)]) is None
+    assert fit_deploy_time([(0, 10), (100, 0), (1000, 20)]) is None
+    assert fit_deploy_time([(100, 10), (1000, 100)]) is not None
+
+
+def test_fit_uses_largest_targets():
+    # the small targets are dominated by the overhead of a test
+    points = [(1, 30), (10, 30)] + power(0.1, 1.0, [100, 1000, 10000])
+    assert FIT_TARGETS == 3
+    a, b = fit_deploy_time(points)
+    assert round(b, 6) == 1.0
+
+
+def test_fit_never_decreases():
+    a, b = fit_deploy_time([(100, 50), (1000, 20)])
+    assert b == 0.0
+
+
+def test_predict_from_history():
+    planner = Planner(budget=3600, history={'instances': power(0.1, 1.0, [100, 1000])})
+    assert planner.predict('instances', 10000) == 1000.0
+    assert planner.predict('count', 10000) is None
+
+
+def test_session_replaces_history():
+    planner = Planner(budget=3600, history={'instances': power(1.0, 1.0, [100, 1000])})
+    planner.observe(Result('instances', 100, 10.0))
+    # one session target is not enough to fit, it is fit together with the history
+    assert planner.points('instances') == [(100, 10.0)] + power(1.0, 1.0, [100, 1000])
+
+    planner.observe(Result('instances', 1000, 100.0))
+    assert planner.predict('instances', 10000) == 1000.0
+
+
+def test_observe_ignores_failed_and_skipped_tests():
+    planner = Planner(budget=3600)
+    planner.observe(Result('instances', 100, 10.0, status='failed'))
+    planner.observe(Result('instances', 1000, 100.0, skipped=True))
+    assert planner.session == {}
+
+
+def test_plan():
+    planner = Planner(budget=3600, history={'instances': power(1.0, 1.0, [100, 1000])})
+
+    fits = Result('instances', 1000, 0)
+    assert planner.plan(fits)
+    assert fits.predicted_time == 1000.0
+
+    too_long = Result('instances', 10000, 0)
+    assert not planner.plan(too_long)
+    assert too_long.predicted_time == 10000.0
+
+    unknown = Result('group', 10000, 0)
+    assert planner.plan(unknown)
+    assert unknown.predicted_time is None
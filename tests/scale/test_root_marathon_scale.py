@@ -1,6 +1,9 @@
 from utils import *
 from common import *
-from graph import create_scale_graph
+from graph import create_scale_graph, create_shard_graph, best_shard_sizes
+from planner import Planner, load_history
+from store import ResultStore
+from slo import check_tests, load_slos, slo_report
 
 import pytest
 
@@ -16,7 +19,13 @@ import os
 
 type_test_failed = {}
 
+# environment variable opting into the sharded group sweep, which adds hours to a run
+SHARD_SWEEP_ENV = 'SCALE_SHARD_SWEEP'
+
 test_log = []
+
+# predicts the deploy times of the tests from those which completed, see planner.py
+planner = Planner()
 ##############
 # Test Section
 ##############
@@ -81,24 +90,57 @@ def test_group_scale(num_apps, num_instances):
     log_current_test(current_test)
 
 
+@pytest.mark.skipif(not os.environ.get(SHARD_SWEEP_ENV),
+                    reason='the shard sweep runs with {}=1'.format(SHARD_SWEEP_ENV))
+@pytest.mark.parametrize("num_apps, shards", [
+  (10000, 1),
+  (10000, 2),
+  (10000, 5),
+  (10000, 10),
+  (10000, 25),
+  (10000, 50),
+  (50000, 1),
+  (50000, 5),
+  (50000, 10),
+  (50000, 25),
+  (50000, 50),
+  (50000, 100)
+])
+def test_sharded_group_scale(num_apps, shards):
+    """ Runs scale test on `num_apps` of 1 instance each deployed as `shards` groups.
+        Sweeps the number of shards to find the shard size with the best deploy throughput.
+    """
+
+    current_test = initalize_test('root', 'apps', 'group', num_apps, 1, shards)
+    group_test_app(current_test)
+    log_current_test(current_test)
+
+
 ##############
 # End Test Section
 ##############
 
 
-def initalize_test(marathon_name='root', under_test='apps', style='instances', num_apps=1, num_instances=1):
+def initalize_test(marathon_name='root', under_test='apps', style='instances', num_apps=1, num_instances=1,
+                   shards=None):
 
-    current_test = create_test_object(marathon_name, under_test, style, num_apps, num_instances)
+    current_test = create_test_object(marathon_name, under_test, style, num_apps, num_instances, shards)
     test_log.append(current_test)
     need = scaletest_resources(current_test)
 
-    # if need >= (private_resources_available()):
+    # the resources are those of the cluster snapshot taken at the setup of the module
     if not has_enough_resources(need):
         current_test.skip(SKIP_RESOURCES)
 
     if previous_style_test_failed(current_test):
         current_test.skip(SKIP_PREVIOUS_TEST_FAILED)
 
+    if not current_test.skipped and not planner.plan(current_test):
+        current_test.skip('{} ({} > {})'.format(
+            SKIP_PREDICTED_TOO_LONG,
+            pretty_duration_safe(current_test.predicted_time),
+            pretty_duration_safe(planner.budget)))
+
     if current_test.skipped:
         pytest.skip()
 
@@ -113,14 +155,28 @@ def has_enough_resources(need):
 
 
 def previous_style_test_failed(current_test):
-    return type_test_failed.get(get_test_style_key_base(current_test), False)
+    return type_test_failed.get(failure_key(current_test), False)
+
+
+def failure_key(current_test):
+    """ The key of the tests a failed test skips, its style, or for sharded group tests their
+        number of shards (the shard size grows with the target).
+    """
+    if current_test.shard_size is not None:
+        return '{}_{}-shards{}'.format(current_test.mom, current_test.style, current_test.shards)
+    return get_test_style_key_base(current_test)
 
 
 def setup_module(module):
     delete_all_apps_wait()
+    invalidate_cluster_snapshot()
     print(get_cluster_metadata())
     print('testing root marathon')
     print("private resources: {}".format(private_resources_available()))
+    try:
+        planner.history = load_history()
+    except Exception as e:
+        print('unable to load the deploy time history: {}'.format(e))
 
 
 def teardown_module(module):
@@ -128,17 +184,61 @@ def teardown_module(module):
     write_csv(stats)
     read_csv()
     metadata = get_cluster_metadata()
+    metadata['response-times'] = {scale_test.name: scale_test.response_time_summary() for scale_test in test_log}
+    metadata['task-times'] = {scale_test.name: scale_test.task_timer.summary() for scale_test in test_log}
+    metadata['best-shard-size'] = best_shard_sizes(stats, 'root')
     write_meta_data(metadata)
+    save_results(metadata)
+    write_traces()
     create_scale_graph(stats, metadata)
+    create_shard_graph(stats, metadata)
     try:
         delete_all_apps_wait()
     except:
         pass
+    check_slos()
+
+
+def check_slos():
+    """ Fails the module if the tests exceeded the budgets of the SLO file, see slo.py.
+    """
+    slos = load_slos()
+    if slos is None:
+        print('no SLO file, the SLOs are not checked')
+        return
+
+    violations = check_tests(test_log, slos)
+    report = slo_report(violations, len(test_log))
+    print(report)
+    if violations:
+        pytest.fail(report, pytrace=False)
+
+
+def write_traces():
+    """ Writes the trace of each test which ran as trace-<test name>.json, see tracing.py.
+    """
+    for scale_test in test_log:
+        if scale_test.skipped:
+            continue
+        try:
+            print('trace of {} written to {}'.format(scale_test.name, scale_test.trace.write()))
+        except Exception as e:
+            print('unable to write the trace of {}: {}'.format(scale_test.name, e))
+
+
+def save_results(metadata):
+    try:
+        with ResultStore() as store:
+            run_id = store.save_run(test_log, metadata)
+        print('results stored as run {} in {}'.format(run_id, store.filename))
+    except Exception as e:
+        print('unable to store results: {}'.format(e))
 
 
 def log_current_test(current_test):
     if "failed" in current_test.status:
-        type_test_failed[get_test_style_key_base(current_test)] = True
+        type_test_failed[failure_key(current_test)] = True
+    planner.observe(current_test)
 
     print(current_test)
     current_test.log_events()
@@ -156,49 +256,44 @@ def collect_stats():
         print('')
 
         key = get_test_key(scale_test, 'target')
-        stats.get(key).append(scale_test.target)
+        stats.setdefault(key, []).append(scale_test.target)
 
         key = get_test_key(scale_test, 'max')
-        stats.get(key).append(scale_test.deploy_results.current_scale)
+        stats.setdefault(key, []).append(scale_test.deploy_results.current_scale)
 
         key = get_test_key(scale_test, 'deploy_time')
-        stats.get(key).append(scale_test.test_time)
+        stats.setdefault(key, []).append(scale_test.test_time)
 
         key = get_test_key(scale_test, 'human_deploy_time')
-        stats.get(key).append(pretty_duration_safe(scale_test.test_time))
+        stats.setdefault(key, []).append(pretty_duration_safe(scale_test.test_time))
 
         key = get_test_key(scale_test, 'launch_status')
-        stats.get(key).append(pass_status(scale_test, scale_test.launch_results.success))
+        stats.setdefault(key, []).append(pass_status(scale_test, scale_test.launch_results.success))
 
         key = get_test_key(scale_test, 'deployment_status')
-        stats.get(key).append(pass_status(scale_test, scale_test.deploy_results.success))
+        stats.setdefault(key, []).append(pass_status(scale_test, scale_test.deploy_results.success))
 
         key = get_test_key(scale_test, 'errors')
-        stats.get(key).append(total_errors(scale_test.events))
+        stats.setdefault(key, []).append(total_errors(scale_test.events))
 
-    return stats
+        response_times = scale_test.response_times().summary()
+        for percent in PERCENTILES:
+            key = get_test_key(scale_test, 'response_p{}'.format(percent))
+            stats.setdefault(key, []).append(response_times['p{}'.format(percent)])
 
+        key = get_test_key(scale_test, 'response_max')
+        stats.setdefault(key, []).append(response_times['max'])
 
-def total_errors(events):
-    error_events = [event for event in events if is_error(event)]
-    return len(error_events)
+        task_times = scale_test.task_timer.summary()
+        for task_time in TASK_TIMES:
+            for percent in PERCENTILES:
+                key = get_test_key(scale_test, '{}_p{}'.format(task_time, percent))
+                stats.setdefault(key, []).append(task_times[task_time]['p{}'.format(percent)])
 
+        key = get_test_key(scale_test, 'predicted_time')
+        stats.setdefault(key, []).append(scale_test.predicted_time)
 
-def is_error(event):
-    # strip 'event: header'
-    message = event[len(EVENT_HEADER) + 1:]
-    # take the event message if any
-    event_header = message[:message.find(':') + 1]
-    return event_header in ERRORS
-
-
-def pass_status(test, successful):
-    if test.skipped:
-        return 's'
-    if successful:
-        return 'p'
-    else:
-        return 'f'
+    return stats
 
 
 def read_csv(filename='scale-test.csv'):
@@ -209,20 +304,14 @@ def read_csv(filename='scale-test.csv'):
 def write_csv(stats, filename='scale-test.csv'):
     with open(filename, 'w') as f:
         w = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
-        write_stat_lines(f, w, stats, 'root', 'instances')
-        write_stat_lines(f, w, stats, 'root', 'count')
-        write_stat_lines(f, w, stats, 'root', 'group')
+        for test_type in stats_styles(stats, 'root'):
+            write_stat_lines(f, w, stats, 'root', test_type)
 
 
 def write_stat_lines(f, w, stats, marathon_name, test_type):
         w.writerow(['Marathon:', 'root', test_type])
-        w.writerow(stats[get_key(marathon_name, test_type, 'target')])
-        w.writerow(stats[get_key(marathon_name, test_type, 'max')])
-        w.writerow(stats[get_key(marathon_name, test_type, 'deploy_time')])
-        w.writerow(stats[get_key(marathon_name, test_type, 'human_deploy_time')])
-        w.writerow(stats[get_key(marathon_name, test_type, 'launch_status')])
-        w.writerow(stats[get_key(marathon_name, test_type, 'deployment_status')])
-        w.writerow(stats[get_key(marathon_name, test_type, 'errors')])
+        for stat_key in STAT_KEYS:
+            w.writerow(stats.get(get_key(marathon_name, test_type, stat_key), []))
         f.write('\n')
 
 
@@ -0,0 +1,72 @@
+import simulator
+
+from simulator import SimulatedCluster
+"""
+    Unit tests of the simulated cluster, driven tick by tick without the ticker thread.
+"""
+
+POD = {'id': '/pod', 'scaling': {'instances': 3}, 'containers': [{'name': 'a'}, {'name': 'b'}]}
+
+
+def run_until_converged(cluster, spec_id, ticks=100):
+    now = 0.0
+    for _ in range(ticks):
+        if spec_id not in cluster.pending:
+            return
+        now += 1.0
+        with cluster.lock:
+            cluster._step(now, 1.0)
+    assert False, '{} did not converge'.format(spec_id)
+
+
+def failing_every(nth):
+    calls = [0]
+
+    def random():
+        calls[0] += 1
+        return 0.0 if calls[0] % nth == 0 else 1.0
+    return random
+
+
+def test_pod_instances():
+    cluster = SimulatedCluster(launch_rate=4, staging_time=0.5)
+    cluster.add_pod(POD)
+    run_until_converged(cluster, '/pod')
+
+    status = cluster.pod_status(cluster.pods['/pod'])
+    assert status['status'] == 'STABLE'
+    assert len(status['instances']) == 3
+    for instance in status['instances']:
+        assert instance['status'] == 'STABLE'
+        assert sorted(container['name'] for container in instance['containers']) == ['a', 'b']
+        assert instance['id'].startswith('pod.instance-')
+    assert cluster.counters['launched'] == 6
+    assert cluster.pod_slots == {}
+
+
+def test_failed_pod_containers_are_relaunched_in_their_instance(monkeypatch):
+    monkeypatch.setattr(simulator.random, 'random', failing_every(3))
+    cluster = SimulatedCluster(launch_rate=4, staging_time=0.5, task_failure_rate=0.5)
+    cluster.add_pod(POD)
+    run_until_converged(cluster, '/pod')
+
+    counters = cluster.counters
+    assert counters['failed'] > 0
+    assert counters['launched'] == 6 + counters['failed']
+    assert len(cluster.tasks) == 6
+
+    status = cluster.pod_status(cluster.pods['/pod'])
+    assert len(status['instances']) == 3
+    for instance in status['instances']:
+        assert sorted(container['name'] for container in instance['containers']) == ['a', 'b']
+
+
+def test_app_task_ids_are_unique(monkeypatch):
+    monkeypatch.setattr(simulator.random, 'random', failing_every(2))
+    cluster = SimulatedCluster(launch_rate=10, staging_time=0.5, task_failure_rate=0.5)
+    cluster.add_app({'id': '/group/app', 'instances': 5})
+    run_until_converged(cluster, '/group/app')
+
+    assert len(cluster.tasks) == 5
+    assert cluster.counters['launched'] == 5 + cluster.counters['failed']
+    assert all(task_id.startswith('group_app.') for task_id in cluster.tasks)
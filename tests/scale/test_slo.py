@@ -0,0 +1,107 @@
+import json
+
+from slo import budget, check_result, load_slos, slo_report, style_slos, MAX_DEPLOY_TIME_BUDGET, SLO_FILE
+"""
+    Unit tests of the SLO checks, they do not need a cluster.
+"""
+
+SLOS = {
+    'instances': {
+        'deploy_time': {'1000': 100, '10000': 1000},
+        'max_errors': 2
+    },
+    'group': {
+        'deploy_time': 60
+    }
+}
+
+
+def violations(style='instances', target=1000, skipped=False, success=True, deploy_time=50, errors=0,
+               predicted_time=None):
+    return [violation.name for violation in
+            check_result('test', style, target, skipped, success, deploy_time, errors, SLOS, predicted_time)]
+
+
+def test_budget():
+    assert budget(SLOS['instances'], 'deploy_time', 1000) == 100
+    assert budget(SLOS['instances'], 'deploy_time', 5000) is None
+    assert budget(SLOS['instances'], 'max_errors', 5000) == 2
+    assert budget(SLOS['instances'], 'unknown', 1000) is None
+
+
+def test_style_slos():
+    assert style_slos(SLOS, 'group') == SLOS['group']
+    assert style_slos(SLOS, 'group-shard100') == SLOS['group']
+    assert style_slos(SLOS, 'count') == {}
+
+
+def test_within_budgets():
+    assert violations() == []
+
+
+def test_deploy_time_over_budget():
+    assert violations(deploy_time=150) == ['deploy_time']
+    assert violations(target=10000, deploy_time=900) == []
+
+
+def test_failed_deployment_violates_deploy_time():
+    assert violations(success=False, deploy_time=10) == ['deploy_time']
+
+
+def test_errors_over_budget():
+    assert violations(errors=2) == []
+    assert violations(errors=3) == ['max_errors']
+
+
+def test_skipped_tests_have_no_violations():
+    assert violations(skipped=True, success=False, errors=100) == []
+    assert violations(skipped=True, success=False, predicted_time=90) == []
+
+
+def test_planner_skips_over_budget_violate_deploy_time():
+    assert violations(skipped=True, success=False, predicted_time=300) == ['deploy_time']
+    assert violations(target=5000, skipped=True, success=False, predicted_time=30000) == []
+
+
+def test_targets_without_budget():
+    assert violations(target=5000, deploy_time=600) == []
+    assert violations(style='count', deploy_time=10000) == []
+
+
+def test_report():
+    violations = (check_result('test', 'instances', 1000, False, True, 150, 0, SLOS) +
+                  check_result('test', 'instances', 10000, True, False, 0, 0, SLOS, 3000))
+    assert slo_report(violations, 2, 'slo.json').splitlines() == [
+        '2 SLO violations in 2 tests (slo.json):',
+        '  instances 1000: deploy_time 150s > 100s (+50%)',
+        '  instances 10000: deploy_time predicted (skipped) 3000s > 1000s (+200%)']
+    assert slo_report([], 3) == 'SLOs met by 3 tests'
+
+
+def test_slo_file_budgets_can_be_exceeded():
+    """ A deploy time budget over the time a test may take can never be exceeded.
+    """
+    slos = load_slos(SLO_FILE)
+    for style, slo in slos.items():
+        for target, deploy_time in slo['deploy_time'].items():
+            assert deploy_time <= MAX_DEPLOY_TIME_BUDGET, '{} {}'.format(style, target)
+        assert slo['max_errors'] > 0
+
+
+def test_budgets_over_the_test_time_are_rejected(tmpdir):
+    slo_file = tmpdir.join('slo.json')
+    slo_file.write(json.dumps({'count': {'deploy_time': {'50000': MAX_DEPLOY_TIME_BUDGET + 1}}}))
+    try:
+        load_slos(str(slo_file))
+        assert False, 'a deploy time budget over the test time should be rejected'
+    except ValueError:
+        pass
+
+
+def test_disabled_slo_file(tmpdir):
+    assert load_slos('none') is None
+    assert load_slos(str(tmpdir.join('missing.json'))) is None
+
+    slo_file = tmpdir.join('slo.json')
+    slo_file.write(json.dumps(SLOS))
+    assert load_slos(str(slo_file)) == SLOS
@@ -0,0 +1,140 @@
+import sqlite3
+
+from common import create_test_object, get_key
+from store import ResultStore, ADDED_TEST_COLUMNS, TASK_TIMES_PHASE
+"""
+    Unit tests of the results database, they do not need a cluster.
+"""
+
+METADATA = {'marathon': 'root', 'marathon-version': '1.5.0', 'dcos-version': '1.10.0'}
+
+# the tests table before ADDED_TEST_COLUMNS
+FIRST_TESTS_TABLE = """
+CREATE TABLE tests (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER REFERENCES runs(id),
+    name TEXT,
+    marathon TEXT,
+    under_test TEXT,
+    style TEXT,
+    count INTEGER,
+    instance INTEGER,
+    target INTEGER,
+    max INTEGER,
+    status TEXT,
+    skipped INTEGER,
+    launch_success INTEGER,
+    deploy_success INTEGER,
+    deploy_time REAL,
+    undeploy_time REAL,
+    errors INTEGER,
+    response_p50 REAL,
+    response_p90 REAL,
+    response_p99 REAL,
+    response_max REAL,
+    started REAL
+);
+"""
+
+
+def completed_test(style='instances', count=1, instance=100, deploy_time=10.0, shards=None):
+    scale_test = create_test_object('root', 'apps', style, count, instance, shards)
+    scale_test.start_test()
+    for response_time in [0.1, 0.2, 0.4]:
+        scale_test.launch_results.record_response_time('add_app', response_time)
+    scale_test.deploy_results.record_response_time('get_deployments', 0.05)
+    scale_test.task_timer._record('app.1', 'TASK_STAGING', 1.0)
+    scale_test.task_timer._record('app.1', 'TASK_RUNNING', 2.0)
+    scale_test.launch_results.completed()
+    scale_test.deploy_results.current_scale = scale_test.target
+    scale_test.deploy_results.completed()
+    scale_test.test_time = deploy_time
+    scale_test.predicted_time = deploy_time + 1
+    return scale_test
+
+
+def test_save_and_load_run(tmpdir):
+    scale_tests = [completed_test(), completed_test('group', 100, 1, 20.0, shards=10)]
+    skipped = create_test_object('root', 'apps', 'count', 1000, 1)
+    skipped.skip('too long')
+    scale_tests.append(skipped)
+
+    with ResultStore(str(tmpdir.join('results.db'))) as store:
+        run_id = store.save_run(scale_tests, METADATA)
+        assert store.last_run_id() == run_id
+        assert store.load_metadata() == METADATA
+
+        rows = store.test_results()
+        assert [row['name'] for row in rows] == [scale_test.name for scale_test in scale_tests]
+        instances, group, count = rows
+        assert instances['status'] == 'successful'
+        assert instances['deploy_time'] == 10.0
+        assert instances['predicted_time'] == 11.0
+        assert instances['max'] == 100
+        assert instances['staging_p50'] == 1.0
+        assert instances['running_p50'] == 2.0
+        assert group['shard_size'] == 10
+        assert count['skipped'] == 1
+
+        stats = store.load_stats()
+        assert stats[get_key('root', 'instances', 'deploy_time')] == [10.0]
+        assert stats[get_key('root', 'instances', 'deployment_status')] == ['p']
+        assert stats[get_key('root', 'group-shard10', 'target')] == [100]
+        assert stats[get_key('root', 'count', 'launch_status')] == ['s']
+
+
+def test_response_histograms(tmpdir):
+    scale_test = completed_test()
+    with ResultStore(str(tmpdir.join('results.db'))) as store:
+        store.save_run([scale_test], METADATA)
+        test_id = store.test_results()[0]['id']
+
+        launch = store.response_histogram(test_id, 'launch', 'add_app')
+        assert launch.count == 3
+        assert launch.buckets == scale_test.launch_results.response_times['add_app'].buckets
+
+        # all phases, without the task times
+        assert store.response_histogram(test_id).count == 4
+        assert store.response_histogram(test_id, TASK_TIMES_PHASE, 'running').count == 1
+
+
+def test_trend_and_deploy_times(tmpdir):
+    with ResultStore(str(tmpdir.join('results.db'))) as store:
+        for deploy_time in [10.0, 12.0, 11.0]:
+            store.save_run([completed_test(deploy_time=deploy_time),
+                            completed_test('group', 100, 1, deploy_time * 2, shards=10)], METADATA)
+
+        assert [row['value'] for row in store.trend('instances', 100)] == [10.0, 12.0, 11.0]
+        assert [row['value'] for row in store.trend('group-shard10', 100)] == [20.0, 24.0, 22.0]
+        assert store.trend('group', 100) == []
+        assert [row['value'] for row in store.trend('instances', 100, 'predicted_time', limit=1)] == [12.0]
+
+        deploy_times = [tuple(row) for row in store.deploy_times(runs=2)]
+        assert sorted(deploy_times) == [('group', 10, 100, 22.0), ('group', 10, 100, 24.0),
+                                        ('instances', None, 100, 11.0), ('instances', None, 100, 12.0)]
+
+
+def test_unknown_trend_stat(tmpdir):
+    with ResultStore(str(tmpdir.join('results.db'))) as store:
+        try:
+            store.trend('instances', 100, 'unknown')
+            assert False, 'an unknown stat should not be queried'
+        except ValueError:
+            pass
+
+
+def test_migrates_older_databases(tmpdir):
+    filename = str(tmpdir.join('results.db'))
+    connection = sqlite3.connect(filename)
+    connection.executescript(FIRST_TESTS_TABLE)
+    connection.close()
+
+    with ResultStore(filename) as store:
+        columns = [row['name'] for row in store.connection.execute('PRAGMA table_info(tests)')]
+        for column, _ in ADDED_TEST_COLUMNS:
+            assert column in columns
+        store.save_run([completed_test()], METADATA)
+
+    # reopening a migrated database leaves it as it is
+    with ResultStore(filename) as store:
+        assert store.test_results()[0]['staging_p99'] == 1.0
@@ -0,0 +1,68 @@
+import json
+
+from utils import iter_json
+"""
+    Unit tests of the JSON streaming, they do not need a cluster.
+"""
+
+STATE = {
+    'frameworks': [
+        {'name': 'marathon', 'tasks': [
+            {'id': 'app.1', 'state': 'TASK_RUNNING', 'resources': {'cpus': 0.1, 'ports': '[1-2]'}},
+            {'id': 'app.2', 'state': 'TASK_STAGING', 'labels': [{'key': 'k', 'value': '}]"'}]}
+        ], 'completed_tasks': [{'id': 'app.0', 'state': 'TASK_KILLED'}]},
+        {'name': 'metronome', 'tasks': []},
+        {'name': 'spark', 'tasks': [{'id': 'driver.1', 'state': 'TASK_RUNNING', 'ratio': -2.5e-3}]}
+    ],
+    'slaves': [{'id': 'agent-1'}]
+}
+
+TASKS = ['frameworks', '*', 'tasks', '*']
+
+
+def chunked(document, size):
+    data = json.dumps(document).encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def expected_tasks():
+    return [task for framework in STATE['frameworks'] for task in framework['tasks']]
+
+
+def test_records_of_whole_document():
+    assert list(iter_json([json.dumps(STATE)], TASKS)) == expected_tasks()
+
+
+def test_records_across_chunk_boundaries():
+    for size in [1, 2, 3, 7, 64]:
+        assert list(iter_json(chunked(STATE, size), TASKS)) == expected_tasks(), size
+
+
+def test_fields():
+    records = list(iter_json(chunked(STATE, 5), TASKS, ['id', 'state']))
+    assert records == [{'id': task['id'], 'state': task['state']} for task in expected_tasks()]
+
+
+def test_path_without_wildcard():
+    assert list(iter_json(chunked(STATE, 4), ['slaves'])) == [STATE['slaves']]
+
+
+def test_missing_path():
+    assert list(iter_json(chunked(STATE, 4), ['unknown', '*'])) == []
+    assert list(iter_json(chunked({'slaves': {}}, 4), ['slaves', '*'])) == []
+
+
+def test_multibyte_characters_split_across_chunks():
+    document = {'apps': [{'id': '/café'}, {'id': '/東京'}]}
+    data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    chunks = [data[i:i + 1] for i in range(len(data))]
+    assert list(iter_json(chunks, ['apps', '*', 'id'])) == ['/café', '/東京']
+
+
+def test_truncated_document():
+    data = json.dumps(STATE).encode('utf-8')
+    try:
+        list(iter_json([data[:len(data) // 2]], TASKS))
+        assert False, 'a truncated document should not be read'
+    except ValueError:
+        pass
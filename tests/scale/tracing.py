@@ -0,0 +1,134 @@
+import contextlib
+import json
+import threading
+import time
+"""
+    Span recorder of the scale harness, exported as Chrome trace events.
+    Each ScaleTest records its marathon calls, HTTP requests, sleeps, waits and phases into a
+    `TraceRecorder`, which is written as trace-<test name>.json next to scale-test.csv and can be
+    opened with chrome://tracing or https://ui.perfetto.dev to see where the time of a test went.
+
+    Spans are recorded with the recorder of the current test (see `activate`) from any thread,
+    so the requests of a `Launcher` show up on the threads which made them.
+"""
+
+# events kept in a trace, later ones are only counted
+MAX_TRACE_EVENTS = 500000
+
+# the recorder spans without an explicit recorder go to, see `activate`
+current_recorder = None
+
+
+def now_us():
+    return time.time() * 1000000
+
+
+class TraceRecorder(object):
+    """ Collects the events of one trace (usually one scale test).
+        Spans are complete (`X`) events, marks are instant (`i`) events and the threads
+        are named by metadata events.  Phases are opened with `begin` and closed with `end`.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.events = []
+        self.dropped = 0
+        self.threads = {}
+        self.phases = {}
+        self.lock = threading.Lock()
+
+    def record(self, event):
+        thread = threading.current_thread()
+        event['pid'] = 1
+        event['tid'] = thread.ident
+        with self.lock:
+            self.threads[thread.ident] = thread.name
+            if len(self.events) < MAX_TRACE_EVENTS:
+                self.events.append(event)
+            else:
+                self.dropped += 1
+
+    def complete(self, name, category, start, end, args=None):
+        """ Records a span from `start` to `end` (in microseconds).
+        """
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start, 'dur': end - start}
+        if args:
+            event['args'] = args
+        self.record(event)
+
+    @contextlib.contextmanager
+    def span(self, name, category, args=None):
+        start = now_us()
+        try:
+            yield
+        finally:
+            self.complete(name, category, start, now_us(), args)
+
+    def mark(self, name, category, args=None):
+        event = {'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': now_us()}
+        if args:
+            event['args'] = args
+        self.record(event)
+
+    def begin(self, name):
+        """ Opens the phase `name`, which is recorded as a span once it is ended.
+        """
+        self.phases[name] = now_us()
+
+    def end(self, name, args=None):
+        """ Closes the phase `name`, ignored if it is not open.
+        """
+        start = self.phases.pop(name, None)
+        if start is not None:
+            self.complete(name, 'phase', start, now_us(), args)
+
+    def to_json(self):
+        with self.lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': self.name}}]
+        metadata.extend({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': thread_name}}
+                        for tid, thread_name in threads.items())
+        return {
+            'traceEvents': metadata + events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'name': self.name, 'dropped_events': self.dropped}
+        }
+
+    def write(self, filename=None):
+        """ Writes the trace to `filename` (by default `trace_file_name` of the trace), returns the file name.
+        """
+        filename = filename or trace_file_name(self.name)
+        with open(filename, 'w') as out:
+            json.dump(self.to_json(), out)
+        return filename
+
+
+def trace_file_name(name):
+    return 'trace-{}.json'.format(name)
+
+
+def activate(recorder):
+    """ Makes `recorder` the recorder of the spans which are not recorded with a test.
+    """
+    global current_recorder
+    current_recorder = recorder
+
+
+@contextlib.contextmanager
+def span(name, category='harness', args=None, recorder=None):
+    """ Records its block as a span with `recorder`, by default the current recorder (if any).
+    """
+    recorder = recorder or current_recorder
+    if recorder is None:
+        yield
+    else:
+        with recorder.span(name, category, args):
+            yield
+
+
+def sleep(seconds, name='sleep', recorder=None):
+    """ `time.sleep` recorded as a span.
+    """
+    with span(name, 'sleep', {'seconds': seconds}, recorder):
+        time.sleep(seconds)
@@ -2,11 +2,20 @@ import contextlib
 import json
 import os
 import re
+import requests
 import subprocess
+import sys
+import tracing
+from requests.adapters import HTTPAdapter
 from six.moves import urllib
 from dcos import http, util, config
 from shakedown import run_command_on_master
 
+# marathon urls and the JSON streaming are shared with the system tests
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'system'))
+import http_utils
+from http_utils import marathon_url, iter_json, JSONReader, JSON_CHUNK_SIZE
+
 def file_dir():
     """Gets the path to the shakedown dcos scale directory"""
 
@@ -62,3 +71,45 @@ def marathon_on_marathon(name='marathon-user'):
     finally:
         # return config to previous state
         config.save(toml_config_o)
+
+
+def keep_alive_session(pool_size=10):
+    """ Creates a `requests.Session` authenticated against the configured cluster.
+        Unlike `dcos.http` which opens a connection for each request, the session
+        keeps up to `pool_size` connections alive for reuse across threads.
+
+    :param pool_size: max number of pooled connections per host
+    :type pool_size: int
+    :returns: session
+    :rtype: requests.Session
+    """
+
+    toml_config = config.get_config()
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    token = config.get_config_val('core.dcos_acs_token', toml_config)
+    if token is not None:
+        session.headers['Authorization'] = 'token={}'.format(token)
+
+    verify = config.get_config_val('core.ssl_verify', toml_config)
+    if verify == 'false':
+        session.verify = False
+    elif verify is not None and verify != 'true':
+        # path to a CA bundle
+        session.verify = verify
+
+    http.silence_requests_warnings()
+    return session
+
+
+def stream_json(url, path, fields=None):
+    """ `http_utils.stream_json` of the system tests, recorded as an `http` span of the trace (see tracing.py).
+        ex. the tasks of Mesos: stream_json(url, ['frameworks', '*', 'tasks', '*'], ['id', 'state'])
+    """
+
+    with tracing.span('GET {}'.format(urllib.parse.urlparse(url).path), 'http'):
+        for record in http_utils.stream_json(url, path, fields):
+            yield record
@@ -3,21 +3,41 @@ from shakedown import *
 from shakedown import http
 
 from utils import *
-from dcos.errors import DCOSException
+from concurrent.futures import ThreadPoolExecutor
+from dcos.errors import DCOSException, DCOSHTTPException
 from distutils.version import LooseVersion
-from urllib.parse import urljoin
+from urllib.parse import urlencode, urljoin
 
 import uuid
 import random
+import re
 import retrying
 import pytest
 import shakedown
+import time
 
 
 marathon_1_3 = pytest.mark.skipif('marthon_version_less_than("1.3")')
 marathon_1_4 = pytest.mark.skipif('marthon_version_less_than("1.4")')
 marathon_1_5 = pytest.mark.skipif('marthon_version_less_than("1.5")')
 
+# apps which delete_all_apps never deletes
+PROTECTED_APPS = ['/marathon-user']
+
+# deletes delete_all_apps has in flight at the same time
+DELETE_CONCURRENCY = 10
+
+# seconds between the polls of wait_for_tasks, growing by TASK_POLL_BACKOFF while no task starts
+TASK_POLL_INTERVAL = 0.5
+TASK_MAX_POLL_INTERVAL = 5
+TASK_POLL_BACKOFF = 1.5
+
+# seconds a task snapshot is reused by the task lookups
+TASK_SNAPSHOT_TTL = 2
+
+# fraction of the requests to a peer of pinger_load which may fail
+PINGER_MAX_ERROR_RATIO = 0.01
+
 
 def app(id=1, instances=1):
     app_json = {
@@ -480,18 +500,19 @@ def private_mesos_container_app(principal, secret):
     }
 
 
-def pinger_localhost_app(id='pinger', port=7777):
+def pinger_localhost_app(id='pinger', port=7777, mode='serial'):
     """ pinger app requires, the pinger.py app in fixure_dir and the master
         http service started at port 7777
 
         This app also defaults to 7777 for easy service locating
+        mode 'threaded' serves concurrent keep-alive connections, needed for pinger_load
     """
     return {
       "id": id,
       "instances": 1,
       "cpus": 0.1,
       "mem": 128,
-      "cmd": "/opt/mesosphere/bin/python pinger.py {}".format(port),
+      "cmd": "/opt/mesosphere/bin/python pinger.py {} --mode {}".format(port, mode),
       "fetch": [
         {
           "uri": "http://master.mesos:7777/pinger.py"
@@ -508,7 +529,7 @@ def pinger_localhost_app(id='pinger', port=7777):
     }
 
 
-def pinger_bridge_app(id='pinger', port=7777):
+def pinger_bridge_app(id='pinger', port=7777, mode='serial'):
 
     return {
       "id": id,
@@ -538,7 +559,7 @@ def pinger_bridge_app(id='pinger', port=7777):
       },
       "cpus": 0.1,
       "mem": 128,
-      "cmd": "python3 /opt/pinger.py 80",
+      "cmd": "python3 /opt/pinger.py 80 --mode {}".format(mode),
       "fetch": [
         {
           "uri": "http://master.mesos:7777/pinger.py"
@@ -547,6 +568,42 @@ def pinger_bridge_app(id='pinger', port=7777):
     }
 
 
+def pinger_load(driver, peers, rate=20, duration=10, concurrency=4):
+    """ Has the threaded pinger at `driver` (host:port) request each of the `peers` urls
+        `rate` times a second for `duration` seconds and returns the latencies of each peer,
+        ex. {'http://pinger.marathon.mesos:7777/ping': {'count': 200, 'errors': 0, 'p50': 1.2, 'p99': 8.9, ...}}
+        in milliseconds.  The load is driven from the driver task, the master only asks for it.
+    """
+    query = urlencode([('peer', peer) for peer in peers] +
+                      [('rate', rate), ('duration', duration), ('concurrency', concurrency)])
+    url = 'http://{}/load?{}'.format(driver, query)
+    status, output = shakedown.run_command_on_master("curl -s --max-time {} '{}'".format(duration + 60, url))
+    assert status, 'load from {} failed: {}'.format(driver, output)
+    return json.loads(output)
+
+
+def print_latencies(name, latencies):
+    for peer, latency in sorted(latencies.items()):
+        print('{} {}: p50 {}ms, p99 {}ms, max {}ms ({} requests, {} errors)'.format(
+            name,
+            peer,
+            latency['p50'],
+            latency['p99'],
+            latency['max'],
+            latency['count'],
+            latency['errors']))
+
+
+def assert_latencies(latencies, max_error_ratio=PINGER_MAX_ERROR_RATIO):
+    """ Asserts every peer of a `pinger_load` answered and at most `max_error_ratio` of its requests failed.
+    """
+    for peer, latency in latencies.items():
+        requests = latency['count'] + latency['errors']
+        assert latency['count'] > 0, 'no request to {} succeeded ({} errors)'.format(peer, latency['errors'])
+        assert latency['errors'] <= max_error_ratio * requests, '{} of {} requests to {} failed'.format(
+            latency['errors'], requests, peer)
+
+
 def cluster_info(mom_name='marathon-user'):
     agents = get_private_agents()
     print("agents: {}".format(len(agents)))
@@ -569,13 +626,73 @@ def cluster_info(mom_name='marathon-user'):
 
 
 def delete_all_apps():
-    client = marathon.create_client()
-    apps = client.get_apps()
-    for app in apps:
-        if app['id'] == '/marathon-user':
-            print('WARNING: marathon-user installed')
+    """ Deletes all apps of the marathon the client is configured for, except the `PROTECTED_APPS`.
+        Pods are left alone.  A top level group which holds nothing but apps to delete is deleted as
+        a whole, which also removes its (then empty) sub groups.  The apps of the other groups are
+        deleted one by one.  Up to `DELETE_CONCURRENCY` deletes are in flight.
+        Returns the ids of the deployments.
+    """
+    app_ids = [app['id'] for app in stream_json(marathon_url('v2/apps'), ['apps', '*'], ['id'])]
+    for app_id in PROTECTED_APPS:
+        if app_id in app_ids:
+            print('WARNING: {} installed'.format(app_id.lstrip('/')))
+    pod_ids = [pod['id'] for pod in stream_json(marathon_url('v2/pods'), ['*'], ['id'])]
+
+    invalidate_task_snapshot()
+    with ThreadPoolExecutor(max_workers=DELETE_CONCURRENCY) as executor:
+        deployment_ids = executor.map(delete_marathon_resource, deletion_paths(app_ids, pod_ids))
+        return [deployment_id for deployment_id in deployment_ids if deployment_id is not None]
+
+
+def top_level_group(path_id):
+    return '/' + path_id.strip('/').split('/')[0]
+
+
+def deletion_paths(app_ids, pod_ids=()):
+    """ The marathon paths to delete `app_ids` with, by top level group where that deletes no
+        protected app and none of the pods `pod_ids`.
+    """
+    top_level = {}
+    for app_id in app_ids:
+        top_level.setdefault(top_level_group(app_id), []).append(app_id)
+    pod_groups = set(top_level_group(pod_id) for pod_id in pod_ids)
+
+    paths = []
+    for group_id, group_app_ids in sorted(top_level.items()):
+        protected = [app_id for app_id in group_app_ids if app_id in PROTECTED_APPS]
+        if group_app_ids == [group_id] or protected or group_id in pod_groups:
+            paths.extend('v2/apps{}'.format(app_id) for app_id in group_app_ids if app_id not in protected)
         else:
-            client.remove_app(app['id'], True)
+            paths.append('v2/groups{}'.format(group_id))
+    return paths
+
+
+def delete_marathon_resource(path):
+    """ Force deletes the app or group at `path`, returns the id of the deployment or None if it was gone.
+    """
+    try:
+        response = http.delete(marathon_url(path), params={'force': 'true'})
+    except DCOSHTTPException as e:
+        if e.status() == 404:
+            return None
+        raise
+    return response.json().get('deploymentId')
+
+
+def wait_for_deployments(deployment_ids, timeout_sec=120):
+    """ Waits until the deployments `deployment_ids` are gone, ignoring any other deployment.
+    """
+    pending = set(deployment_ids)
+    future = time.time() + timeout_sec
+    while pending:
+        deployments = http.get(marathon_url('v2/deployments')).json()
+        pending &= set(deployment['id'] for deployment in deployments)
+        if not pending:
+            break
+        if time.time() > future:
+            raise DCOSException('Timeout waiting for {} deployments: {}'.format(len(pending), ', '.join(sorted(pending))))
+        time.sleep(1)
+    invalidate_task_snapshot()
 
 
 def stop_all_deployments(noisy=False):
@@ -590,8 +707,10 @@ def stop_all_deployments(noisy=False):
 
 
 def delete_all_apps_wait():
-    delete_all_apps()
-    deployment_wait()
+    start = time.time()
+    deployment_ids = delete_all_apps()
+    wait_for_deployments(deployment_ids)
+    print('deleted all apps in {:.1f}s ({} deployments)'.format(time.time() - start, len(deployment_ids)))
 
 
 def ip_other_than_mom():
@@ -668,34 +787,117 @@ def block_port(host, port, direction='INPUT'):
 def wait_for_task(service, task, timeout_sec=120):
     """Waits for a task which was launched to be launched"""
 
-    now = time.time()
-    future = now + timeout_sec
+    return wait_for_tasks([(service, task)], timeout_sec).get((service, task))
+
+
+def wait_for_tasks(tasks, timeout_sec=120):
+    """ Waits for the (service, task) pairs `tasks` to be running, ex. [('marathon', 'sleep')].
+        All pairs are resolved from one fetch of the Mesos state per poll.  The polls start
+        `TASK_POLL_INTERVAL` apart, the interval grows up to `TASK_MAX_POLL_INTERVAL` while no
+        task starts running and is jittered so that concurrent waits do not poll in lockstep.
+        Returns the running task of each pair, pairs which are not running after `timeout_sec`
+        are missing.
+    """
+
+    pending = set(tasks)
+    running = {}
+    interval = TASK_POLL_INTERVAL
+    future = time.time() + timeout_sec
 
-    while now < future:
-        response = None
+    while pending:
         try:
-            response = get_service_task(service, task)
+            resolved = running_service_tasks(pending)
         except Exception as e:
-            pass
+            resolved = {}
+        running.update(resolved)
+        pending -= set(resolved)
 
-        if response is not None and response['state'] == 'TASK_RUNNING':
-            return response
-        else:
-            time.sleep(5)
-            now = time.time()
+        if not pending or time.time() >= future:
+            break
 
-    return None
+        interval = TASK_POLL_INTERVAL if resolved else min(interval * TASK_POLL_BACKOFF, TASK_MAX_POLL_INTERVAL)
+        time.sleep(min(random.uniform(interval / 2, interval), max(0, future - time.time())))
+
+    return running
+
+
+def running_service_tasks(tasks):
+    """ The running task of each of the (service, task) pairs `tasks` which has one, from one fetch
+        of the Mesos state.  A task is matched by the name of its framework and its name.
+    """
+    running = {}
+    frameworks = stream_json(dcos_url_path('mesos/master/state'), ['frameworks', '*'], ['name', 'tasks'])
+    for framework in frameworks:
+        for task in framework.get('tasks', []):
+            pair = (framework['name'], task['name'])
+            if pair in tasks and task['state'] == 'TASK_RUNNING':
+                running.setdefault(pair, task)
+    return running
 
 
 def get_pod_tasks(pod_id):
-    pod_id = pod_id.lstrip('/')
-    pod_tasks = []
-    tasks = get_marathon_tasks()
-    for task in tasks:
-        if task['discovery']['name'] == pod_id:
-            pod_tasks.append(task)
-
-    return pod_tasks
+    return task_snapshot().run_spec_tasks(pod_id)
+
+
+class TaskSnapshot(object):
+    """ The active tasks of all frameworks from one fetch of the Mesos state, indexed by the
+        name of their framework and their marathon run spec (app or pod) id.  See `task_snapshot`.
+    """
+
+    def __init__(self):
+        self.taken = time.time()
+        self.by_run_spec = {}
+        frameworks = stream_json(dcos_url_path('mesos/master/state'), ['frameworks', '*'], ['name', 'tasks'])
+        for framework in frameworks:
+            for task in framework.get('tasks', []):
+                key = (framework['name'], task_run_spec_id(task['id']))
+                self.by_run_spec.setdefault(key, []).append(task)
+
+    def age(self):
+        return time.time() - self.taken
+
+    def run_spec_tasks(self, run_spec_id, framework='marathon'):
+        """ The tasks of the app or pod `run_spec_id` launched by the marathon named `framework`.
+        """
+        return self.by_run_spec.get((framework, '/' + run_spec_id.strip('/')), [])
+
+
+# marathon task ids, see Task.Id of marathon: <run spec>.instance-<uuid>.<container> (or marathon-<uuid>)
+# of instances and <run spec>.<uuid> before instances
+TASK_ID_WITH_INSTANCE_ID = re.compile(r'^(.+)\.(instance-|marathon-)([^_\.]+)[\._]([^_\.]+)$')
+LEGACY_TASK_ID = re.compile(r'^(.+)[\._]([^_\.]+)$')
+
+
+def task_run_spec_id(task_id):
+    """ The id of the app or pod of a marathon task, ex. `group_app.<uuid>` is `/group/app`,
+        None if `task_id` is not a marathon task id.
+    """
+    for task_id_regex in [TASK_ID_WITH_INSTANCE_ID, LEGACY_TASK_ID]:
+        match = task_id_regex.match(task_id)
+        if match:
+            return '/' + match.group(1).replace('_', '/')
+    return None
+
+
+# the task snapshot lookups share, see task_snapshot
+current_task_snapshot = None
+
+
+def task_snapshot(max_age=TASK_SNAPSHOT_TTL):
+    """ The task snapshot, fetched again when it is older than `max_age` seconds or was invalidated.
+        This lets the lookups of a retry window share one fetch of the Mesos state.
+    """
+    global current_task_snapshot
+    if current_task_snapshot is None or current_task_snapshot.age() > max_age:
+        current_task_snapshot = TaskSnapshot()
+    return current_task_snapshot
+
+
+def invalidate_task_snapshot():
+    """ Drops the task snapshot, to be called after changing apps or pods.
+    """
+    global current_task_snapshot
+    current_task_snapshot = None
 
 
 def marathon_version():
@@ -2,12 +2,25 @@
 
 """ This app "pinger" responses to /ping with pongs and will
     response to /relay by pinging another app and respond with it's response
+
+    usage: pinger.py <port> [--mode serial|threaded]
+    The default "serial" mode handles one connection at a time and closes it after each
+    response.  The "threaded" mode handles each connection on its own thread and keeps
+    it open (HTTP/1.1 keep-alive), for tests which put concurrent load on the pinger.
+
+    /load?peer=<url>&peer=<url>&rate=20&duration=10&concurrency=4 has the pinger request
+    each peer url `rate` times a second for `duration` seconds and responds with a JSON
+    latency histogram (milliseconds) per peer.
 """
 
+import argparse
+import json
+import math
 import sys
 import logging
 import os
 import platform
+import threading
 import time
 
 # Ensure compatibility with Python 2 and 3.
@@ -18,13 +31,17 @@ PY3 = sys.version_info[0] == 3
 if PY2:
     from SimpleHTTPServer import SimpleHTTPRequestHandler
     from SocketServer import TCPServer as HTTPServer
+    from SocketServer import ThreadingMixIn
+    from httplib import HTTPConnection
     from urllib2 import Request, urlopen
-    import urlparse
+    from urlparse import urlparse, parse_qs
 else:
     from http.server import SimpleHTTPRequestHandler
     from http.server import HTTPServer
+    from socketserver import ThreadingMixIn
+    from http.client import HTTPConnection
     from urllib.request import Request, urlopen
-    from urllib.parse import urlparse
+    from urllib.parse import urlparse, parse_qs
 
 if PY2:
     byte_type = unicode
@@ -39,22 +56,192 @@ else:
         return response.getcode()
 
 
-def make_handler():
+MODES = ['serial', 'threaded']
+
+# seconds an idle keep-alive connection is held open in threaded mode
+KEEP_ALIVE_TIMEOUT = 30
+
+
+# load defaults: requests per second to each peer, seconds and workers per peer
+LOAD_RATE = 20
+LOAD_DURATION = 10
+LOAD_CONCURRENCY = 4
+
+# seconds to wait on a single peer response under load
+LOAD_REQUEST_TIMEOUT = 10
+
+# latency histogram buckets start at 0.1ms and grow by 10%
+RESOLUTION = 0.1
+GROWTH = 1.1
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def bucket_index(latency):
+    if latency <= RESOLUTION:
+        return 0
+    return int(math.ceil(math.log(latency / RESOLUTION, GROWTH)))
+
+
+def bucket_limit(index):
+    return round(RESOLUTION * GROWTH ** index, 3)
+
+
+class LatencyHistogram(object):
+    """ Counts latencies in milliseconds into buckets growing by GROWTH, which
+        keeps any percentile within 10% of the latencies it was computed from.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, latency):
+        index = bucket_index(latency)
+        with self.lock:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += latency
+            self.max = max(self.max, latency)
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+    def percentile(self, percent):
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(bucket_limit(index), round(self.max, 3))
+        return round(self.max, 3)
+
+    def to_json(self):
+        with self.lock:
+            return {
+                'count': self.count,
+                'errors': self.errors,
+                'mean': round(self.total / self.count, 3) if self.count else 0.0,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'max': round(self.max, 3),
+                'buckets': dict((str(bucket_limit(index)), count) for index, count in self.buckets.items())
+            }
+
+
+class LoadSchedule(object):
+    """ Hands out the times requests to a peer are due, `rate` a second for `duration` seconds.
+    """
+
+    def __init__(self, start, rate, duration):
+        self.start = start
+        self.rate = rate
+        self.total = int(rate * duration)
+        self.issued = 0
+        self.lock = threading.Lock()
+
+    def next_time(self):
+        with self.lock:
+            if self.issued >= self.total:
+                return None
+            due = self.start + self.issued / float(self.rate)
+            self.issued += 1
+            return due
+
+
+def load_worker(url, schedule, histogram):
+    """ Requests `url` whenever the schedule says so over one keep-alive connection.
+        The latency is measured from when the request was due, so a slow peer is also
+        charged for the requests which queued up behind it.
+    """
+    parsed = urlparse(url)
+    path = parsed.path or '/'
+    if parsed.query:
+        path = '{}?{}'.format(path, parsed.query)
+    connection = None
+    while True:
+        due = schedule.next_time()
+        if due is None:
+            break
+        delay = due - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            if connection is None:
+                connection = HTTPConnection(parsed.hostname, parsed.port or 80, timeout=LOAD_REQUEST_TIMEOUT)
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status < 400:
+                histogram.record((time.time() - due) * 1000)
+            else:
+                histogram.error()
+        except Exception:
+            logging.debug('Request to %s failed', url, exc_info=True)
+            histogram.error()
+            if connection is not None:
+                connection.close()
+            connection = None
+    if connection is not None:
+        connection.close()
+
+
+def drive_load(peers, rate=LOAD_RATE, duration=LOAD_DURATION, concurrency=LOAD_CONCURRENCY):
+    """ Requests each of the `peers` urls `rate` times a second for `duration` seconds from
+        `concurrency` workers per peer and returns the latency histogram of each peer.
+    """
+    histograms = dict((peer, LatencyHistogram()) for peer in peers)
+    start = time.time()
+    workers = []
+    for peer in peers:
+        schedule = LoadSchedule(start, rate, duration)
+        for _ in range(concurrency):
+            worker = threading.Thread(target=load_worker, args=(peer, schedule, histograms[peer]))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+    for worker in workers:
+        worker.join()
+
+    return dict((peer, histogram.to_json()) for peer, histogram in histograms.items())
+
+
+def make_handler(keep_alive=False):
     """
     Factory method that creates a handler class.
+    With keep_alive the handler speaks HTTP/1.1 and keeps the connection open between requests.
     """
 
     class Handler(SimpleHTTPRequestHandler):
 
-        def handle_ping(self):
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
+        if keep_alive:
+            protocol_version = 'HTTP/1.1'
+            timeout = KEEP_ALIVE_TIMEOUT
+            # headers and body are separate writes, which would otherwise wait on delayed acks
+            disable_nagle_algorithm = True
+
+        def send_body(self, status, body, content_type='text/html'):
+            self.send_response(status)
+            self.send_header('Content-type', content_type)
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
 
+            self.wfile.write(body)
+
+        def handle_ping(self):
             marathonId = os.getenv("MARATHON_APP_ID", "NO_MARATHON_APP_ID_SET")
             msg = "Pong {}".format(marathonId)
 
-            self.wfile.write(byte_type(msg, "UTF-8"))
+            self.send_body(200, byte_type(msg, "UTF-8"))
             return
 
         def handle_relay(self):
@@ -74,17 +261,33 @@ def make_handler():
             status = response_status(response)
             logging.debug("Relay request is %s, %s", res, status)
 
-            self.send_response(status)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-
-            self.wfile.write(res)
             marathonId = os.getenv("MARATHON_APP_ID", "NO_MARATHON_APP_ID_SET")
             msg = "\nRelay from {}".format(marathonId)
-            self.wfile.write(byte_type(msg, "UTF-8"))
+            self.send_body(status, res + byte_type(msg, "UTF-8"))
 
             return
 
+        def handle_load(self):
+            """
+                drives load at the peer urls of the query and responds with their latencies.
+                The peers should run in threaded mode, a serial pinger is measured queueing.
+            """
+            query = parse_qs(urlparse(self.path).query)
+            peers = query.get('peer', [])
+            if not peers:
+                self.send_body(400, byte_type("peer query parameter is required", "UTF-8"))
+                return
+
+            rate = float(query.get('rate', [LOAD_RATE])[0])
+            duration = float(query.get('duration', [LOAD_DURATION])[0])
+            concurrency = int(query.get('concurrency', [LOAD_CONCURRENCY])[0])
+            logging.info("Load of %s/s for %ss on %s", rate, duration, peers)
+
+            latencies = drive_load(peers, rate, duration, concurrency)
+            self.send_body(200, byte_type(json.dumps(latencies, sort_keys=True), "UTF-8"),
+                           content_type='application/json')
+            return
+
         def do_GET(self):
             try:
                 logging.debug("Got GET request")
@@ -92,6 +295,8 @@ def make_handler():
                     return self.handle_ping()
                 elif self.path.startswith('/relay-ping'):
                     return self.handle_relay()
+                elif self.path.startswith('/load'):
+                    return self.handle_load()
                 else:
                     return self.handle_ping()
             except:
@@ -101,14 +306,33 @@ def make_handler():
         def do_POST(self):
             try:
                 logging.debug("Got POST request")
+                self.discard_request_body()
                 return self.handle_ping()
             except:
                 logging.exception('Could not handle POST request')
                 raise
 
+        def discard_request_body(self):
+            """ Reads the body of the request so the next request on a kept alive connection starts clean.
+            """
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+
     return Handler
 
 
+def create_server(port, mode='serial'):
+    """ Creates the pinger server for `mode`, one of MODES.
+    """
+    if mode == 'threaded':
+        ThreadedHTTPServer.allow_reuse_address = True
+        return ThreadedHTTPServer(("", port), make_handler(keep_alive=True))
+
+    HTTPServer.allow_reuse_address = True
+    return HTTPServer(("", port), make_handler())
+
+
 if __name__ == "__main__":
     logging.basicConfig(
         format='%(asctime)s %(levelname)-8s: %(message)s',
@@ -116,13 +340,19 @@ if __name__ == "__main__":
     logging.info(platform.python_version())
     logging.debug(sys.argv)
 
-    port = int(sys.argv[1])
+    parser = argparse.ArgumentParser(description='Responds to /ping and /relay-ping.')
+    parser.add_argument('port', type=int)
+    parser.add_argument('--mode', choices=MODES, default='serial',
+                        help='serial handles one connection at a time, threaded handles connections '
+                             'concurrently with keep-alive')
+    args = parser.parse_args()
+
+    port = args.port
     taskId = os.getenv("MESOS_TASK_ID", "<UNKNOWN>")
 
-    HTTPServer.allow_reuse_address = True
-    httpd = HTTPServer(("", port), make_handler())
-    msg = "AppMock[%s]: has taken the stage at port %d. "
-    logging.info(msg, taskId, port)
+    httpd = create_server(port, args.mode)
+    msg = "AppMock[%s]: has taken the stage at port %d in %s mode. "
+    logging.info(msg, taskId, port, args.mode)
 
     try:
         httpd.serve_forever()
@@ -0,0 +1,188 @@
+import codecs
+import json
+import re
+
+from six.moves import urllib
+from dcos import http, config
+"""
+    Marathon urls and streamed JSON responses, shared by the system and the scale tests.
+    The scale tests import this module from their utils.py.
+"""
+
+
+def marathon_url(path=''):
+    """ Provides the url of the marathon the dcos client is configured for.
+        This honors `marathon.url` which is set by `marathon_on_marathon`.
+
+    :param path: path relative to the marathon base url, ex. `v2/apps`
+    :type path: str
+    :returns: url
+    :rtype: str
+    """
+
+    toml_config = config.get_config()
+    base_url = config.get_config_val('marathon.url', toml_config)
+    if base_url is None:
+        dcos_url = config.get_config_val('core.dcos_url', toml_config)
+        base_url = urllib.parse.urljoin(dcos_url, 'service/marathon/')
+
+    if not base_url.endswith('/'):
+        base_url = base_url + '/'
+    return urllib.parse.urljoin(base_url, path)
+
+
+# size of the chunks read from streamed JSON responses
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def stream_json(url, path, fields=None):
+    """ Streams the records at `path` of the JSON document at `url` without loading the document.
+        ex. the tasks of Mesos: stream_json(url, ['frameworks', '*', 'tasks', '*'], ['id', 'state'])
+
+    :param url: url of the JSON document
+    :type url: str
+    :param path: keys leading to the records, `*` for every item of a list
+    :type path: list
+    :param fields: keys of the records to keep, all if None
+    :type fields: list
+    :returns: generator of records
+    :rtype: generator
+    """
+
+    response = http.get(url, stream=True)
+    try:
+        for record in iter_json(response.iter_content(JSON_CHUNK_SIZE), path, fields):
+            yield record
+    finally:
+        response.close()
+
+
+def iter_json(chunks, path, fields=None):
+    """ Yields the records at `path` of a JSON document read from `chunks` of bytes or text.
+        See `stream_json`.
+    """
+
+    for record in JSONReader(chunks).records(list(path)):
+        if fields is not None:
+            record = {field: record[field] for field in fields if field in record}
+        yield record
+
+
+class JSONReader(object):
+    """ Incremental reader of a JSON document from an iterable of chunks.
+        Only the records at the requested path are kept.  Everything else is skipped a buffer
+        at a time, so the memory used is bounded by the chunk size and the largest record,
+        not by the size of the document.
+    """
+
+    WHITESPACE = re.compile(r'\s*')
+    DELIMITERS = ',:]} \t\r\n'
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def records(self, path):
+        if not path:
+            yield self._decode()
+            return
+
+        key = path[0]
+        opening, closing = ('[', ']') if key == '*' else ('{', '}')
+        if self._peek() != opening:
+            self._skip()
+            return
+
+        self.pos += 1
+        first = True
+        while self._peek() != closing:
+            if not first:
+                self._expect(',')
+            first = False
+
+            if key == '*':
+                for record in self.records(path[1:]):
+                    yield record
+            else:
+                name = self._decode()
+                self._expect(':')
+                if name == key:
+                    for record in self.records(path[1:]):
+                        yield record
+                else:
+                    self._skip()
+        self.pos += 1
+
+    def _fill(self):
+        if self.eof:
+            return False
+
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            text = self.decoder.decode(b'', True)
+        elif isinstance(chunk, bytes):
+            text = self.decoder.decode(chunk)
+        else:
+            text = chunk
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON document')
+
+    def _expect(self, token):
+        if self._peek() != token:
+            raise ValueError('Expected {} at {!r}'.format(token, self.buffer[self.pos:self.pos + 20]))
+        self.pos += 1
+
+    def _decode(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.pos)
+                # a number split across chunks (ex. `-2.` of `-2.5`) may decode early
+                if self.eof or (end < len(self.buffer) and self.buffer[end] in self.DELIMITERS):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def _skip(self):
+        token = self._peek()
+        if token not in '[{':
+            self._decode()
+            return
+
+        # values within the buffer are decoded whole, larger ones element by element
+        try:
+            value, self.pos = self.json.raw_decode(self.buffer, self.pos)
+            return
+        except ValueError:
+            pass
+
+        closing = ']' if token == '[' else '}'
+        self.pos += 1
+        first = True
+        while self._peek() != closing:
+            if not first:
+                self._expect(',')
+            first = False
+
+            if token == '{':
+                self._decode()
+                self._expect(':')
+            self._skip()
+        self.pos += 1
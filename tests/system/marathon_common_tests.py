@@ -1029,6 +1029,28 @@ def test_ping(marathon_service_name):
     assert response.text == 'pong'
 
 
+def vip_latency_check(fqn, marathon_service_name):
+    """ Deploys a threaded pinger which puts load on the VIP `fqn`, prints the latency and removes the pinger.
+    """
+    driver_id = 'vip-load'
+    driver_dns = '{}.{}.mesos'.format(driver_id, marathon_service_name)
+    client = marathon.create_client()
+    shakedown.copy_file_to_master(fixture_dir() + "/pinger.py")
+
+    try:
+        with shakedown.master_http_service():
+            client.add_app(common.pinger_localhost_app(driver_id, mode='threaded'))
+            shakedown.deployment_wait()
+            shakedown.wait_for_dns(driver_dns)
+
+        latencies = common.pinger_load('{}:7777'.format(driver_dns), ['http://{}:10000/'.format(fqn)])
+        common.print_latencies('VIP', latencies)
+        common.assert_latencies(latencies)
+    finally:
+        client.remove_app(driver_id, True)
+        shakedown.deployment_wait()
+
+
 @dcos_1_9
 def test_vip_mesos_cmd(marathon_service_name):
     """ Tests the creation of a VIP from a python command NOT in a docker.  the
@@ -1058,6 +1080,7 @@ def test_vip_mesos_cmd(marathon_service_name):
         common.assert_http_code('{}:{}'.format(fqn, 10000))
 
     http_output_check()
+    vip_latency_check(fqn, marathon_service_name)
 
 @dcos_1_9
 def test_vip_docker_bridge_mode(marathon_service_name):
@@ -1089,10 +1112,11 @@ def test_vip_docker_bridge_mode(marathon_service_name):
         common.assert_http_code('{}:{}'.format(fqn, 10000))
 
     http_output_check()
+    vip_latency_check(fqn, marathon_service_name)
 
 
-def get_container_pinger_app(name='pinger'):
-    return add_container_network(common.pinger_localhost_app(name), 'dcos')
+def get_container_pinger_app(name='pinger', mode='serial'):
+    return add_container_network(common.pinger_localhost_app(name, mode=mode), 'dcos')
 
 
 def add_container_network(app_def, network, port=7777):
@@ -1127,13 +1151,14 @@ def test_network_pinger(test_type, get_pinger_app, dns_format, marathon_service_
 
     It tests that 1 task can network communicate to another task on the given network
     It tests inbound and outbound connectivity
+    It then has the relay put load on the pinger and prints the east-west latency
 
     test_type param is not used.  It is passed so that it is clear which parametrized test
     is running or may be failing.
     """
     client = marathon.create_client()
-    pinger_app = get_pinger_app('pinger')
-    relay_app = get_pinger_app('relay')
+    pinger_app = get_pinger_app('pinger', mode='threaded')
+    relay_app = get_pinger_app('relay', mode='threaded')
     pinger_dns = dns_format.format('pinger', marathon_service_name)
     relay_dns = dns_format.format('relay', marathon_service_name)
 
@@ -1160,6 +1185,10 @@ def test_network_pinger(test_type, get_pinger_app, dns_format, marathon_service_
 
     http_output_check()
 
+    latencies = common.pinger_load('{}:7777'.format(relay_dns), ['http://{}:7777/ping'.format(pinger_dns)])
+    common.print_latencies('{} east-west'.format(test_type), latencies)
+    common.assert_latencies(latencies)
+
 
 def clear_marathon():
     try:
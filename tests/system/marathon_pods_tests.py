@@ -10,8 +10,8 @@ import time
 from distutils.version import LooseVersion
 from urllib.parse import urljoin
 
-from common import (block_port, cluster_info, event_fixture, get_pod_tasks, ip_other_than_mom,
-                    pin_pod_to_host, restore_iptables, save_iptables)
+from common import (block_port, cluster_info, event_fixture, get_pod_tasks, invalidate_task_snapshot,
+                    ip_other_than_mom, pin_pod_to_host, restore_iptables, save_iptables)
 from dcos import marathon, util, http
 from shakedown import dcos_1_9, dcos_version_less_than, private_agents, required_private_agents
 from utils import fixture_dir, get_resource, parse_json
@@ -32,9 +32,17 @@ def _clear_pods():
         pods = client.list_pod()
         for pod in pods:
             client.remove_pod(pod["id"], True)
-        shakedown.deployment_wait()
+        _deployment_wait()
     except:
         pass
+    invalidate_task_snapshot()
+
+
+def _deployment_wait():
+    """ Waits for the deployments, after which the pod tasks are read from a new task snapshot.
+    """
+    shakedown.deployment_wait()
+    invalidate_task_snapshot()
 
 
 def _pods_url(path=""):
@@ -83,7 +91,7 @@ def test_create_pod():
     pod_json = _pods_json()
     pod_json["id"] = pod_id
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
     pod = client.show_pod(pod_id)
     assert pod is not None
 
@@ -99,7 +107,7 @@ def test_event_channel():
     pod_json = _pods_json()
     pod_json["id"] = pod_id
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     # look for created
     @retrying.retry(stop_max_delay=10000)
@@ -111,7 +119,7 @@ def test_event_channel():
 
     pod_json["scaling"]["instances"] = 3
     client.update_pod(pod_id, pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     # look for updated
     @retrying.retry(stop_max_delay=10000)
@@ -130,10 +138,10 @@ def test_remove_pod():
     pod_json = _pods_json()
     pod_json["id"] = pod_id
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     client.remove_pod(pod_id)
-    shakedown.deployment_wait()
+    _deployment_wait()
     try:
         pod = client.show_pod(pod_id)
         assert False, "We shouldn't be here"
@@ -151,7 +159,7 @@ def test_multi_pods():
     pod_json["id"] = pod_id
     pod_json["scaling"]["instances"] = 10
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     status = _pod_status(client, pod_id)
     assert len(status["instances"]) == 10
@@ -167,14 +175,14 @@ def test_scaleup_pods():
     pod_json["id"] = pod_id
     pod_json["scaling"]["instances"] = 1
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     status = _pod_status(client, pod_id)
     assert len(status["instances"]) == 1
 
     pod_json["scaling"]["instances"] = 10
     client.update_pod(pod_id, pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
     status = _pod_status(client, pod_id)
     assert len(status["instances"]) == 10
 
@@ -189,14 +197,14 @@ def test_scaledown_pods():
     pod_json["id"] = pod_id
     pod_json["scaling"]["instances"] = 10
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     status = _pod_status(client, pod_id)
     assert len(status["instances"]) == 10
 
     pod_json["scaling"]["instances"] = 1
     client.update_pod(pod_id, pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     status = _pod_status(client, pod_id)
     assert len(status["instances"]) == 1
@@ -222,11 +230,11 @@ def test_version_pods():
     pod_json["id"] = pod_id
     pod_json["scaling"]["instances"] = 1
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     pod_json["scaling"]["instances"] = 10
     client.update_pod(pod_id, pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     versions = _pod_versions(client, pod_id)
 
@@ -253,7 +261,7 @@ def test_pod_comm_via_volume():
     pod_json = _pods_json('vol-pods.json')
     pod_json["id"] = pod_id
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
     tasks = get_pod_tasks(pod_id)
     assert len(tasks) == 2
     time.sleep(4)
@@ -274,7 +282,7 @@ def test_pod_restarts_on_nonzero_exit():
     pod_json["scaling"]["instances"] = 1
     pod_json['containers'][0]['exec']['command']['shell'] = 'sleep 5; echo -n leaving; exit 2'
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
     #
     tasks = get_pod_tasks(pod_id)
     initial_id1 = tasks[0]['id']
@@ -298,7 +306,7 @@ def test_pod_multi_port():
     pod_json = _pods_json('pod-ports.json')
     pod_json["id"] = pod_id
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
     #
     time.sleep(1)
     pod = client.list_pod()[0]
@@ -327,7 +335,7 @@ def test_pod_port_communication():
     # otherwise it is expected that 2 containers are running.
     pod_json['containers'][1]['exec']['command']['shell'] = 'sleep 2; curl -m 2 localhost:$ENDPOINT_HTTPENDPOINT; if [ $? -eq 7 ]; then exit; fi; /opt/mesosphere/bin/python -m http.server $ENDPOINT_HTTPENDPOINT2'  # NOQA
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     tasks = get_pod_tasks(pod_id)
     assert len(tasks) == 2
@@ -348,7 +356,7 @@ def test_pin_pod():
     host = ip_other_than_mom()
     pin_pod_to_host(pod_json, host)
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     tasks = get_pod_tasks(pod_id)
     assert len(tasks) == 2
@@ -369,7 +377,7 @@ def test_health_check():
     pod_json["id"] = pod_id
 
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     tasks = get_pod_tasks(pod_id)
     c1_health = tasks[0]['statuses'][0]['healthy']
@@ -394,7 +402,7 @@ def test_health_failed_check():
     host = ip_other_than_mom()
     pin_pod_to_host(pod_json, host)
     client.add_pod(pod_json)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     tasks = get_pod_tasks(pod_id)
     initial_id1 = tasks[0]['id']
@@ -408,7 +416,7 @@ def test_health_failed_check():
     block_port(host, port)
     time.sleep(7)
     restore_iptables(host)
-    shakedown.deployment_wait()
+    _deployment_wait()
 
     tasks = get_pod_tasks(pod_id)
     for task in tasks:
@@ -91,7 +91,7 @@ def test_mom_when_mom_process_killed():
         original_task_id = tasks[0]['id']
 
         shakedown.kill_process_on_host(ip_of_mom(), 'marathon-assembly')
-        shakedown.wait_for_task('marathon', 'marathon-user', 300)
+        assert common.wait_for_task('marathon', 'marathon-user', 300), 'marathon-user task of marathon not running'
         shakedown.wait_for_service_endpoint('marathon-user')
 
         tasks = client.get_tasks('/agent-failure')
@@ -113,7 +113,7 @@ def test_mom_with_network_failure():
     with shakedown.marathon_on_marathon():
         client = marathon.create_client()
         client.add_app(app_def)
-        shakedown.wait_for_task("marathon-user", "sleep")
+        assert common.wait_for_task("marathon-user", "sleep"), 'sleep task of marathon-user not running'
         tasks = client.get_tasks('sleep')
         original_sleep_task_id = tasks[0]["id"]
         task_ip = tasks[0]['host']
@@ -132,11 +132,13 @@ def test_mom_with_network_failure():
 
     time.sleep(timedelta(minutes=1).total_seconds())
     shakedown.wait_for_service_endpoint('marathon-user')
-    shakedown.wait_for_task("marathon-user", "sleep")
+    # MoM and its sleep task, from one poll of the Mesos state
+    tasks = [('marathon', 'marathon-user'), ('marathon-user', 'sleep')]
+    running = common.wait_for_tasks(tasks)
+    assert len(running) == len(tasks), 'tasks not running: {}'.format(sorted(set(tasks) - set(running)))
 
     with shakedown.marathon_on_marathon():
         client = marathon.create_client()
-        shakedown.wait_for_task("marathon-user", "sleep")
         tasks = client.get_tasks('sleep')
         current_sleep_task_id = tasks[0]["id"]
 
@@ -158,7 +160,7 @@ def test_mom_with_network_failure_bounce_master():
     with shakedown.marathon_on_marathon():
         client = marathon.create_client()
         client.add_app(app_def)
-        shakedown.wait_for_task("marathon-user", "sleep")
+        assert common.wait_for_task("marathon-user", "sleep"), 'sleep task of marathon-user not running'
         tasks = client.get_tasks('sleep')
         original_sleep_task_id = tasks[0]["id"]
         task_ip = tasks[0]['host']
@@ -181,11 +183,13 @@ def test_mom_with_network_failure_bounce_master():
 
     time.sleep(timedelta(minutes=1).total_seconds())
     shakedown.wait_for_service_endpoint('marathon-user')
-    shakedown.wait_for_task("marathon-user", "sleep")
+    # MoM and its sleep task, from one poll of the Mesos state
+    tasks = [('marathon', 'marathon-user'), ('marathon-user', 'sleep')]
+    running = common.wait_for_tasks(tasks)
+    assert len(running) == len(tasks), 'tasks not running: {}'.format(sorted(set(tasks) - set(running)))
 
     with shakedown.marathon_on_marathon():
         client = marathon.create_client()
-        shakedown.wait_for_task("marathon-user", "sleep")
         tasks = client.get_tasks('sleep')
         current_sleep_task_id = tasks[0]["id"]
 
@@ -10,6 +10,7 @@ from dcos import http, util, config
 from dcos.errors import DCOSException
 from distutils.version import LooseVersion
 from shakedown import (service_available_predicate, marathon_version)
+from http_utils import marathon_url, stream_json, iter_json, JSONReader, JSON_CHUNK_SIZE
 
 
 def fixture_dir():